@@ -0,0 +1,207 @@
+import sys
+import os
+import json
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+
+# Add project root to system path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.cleaning.clean_charity_main import clean_charity_main
+from src.cleaning.charity_store import save_charity_main, load_charity_main
+from src.cleaning.clean_receipt import (
+    flat_lookup,
+    non_england_names,
+    LocalAuthorityNormaliser,
+    apply_local_authority_cleaning,
+    filter_non_england,
+    melt_sheet,
+    count_removals,
+    build_panel
+)
+from src.cleaning.load_raw import load_company_house, load_receipt_sheets
+from src.cleaning.postcodes import PostcodeResolver, build_postcode_index
+from src.cleaning.profiling import enable_profiling, disable_profiling, stage
+from synthetic import write_inputs
+
+HISTORY_PATH = os.path.join(os.path.dirname(__file__), 'history.json')
+REGRESSION_THRESHOLD = 0.10
+
+def stage_results(pipeline, *args, trace_memory=True):
+    """
+    Run `pipeline` under the stage profiler and return the wall time and,
+    with `trace_memory`, the peak traced memory of its outermost stages
+    ({name: {'seconds', 'peak_mb'}}). Memory is tracemalloc's, so worker
+    processes are not counted and timings include its overhead.
+    """
+    profiler = enable_profiling(trace_memory=trace_memory)
+    try:
+        pipeline(*args)
+    finally:
+        disable_profiling()
+    return {
+        record['name']: {
+            'seconds': round(record['wall_seconds'], 4),
+            'peak_mb': round(record['peak_bytes'] / 2**20, 1) if trace_memory else None
+        }
+        for record in profiler.records if record['parent'] is None
+    }
+
+def bench_charity(paths, output_path):
+    """
+    Stages of run_clean_charity_main.py, reading the raw files directly
+    (the raw input cache is not used).
+    """
+    with stage('read_inputs'):
+        charity = pd.read_csv(paths['charity'], low_memory=False)
+        charity_web = pd.read_csv(paths['charity_web'], low_memory=False)
+        local_authority = pd.read_csv(paths['local_authority'], low_memory=False)
+        category = pd.read_csv(paths['category'], low_memory=False)
+    with stage('load_company_house'):
+        company_house = load_company_house(
+            paths['company_house'], company_numbers=charity['charity_company_registration_number']
+        )
+    with stage('build_postcode_index'):
+        resolver = PostcodeResolver(build_postcode_index(paths['onspd']), local_authority)
+    with stage('clean_charity_main'):
+        df = clean_charity_main(charity, company_house, charity_web, resolver, local_authority, category)
+    with stage('save_charity_main'):
+        save_charity_main(df, output_path)
+
+def bench_receipt(paths, charity_path):
+    """
+    Stages of run_clean_receipt.py without the per-year panel store: the
+    panel is built in memory from every sheet.
+    """
+    with stage('load_receipt_sheets'):
+        dfs = load_receipt_sheets(paths['receipts'], cache_dir=None)
+    with stage('local_authority_cleaning'):
+        normaliser = LocalAuthorityNormaliser(flat_lookup)
+        cleaned, _ = apply_local_authority_cleaning(list(dfs.values()), pd.DataFrame(), flat_lookup, normaliser)
+        dfs = dict(zip(dfs, cleaned))
+    with stage('count_removals'):
+        charity_df = load_charity_main(charity_path)
+        _, charity_df = apply_local_authority_cleaning([], charity_df, flat_lookup, normaliser)
+        charity_df = filter_non_england(charity_df, non_england_names)
+        removals = count_removals(charity_df)
+    with stage('melt'):
+        disposal_long_df = pd.concat(
+            [melt_sheet(df, int(year)) for year, df in dfs.items()
+             if not df.empty and 'local_authority' in df.columns],
+            ignore_index=True
+        )
+    with stage('build_panel'):
+        build_panel(disposal_long_df, removals)
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(__file__), capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def load_history(filepath=HISTORY_PATH):
+    if os.path.exists(filepath):
+        with open(filepath) as f:
+            return json.load(f)
+    return []
+
+def previous_run(history, record):
+    """
+    The latest earlier run with the same scale and settings, or None.
+    """
+    keys = ('scale', 'fraction', 'seed', 'trace_memory')
+    for past in reversed(history):
+        if all(past.get(key) == record[key] for key in keys):
+            return past
+    return None
+
+def compare(record, previous, threshold=REGRESSION_THRESHOLD):
+    """
+    Stages more than `threshold` slower than in `previous`.
+    """
+    slower = {}
+    for pipeline, stages in record['stages'].items():
+        for name, result in stages.items():
+            before = previous['stages'].get(pipeline, {}).get(name)
+            if before and before['seconds'] > 0:
+                change = result['seconds'] / before['seconds'] - 1
+                if change > threshold:
+                    slower[f"{pipeline}.{name}"] = round(change, 3)
+    return slower
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark both cleaning pipelines on synthetic data.")
+    parser.add_argument(
+        '--scales', nargs='+', type=float, default=[1, 5, 20],
+        help="Multiples of the production row counts to run."
+    )
+    parser.add_argument(
+        '--fraction', type=float, default=1.0,
+        help="Multiply every scale by this, e.g. 0.01 for a quick run."
+    )
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument(
+        '--no-memory', action='store_true',
+        help="Skip tracemalloc peak memory (timings then have no tracing overhead)."
+    )
+    parser.add_argument(
+        '--workdir',
+        help="Directory for the generated inputs and outputs (a temporary directory by default)."
+    )
+    parser.add_argument('--history', default=HISTORY_PATH)
+    args = parser.parse_args()
+
+    history = load_history(args.history)
+    trace_memory = not args.no_memory
+    for scale in args.scales:
+        with tempfile.TemporaryDirectory() as tmp:
+            directory = os.path.join(args.workdir, f"scale_{scale:g}") if args.workdir else tmp
+            os.makedirs(directory, exist_ok=True)
+
+            start = time.perf_counter()
+            inputs = write_inputs(directory, scale * args.fraction, seed=args.seed)
+            print(f"Scale {scale:g}: generated inputs in {time.perf_counter() - start:.1f}s {inputs['rows']}")
+
+            charity_path = os.path.join(directory, 'charity_main_cleaned.csv')
+            record = {
+                'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'commit': git_commit(),
+                'python': platform.python_version(),
+                'pandas': pd.__version__,
+                'numpy': np.__version__,
+                'scale': scale,
+                'fraction': args.fraction,
+                'seed': args.seed,
+                'trace_memory': trace_memory,
+                'rows': inputs['rows'],
+                'stages': {
+                    'charity': stage_results(bench_charity, inputs['paths'], charity_path, trace_memory=trace_memory),
+                    'receipt': stage_results(bench_receipt, inputs['paths'], charity_path, trace_memory=trace_memory),
+                }
+            }
+
+        for pipeline, stages in record['stages'].items():
+            print(pd.DataFrame(stages).T.rename_axis(f"{pipeline} (scale {scale:g})").to_string())
+
+        previous = previous_run(history, record)
+        if previous is not None:
+            slower = compare(record, previous)
+            if slower:
+                print(f"Slower than {previous['commit']} ({previous['timestamp']}) by more than "
+                      f"{REGRESSION_THRESHOLD:.0%}: {slower}")
+            else:
+                print(f"No stage more than {REGRESSION_THRESHOLD:.0%} slower than {previous['commit']}.")
+        history.append(record)
+
+    with open(args.history, 'w') as f:
+        json.dump(history, f, indent=2)
+    print(f"Results appended to {args.history}")
@@ -0,0 +1,278 @@
+# synthetic.py
+
+import os
+import string
+
+import numpy as np
+import pandas as pd
+
+from src.cleaning.clean_charity_main import CATEGORY_MAPPING
+from src.cleaning.clean_receipt import SHEET_LAYOUT, merge_columns
+
+# Approximate row counts of the production inputs (scale 1)
+PRODUCTION_ROWS = {
+    'charity_register': 400_000,
+    'companies_house': 5_500_000,
+    'charity_web': 170_000,
+    'onspd': 2_700_000,
+    'classification': 1_200_000,
+}
+# The number of local authorities does not grow with the data
+N_AUTHORITIES = 380
+
+# Receipt services: every standard column and its aliases, so alias merging
+# has work to do in every year. 'All services total' is always written once
+SERVICES = sorted({
+    name for standard, aliases in merge_columns.items() if standard != 'all services total'
+    for name in [standard] + aliases
+})
+DESCRIPTIONS = [
+    column[len('classification_'):].replace('_', ' ').title()
+    for columns in CATEGORY_MAPPING.values() for column in columns
+] + ['Unclassified Purpose']
+
+def scaled_rows(scale: float) -> dict:
+    return {name: max(1, int(round(rows * scale))) for name, rows in PRODUCTION_ROWS.items()}
+
+def random_letters(rng, n, length):
+    letters = np.array(list(string.ascii_uppercase))
+    return [''.join(row) for row in rng.choice(letters, (n, length))]
+
+def synthetic_authorities(n: int) -> pd.DataFrame:
+    """
+    Local authority codes and names (LAD23CD / LAD23NM).
+    """
+    codes = [f"E0{6 + i % 4}{i:06d}" for i in range(n)]
+    return pd.DataFrame({
+        'LAD23CD': codes,
+        'LAD23NM': [f"Authority {i}" for i in range(n)],
+        'LAD23NMW': '',
+    })
+
+def synthetic_onspd(n: int, authorities: pd.DataFrame, rng) -> pd.DataFrame:
+    """
+    ONSPD-style postcode rows: pcd (padded), pcds (single space) and the
+    local authority code, with postcodes clustered into districts and
+    sectors that mostly sit in one authority.
+    """
+    n_districts = max(1, n // 600)
+    areas = random_letters(rng, n_districts, 2)
+    districts = [f"{area}{number}" for area, number in zip(areas, rng.integers(1, 99, n_districts))]
+    district_la = rng.integers(0, len(authorities), n_districts)
+
+    district = rng.integers(0, n_districts, n)
+    sector = rng.integers(0, 10, n)
+    unit = random_letters(rng, n, 2)
+    outward = np.array(districts, dtype=object)[district]
+    pcds = pd.Series([f"{o} {s}{u}" for o, s, u in zip(outward, sector, unit)])
+    # A minority of postcodes sit in a neighbouring authority
+    la = np.where(rng.random(n) < 0.9, district_la[district], rng.integers(0, len(authorities), n))
+    onspd = pd.DataFrame({
+        'pcd': pcds.str.replace(' ', '  ', regex=False),
+        'pcds': pcds,
+        'oslaua': authorities['LAD23CD'].to_numpy()[la],
+        'ctry': 'E92000001',
+    })
+    return onspd.drop_duplicates('pcds').reset_index(drop=True)
+
+def synthetic_charity_register(n: int, postcodes: pd.Series, rng) -> pd.DataFrame:
+    """
+    Charity register extract. Linked charities repeat a charity number, a
+    third of charities are companies, and contact postcodes are sometimes
+    missing, lower case and unspaced, not in ONSPD or only an outward code.
+    """
+    unique = max(1, int(n * 0.95))
+    numbers = rng.choice(np.arange(200_000, 200_000 + 4 * n), unique, replace=False)
+    numbers = np.concatenate([numbers, rng.choice(numbers, n - unique)])
+    registration = pd.to_datetime('1961-01-01') + pd.to_timedelta(rng.integers(0, 23_000, n), unit='D')
+    removed = rng.random(n) < 0.55
+    removal = pd.Series(registration + pd.to_timedelta(rng.integers(30, 9_000, n), unit='D')).where(removed)
+
+    contact = postcodes.to_numpy()[rng.integers(0, len(postcodes), n)].astype(object)
+    messy = rng.random(n)
+    contact[messy < 0.05] = ''
+    lower = (messy >= 0.05) & (messy < 0.08)
+    contact[lower] = [pc.lower().replace(' ', '') for pc in contact[lower]]
+    # Newer postcodes missing from ONSPD, matched by sector or district
+    unknown = (messy >= 0.08) & (messy < 0.11)
+    contact[unknown] = [
+        pc[:-2] + unit for pc, unit in zip(contact[unknown], random_letters(rng, unknown.sum(), 2))
+    ]
+    outward = (messy >= 0.11) & (messy < 0.12)
+    contact[outward] = [pc.split(' ')[0] for pc in contact[outward]]
+
+    # Scottish and Northern Irish companies carry a prefix, as in the register
+    prefix = rng.choice(['', 'SC', 'NI'], n, p=[0.9, 0.07, 0.03])
+    digits = [f"{x:08d}"[len(p):] for p, x in zip(prefix, rng.integers(0, 14_000_000, n))]
+    company = np.where(rng.random(n) < 0.33, np.char.add(prefix, digits), '')
+    return pd.DataFrame({
+        'date_of_extract': '2025-01-01',
+        'organisation_number': np.arange(n),
+        'registered_charity_number': numbers,
+        'linked_charity_number': np.where(np.arange(n) < unique, 0, rng.integers(1, 20, n)),
+        'charity_name': [f"Charity {x}" for x in numbers],
+        'charity_type': rng.choice(['Trust', 'CIO', 'Charitable company', 'Other'], n),
+        'charity_registration_status': np.where(removed, 'Removed', 'Registered'),
+        'date_of_registration': registration.strftime('%Y-%m-%d'),
+        'date_of_removal': removal.dt.strftime('%Y-%m-%d'),
+        'charity_reporting_status': 'Submission Received',
+        'latest_acc_fin_period_start_date': '2023-04-01',
+        'latest_acc_fin_period_end_date': '2024-03-31',
+        'latest_income': np.where(rng.random(n) < 0.3, np.nan, rng.lognormal(10, 2.2, n).round(0)),
+        'latest_expenditure': rng.lognormal(10, 2.2, n).round(0),
+        'charity_contact_address1': 'Address line',
+        'charity_contact_address2': '',
+        'charity_contact_address3': '',
+        'charity_contact_address4': '',
+        'charity_contact_address5': '',
+        'charity_contact_postcode': contact,
+        'charity_contact_phone': '',
+        'charity_contact_email': '',
+        'charity_contact_web': '',
+        'charity_company_registration_number': company,
+        'charity_insolvent': False,
+        'charity_in_administration': False,
+        'charity_previously_excepted': False,
+        'charity_is_cdf_or_cif': '',
+        'charity_is_cio': False,
+        'cio_is_dissolved': False,
+        'date_cio_dissolution_notice': '',
+        'charity_gift_aid': True,
+    })
+
+def synthetic_companies_house(n: int, register: pd.DataFrame, postcodes: pd.Series, rng) -> pd.DataFrame:
+    """
+    Companies House basic company data, with the padded ' CompanyNumber'
+    header. Most charitable companies appear; the rest are other companies.
+    """
+    charity_numbers = register['charity_company_registration_number']
+    charity_numbers = charity_numbers[charity_numbers != ''].unique()
+    charity_numbers = charity_numbers[rng.random(len(charity_numbers)) < 0.9][:n]
+    others = [f"{x:08d}" for x in rng.integers(20_000_000, 99_999_999, n - len(charity_numbers))]
+    numbers = np.concatenate([charity_numbers, others])
+    rng.shuffle(numbers)
+    return pd.DataFrame({
+        'CompanyName': [f"Company {x}" for x in numbers],
+        ' CompanyNumber': numbers,
+        'RegAddress.AddressLine1': 'Address line',
+        'RegAddress.PostTown': 'Town',
+        'RegAddress.PostCode': postcodes.to_numpy()[rng.integers(0, len(postcodes), len(numbers))],
+        'CompanyCategory': 'Private Limited Company',
+        'CompanyStatus': rng.choice(['Active', 'Dissolved', 'Liquidation'], len(numbers), p=[0.7, 0.2, 0.1]),
+        'IncorporationDate': '01/01/2000',
+    })
+
+def synthetic_charity_web(n: int, register: pd.DataFrame, postcodes: pd.Series, rng) -> pd.DataFrame:
+    """
+    Register of Charities web extract (charityNumber, name, postalCode,
+    latestIncome) for a subset of charities.
+    """
+    rows = register.drop_duplicates('registered_charity_number').sample(
+        n=min(n, register['registered_charity_number'].nunique()), random_state=int(rng.integers(1 << 31))
+    )
+    return pd.DataFrame({
+        'charityNumber': rows['registered_charity_number'].to_numpy(),
+        'name': rows['charity_name'].to_numpy(),
+        'postalCode': postcodes.to_numpy()[rng.integers(0, len(postcodes), len(rows))],
+        'latestIncome': rng.lognormal(10, 2.2, len(rows)).round(0),
+    })
+
+def synthetic_classification(n: int, register: pd.DataFrame, rng) -> pd.DataFrame:
+    """
+    Charity classification table: several what/who/how rows per charity.
+    """
+    numbers = rng.choice(register['registered_charity_number'].unique(), n)
+    return pd.DataFrame({
+        'date_of_extract': '2025-01-01',
+        'organisation_number': rng.integers(0, len(register), n),
+        'registered_charity_number': numbers,
+        'linked_charity_number': 0,
+        'classification_code': rng.integers(101, 310, n),
+        'classification_type': rng.choice(['What', 'Who', 'How'], n),
+        'classification_description': rng.choice(DESCRIPTIONS, n),
+    })
+
+def receipts_sheet(year: str, authorities: pd.DataFrame, services: list, rng) -> pd.DataFrame:
+    """
+    One receipts sheet as raw cells, laid out as SHEET_LAYOUT describes:
+    `skiprows` title rows, then either a service header row with the id
+    names on row `header_row` below it (older sheets) or one header row
+    with '<service>: Disposal of tangible fixed assets' columns.
+    """
+    layout = SHEET_LAYOUT[year]
+    n = len(authorities)
+    names = authorities['LAD23NM'].to_numpy().astype(object)
+    # Unitary authorities are sometimes suffixed, as in the published tables
+    names = np.where(rng.random(n) < 0.2, names + ' UA', names)
+    values = rng.lognormal(6, 1.5, (n, len(services))).round(0)
+    values[rng.random(values.shape) < 0.05] = np.nan
+
+    if 'start_col' in layout:
+        ids = ['E-code', 'ONS code', 'LA name', 'Class', 'Subclass', 'Certification complete'][:layout['start_col']]
+        header = ids + [f"{s}: Disposal of tangible fixed assets" for s in services] + [f"{s}: Other receipts" for s in services[:3]]
+        id_cells = [
+            [f"E{i:04d}", f"E0{i:07d}", names[i], 'SD', 'SD', 'Y'][:len(ids)] for i in range(n)
+        ]
+        rows = [ids_row + list(value_row) + [0, 0, 0] for ids_row, value_row in zip(id_cells, values)]
+        table = [header] + rows
+    else:
+        n_ids = layout['rename_from_col']
+        ids = ['E-code', 'ONS code', 'LA name', 'Class', 'Subclass'][:n_ids] if year != '2014' else ['Ecode', 'LA name', 'Class']
+        # Service names sit in the top row; an unnamed sub-column follows the first service
+        header = [''] * n_ids + [services[0], ''] + services[1:]
+        # The id names share a row with each service's sub-heading
+        sub_rows = [[''] * len(header) for _ in range(layout['header_row'] + 1)]
+        sub_rows[layout['header_row']] = ids + ['Disposal of tangible fixed assets'] * (len(header) - n_ids)
+        id_cells = [[f"E{i:04d}", f"E0{i:07d}", names[i], 'SD', 'SD'][:n_ids] if year != '2014'
+                    else [f"E{i:04d}", names[i], 'SD'] for i in range(n)]
+        rows = [ids_row + [v[0], 0] + list(v[1:]) for ids_row, v in zip(id_cells, values)]
+        table = [header] + sub_rows + rows
+    title = [[f"Capital receipts {year}"] + [''] * (len(table[0]) - 1) for _ in range(layout['skiprows'])]
+    return pd.DataFrame(title + table)
+
+def write_receipts_workbook(filepath: str, authorities: pd.DataFrame, rng):
+    """
+    Write the ten-sheet receipts workbook, one sheet per SHEET_LAYOUT year.
+    """
+    with pd.ExcelWriter(filepath) as writer:
+        for year in SHEET_LAYOUT:
+            services = [s.title() for s in SERVICES if rng.random() < 0.8]
+            sheet = receipts_sheet(year, authorities, ['All services total'] + services, rng)
+            sheet.to_excel(writer, sheet_name=year, header=False, index=False)
+
+def write_inputs(directory: str, scale: float = 1, seed: int = 0) -> dict:
+    """
+    Generate every raw input at `scale` times the production row counts
+    into `directory`, named as in data/raw. The local authorities (and so
+    the receipts workbook) stay at N_AUTHORITIES. Returns the paths and
+    row counts.
+    """
+    rng = np.random.default_rng(seed)
+    rows = scaled_rows(scale)
+    authorities = synthetic_authorities(N_AUTHORITIES)
+    onspd = synthetic_onspd(rows['onspd'], authorities, rng)
+    register = synthetic_charity_register(rows['charity_register'], onspd['pcds'], rng)
+    inputs = {
+        'charity': register,
+        'company_house': synthetic_companies_house(rows['companies_house'], register, onspd['pcds'], rng),
+        'charity_web': synthetic_charity_web(rows['charity_web'], register, onspd['pcds'], rng),
+        'local_authority': authorities,
+        'category': synthetic_classification(rows['classification'], register, rng),
+        'onspd': onspd,
+    }
+    paths = {
+        'charity': 'charities_RegisteredCharitiesInEnglandAndWales2025.csv',
+        'company_house': 'companyHouseData2025.csv',
+        'charity_web': 'registeredCharityDataFromWeb.csv',
+        'local_authority': 'local_authority_names_and_codes_ONSPD2023.csv',
+        'category': 'charityClassification_RegisteredCharitiesInEnglandAndWales2025.csv',
+        'onspd': 'match_postcode_ONSPD2025.csv',
+    }
+    paths = {name: os.path.join(directory, filename) for name, filename in paths.items()}
+    for name, frame in inputs.items():
+        frame.to_csv(paths[name], index=False)
+    paths['receipts'] = os.path.join(directory, 'council_disposal_receipts.xlsx')
+    write_receipts_workbook(paths['receipts'], authorities, rng)
+    counts = {name: len(frame) for name, frame in inputs.items()}
+    counts['receipts_authorities'] = len(authorities)
+    return {'paths': paths, 'rows': counts}
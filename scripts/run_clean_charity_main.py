@@ -1,21 +1,71 @@
 import sys
 import os
+import argparse
 import pandas as pd
 
 # Add project root to system path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from src.cleaning.clean_charity_main import clean_charity_main
+from src.cleaning.cache import cached_read
+from src.cleaning.charity_store import save_charity_main
+from src.cleaning.load_raw import load_company_house
+from src.cleaning.postcodes import load_postcode_resolver
+from src.cleaning.profiling import enable_profiling, disable_profiling, stage
 
 if __name__ == '__main__':
-    charity = pd.read_csv('data/raw/charities_RegisteredCharitiesInEnglandAndWales2025.csv', low_memory=False)
-    company_house = pd.read_csv('data/raw/companyHouseData2025.csv', low_memory=False)
-    charity_web = pd.read_csv('data/raw/registeredCharityDataFromWeb.csv', low_memory=False)
-    postcodes = pd.read_csv('data/raw/match_postcode_ONSPD2025.csv', low_memory=False)
-    local_authority = pd.read_csv('data/raw/local_authority_names_and_codes_ONSPD2023.csv', low_memory=False)
-    category = pd.read_csv('data/raw/charityClassification_RegisteredCharitiesInEnglandAndWales2025.csv', low_memory=False)
+    parser = argparse.ArgumentParser(description="Clean the charity register.")
+    parser.add_argument(
+        '--output', default='data/processed/charity_main_cleaned.csv',
+        help="Output path; use a .parquet path to keep compact dtypes."
+    )
+    parser.add_argument(
+        '--profile',
+        help="Write per-stage time, CPU, peak memory and row counts to this JSON file."
+    )
+    parser.add_argument(
+        '--cprofile-dir',
+        help="Also write a cProfile dump per top-level stage into this directory."
+    )
+    args = parser.parse_args()
+    if args.profile or args.cprofile_dir:
+        enable_profiling(cprofile_dir=args.cprofile_dir)
 
-    df = clean_charity_main(charity, company_house, charity_web, postcodes, local_authority, category)
-    df.to_csv('data/processed/charity_main_cleaned.csv', index=False)
+    with stage('read_inputs') as current:
+        charity = cached_read(pd.read_csv, 'data/raw/charities_RegisteredCharitiesInEnglandAndWales2025.csv', low_memory=False)
+        charity_web = cached_read(pd.read_csv, 'data/raw/registeredCharityDataFromWeb.csv', low_memory=False)
+        local_authority = cached_read(pd.read_csv, 'data/raw/local_authority_names_and_codes_ONSPD2023.csv', low_memory=False)
+        category = cached_read(pd.read_csv, 'data/raw/charityClassification_RegisteredCharitiesInEnglandAndWales2025.csv', low_memory=False)
+        current.output(charity, charity_web, local_authority, category)
 
-    print("Cleaned dataset saved to: data/processed/charity_main_cleaned.csv")
\ No newline at end of file
+    # Stream the large lookups, keeping only rows the charities can join to
+    company_house = load_company_house(
+        'data/raw/companyHouseData2025.csv',
+        company_numbers=charity['charity_company_registration_number']
+    )
+
+    # Postcode index over the full ONSPD, built once and kept in the cache
+    with stage('load_postcode_resolver'):
+        resolver = load_postcode_resolver('data/raw/match_postcode_ONSPD2025.csv', local_authority)
+
+    with stage('clean_charity_main', charity, company_house, charity_web, category) as current:
+        df, report = clean_charity_main(
+            charity, company_house, charity_web, resolver, local_authority, category, report=True
+        )
+        current.output(df)
+    with stage('save_charity_main', df):
+        save_charity_main(df, args.output)
+
+    print(f"Join match rates: {report['join_match_rates'].round(4).to_dict()}")
+    print(f"Local authority matches by postcode level: {report['postcode_matches'].to_dict()}")
+    unmapped = report['unmapped_classifications']
+    if not unmapped.empty:
+        print(f"Classification descriptions without a category group: {unmapped.to_dict()}")
+    print(f"Cleaned dataset saved to: {args.output}")
+
+    profiler = disable_profiling()
+    if profiler is not None:
+        print(profiler.summary().drop(columns=['cprofile'], errors='ignore').to_string(index=False))
+        if args.profile:
+            profiler.to_json(args.profile)
+            print(f"Stage profile saved to: {args.profile}")
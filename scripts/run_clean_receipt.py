@@ -1,68 +1,185 @@
 import sys
 import os
+import argparse
 import pandas as pd
 
 # Add project root to system path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from src.cleaning.clean_receipt import (
-    YEAR_SKIP_MAPPING, 
-    merge_columns, 
-    unified_map, 
+    SHEET_LAYOUT, 
+    PANEL_CATEGORIES,
     flat_lookup, 
-    non_england_keywords,
-    clean_sheet, 
-    rename_and_filter_disposal, 
-    basic_cleaning, 
-    merge_columns_func, 
-    clean_local_authority, 
+    non_england_names,
+    LocalAuthorityNormaliser, 
     apply_local_authority_cleaning, 
     filter_non_england, 
-    melt_disposal, 
-    create_complete_panel
+    melt_sheet, 
+    count_removals
+)
+from src.cleaning.load_raw import load_receipt_sheets
+from src.cleaning.charity_store import load_charity_main
+from src.cleaning.profiling import enable_profiling, disable_profiling, stage
+from src.cleaning.incremental import (
+    save_year_long,
+    remove_year,
+    prune_years,
+    save_removals,
+    charity_changed,
+    record_charity,
+    categories_changed,
+    record_categories,
+    stored_years,
+    rebuild_panel_years,
+    assemble_panel
+)
+from src.cleaning.partitioned import (
+    PARTITION_DIR,
+    N_PARTITIONS,
+    partition_inputs,
+    build_partitioned_panel,
+    write_panel_csv
 )
 
 DISPOSAL_FILEPATH = "data/raw/council_disposal_receipts.xlsx"
 CHARITY_DATASET_PATH = "data/processed/charity_main_cleaned.csv"
 
-# Step 1: Load disposal datasets
-dfs = []
-for year, skip_row in YEAR_SKIP_MAPPING.items():
-    df = pd.read_excel(DISPOSAL_FILEPATH, skiprows=skip_row, sheet_name=year)
-    dfs.append(df)
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build the final panel dataset.")
+    parser.add_argument(
+        '--years', nargs='+',
+        help="Only reprocess these receipt sheets (e.g. --years 2023) and "
+             "rebuild the panel years that depend on them."
+    )
+    parser.add_argument(
+        '--charity-path', default=CHARITY_DATASET_PATH,
+        help="Cleaned charity dataset, csv or the typed .parquet output."
+    )
+    parser.add_argument(
+        '--categories', nargs='+',
+        help="Build per-category panels for these receipt categories (or "
+             "'all'), stacked with a category column. By default only the "
+             "'all services total' panel is built."
+    )
+    parser.add_argument(
+        '--out-of-core', action='store_true',
+        help="Partition the charity dataset and melted receipts by local "
+             "authority into Parquet and build the panel one partition at a time."
+    )
+    parser.add_argument('--partitions', type=int, default=N_PARTITIONS, help="Partitions for --out-of-core.")
+    parser.add_argument('--workers', type=int, default=1, help="Worker processes building partitions.")
+    parser.add_argument(
+        '--chunksize', type=int, default=200_000,
+        help="Charity rows read at a time with --out-of-core."
+    )
+    parser.add_argument('--partition-dir', default=PARTITION_DIR)
+    parser.add_argument(
+        '--profile',
+        help="Write per-stage time, CPU, peak memory and row counts to this JSON file."
+    )
+    parser.add_argument(
+        '--cprofile-dir',
+        help="Also write a cProfile dump per top-level stage into this directory."
+    )
+    args = parser.parse_args()
+    if args.profile or args.cprofile_dir:
+        enable_profiling(cprofile_dir=args.cprofile_dir)
+
+    sheet_years = args.years or list(SHEET_LAYOUT)
+    unknown = [year for year in sheet_years if year not in SHEET_LAYOUT]
+    if unknown:
+        parser.error(f"No receipt sheet configured for: {', '.join(unknown)}")
 
-# Step 2: Clean sheets
-dfs[0] = clean_sheet(dfs[0], rename_from_col=3, header_row=1)
-dfs[1] = clean_sheet(dfs[1], rename_from_col=4, header_row=1)
-dfs[2] = clean_sheet(dfs[2], rename_from_col=4, header_row=2)
-dfs[3] = clean_sheet(dfs[3], rename_from_col=5, header_row=0)
-dfs[4] = clean_sheet(dfs[4], rename_from_col=5, header_row=0)
+    # Sheets keep only the categories the panel is built from (None keeps all)
+    if args.categories is None:
+        sheet_categories, panel_categories = PANEL_CATEGORIES, None
+    elif args.categories == ['all']:
+        sheet_categories, panel_categories = None, 'all'
+    else:
+        sheet_categories, panel_categories = args.categories, args.categories
+    if args.years and args.out_of_core:
+        parser.error("--years refreshes the in-memory panel store; --out-of-core always rebuilds.")
+    if args.years and categories_changed(sheet_categories):
+        parser.error("Stored receipts were built for other categories; rerun without --years.")
 
-for i in range(5, 10):
-    dfs[i] = rename_and_filter_disposal(dfs[i], start_col=5 if i < 9 else 6)
+    # Step 1-4: Load, clean and merge columns of the disposal sheets in parallel
+    dfs, aliases = load_receipt_sheets(
+        DISPOSAL_FILEPATH, sheet_years, report=True, categories=sheet_categories
+    )
+    if not aliases.empty:
+        print("Merged column aliases by year:")
+        print(pd.crosstab([aliases['column'], aliases['alias']], aliases['year']).to_string())
 
-# Step 3: Basic cleaning
-dfs = [basic_cleaning(df, i) for i, df in enumerate(dfs)]
+    # Step 5-6: Local authority cleaning on the sheets
+    normaliser = LocalAuthorityNormaliser(flat_lookup)
+    cleaned, _ = apply_local_authority_cleaning(list(dfs.values()), pd.DataFrame(), flat_lookup, normaliser)
+    dfs = dict(zip(dfs, cleaned))
 
-# Step 4: Merge columns
-dfs = merge_columns_func(dfs, merge_columns)
+    if args.out_of_core:
+        # Step 7-8: Partition the charity dataset and melted receipts by local authority
+        with stage('partition_inputs', dfs):
+            dropped = partition_inputs(
+                dfs, args.charity_path, args.partition_dir, args.partitions,
+                args.chunksize, panel_categories, normaliser
+            )
+        print(f"Dropped {dropped.sum()} non-England charities: {dropped.to_dict()}")
 
-# Step 5: Load charity dataset
-charity_df = pd.read_csv(CHARITY_DATASET_PATH)
+        # Step 9: Removal counts and panel rows per partition
+        with stage('partition_panel'):
+            rows = build_partitioned_panel(args.partition_dir, panel_categories, workers=args.workers)
 
-# Step 6: Local authority cleaning
-dfs, charity_df = apply_local_authority_cleaning(dfs, charity_df, flat_lookup)
+        # Step 10: Merge the sorted partitions into the final csv
+        with stage('export'):
+            write_panel_csv("data/processed/final_panel_data.csv", args.partition_dir, panel_categories)
+        print(f"Built {rows} panel rows in {args.partitions} partitions under {args.partition_dir}")
+        print("Final panel dataset saved to data/processed/final_panel_data.csv")
+    else:
+        # Step 7: Removal counts, only recomputed when the charity dataset changed
+        refresh_charity = args.years is None or charity_changed(args.charity_path)
+        if refresh_charity:
+            with stage('removals') as current:
+                charity_df = load_charity_main(args.charity_path)
+                _, charity_df = apply_local_authority_cleaning([], charity_df, flat_lookup, normaliser)
+                charity_df, dropped = filter_non_england(charity_df, non_england_names, report=True)
+                removals = count_removals(charity_df)
+                save_removals(removals)
+                current.output(removals)
+            print(f"Dropped {dropped.sum()} non-England charities: {dropped.to_dict()}")
+            record_charity(args.charity_path)
 
-# Step 7: Filter out non-England charities
-charity_df = filter_non_england(charity_df, non_england_keywords)
+        # Step 8: Melt disposal data and store one long frame per year
+        with stage('melt', dfs):
+            melted = []
+            for year, df in dfs.items():
+                if df.empty or 'local_authority' not in df.columns:
+                    continue
+                save_year_long(melt_sheet(df, int(year)), int(year))
+                melted.append(int(year))
+            # Drop stored years whose sheet produced no receipts
+            if args.years is None:
+                prune_years(melted)
+            else:
+                for year in set(map(int, dfs)) - set(melted):
+                    remove_year(year)
+        record_categories(sheet_categories)
 
-# Step 8: Melt disposal data
-disposal_long_df = melt_disposal(dfs)
+        # Step 9: Rebuild the affected panel years and assemble the final panel
+        changed_years = stored_years() if refresh_charity else [int(year) for year in dfs]
+        with stage('panel_build') as current:
+            rebuilt = rebuild_panel_years(changed_years, categories=panel_categories)
+            final_panel = assemble_panel()
+            current.output(final_panel)
 
-# Step 9: Create final panel dataset
-final_panel = create_complete_panel(disposal_long_df, charity_df)
+        # Step 10: Export final dataset
+        with stage('export', final_panel):
+            final_panel.to_csv("data/processed/final_panel_data.csv", index=False)
 
-# Step 10: Export final dataset
-final_panel.to_csv("data/processed/final_panel_data.csv", index=False)
+        print(f"Rebuilt panel years: {', '.join(map(str, rebuilt))}")
+        print("Final panel dataset saved to data/processed/final_panel_data.csv")
 
-print("Final panel dataset saved to data/processed/final_panel_data.csv")
\ No newline at end of file
+    profiler = disable_profiling()
+    if profiler is not None:
+        print(profiler.summary().drop(columns=['cprofile'], errors='ignore').to_string(index=False))
+        if args.profile:
+            profiler.to_json(args.profile)
+            print(f"Stage profile saved to: {args.profile}")
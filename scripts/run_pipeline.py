@@ -0,0 +1,53 @@
+import sys
+import os
+import argparse
+
+# Add project root to system path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.cleaning.pipeline import PIPELINE_DIR
+from src.cleaning.profiling import enable_profiling, disable_profiling
+from src.cleaning.tasks import cleaning_pipeline
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Run both cleaning pipelines, skipping tasks whose inputs are unchanged."
+    )
+    parser.add_argument(
+        'targets', nargs='*',
+        help="Tasks to bring up to date, with everything they depend on (all by default)."
+    )
+    parser.add_argument(
+        '--categories', nargs='+',
+        help="Build per-category panels for these receipt categories (or 'all')."
+    )
+    parser.add_argument('--workers', type=int, help="Worker processes (1 runs tasks in this process).")
+    parser.add_argument('--force', action='store_true', help="Rerun every task.")
+    parser.add_argument('--pipeline-dir', default=PIPELINE_DIR)
+    parser.add_argument(
+        '--profile',
+        help="Write per-stage time, CPU, peak memory and row counts to this JSON file."
+    )
+    args = parser.parse_args()
+
+    categories = 'all' if args.categories == ['all'] else args.categories
+    pipeline = cleaning_pipeline(args.pipeline_dir, categories=categories)
+    unknown = [name for name in args.targets if name not in pipeline.tasks]
+    if unknown:
+        parser.error(f"Unknown tasks: {', '.join(unknown)}. Tasks: {', '.join(pipeline.order)}")
+    if args.profile:
+        enable_profiling()
+
+    status = pipeline.run(args.targets or None, max_workers=args.workers, force=args.force)
+    for name, state in status.items():
+        print(f"{name}: {state}")
+    # Match rates and dropped rows of the tasks that ran
+    ran = [name for name, state in status.items() if state == 'ran']
+    for name, report in pipeline.reports(ran).items():
+        for key, value in report.items():
+            print(f"{name} {key}: {value}")
+
+    profiler = disable_profiling()
+    if profiler is not None:
+        profiler.to_json(args.profile)
+        print(f"Stage profile saved to: {args.profile}")
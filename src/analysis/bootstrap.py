@@ -0,0 +1,320 @@
+# bootstrap.py
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from src.analysis.fixed_effects import FIXED_EFFECTS, demean, encode_fixed_effects, panel_design
+
+# Webb's six-point distribution, for wild bootstraps with few clusters
+WEBB_POINTS = np.array([-np.sqrt(1.5), -1.0, -np.sqrt(0.5), np.sqrt(0.5), 1.0, np.sqrt(1.5)])
+WILD_WEIGHTS = ['rademacher', 'webb', 'mammen']
+
+def wild_weights(rng: np.random.Generator, n_clusters: int, size: int, kind: str = 'rademacher') -> np.ndarray:
+    """
+    n_clusters x size matrix of cluster-level wild bootstrap weights.
+    """
+    if kind == 'rademacher':
+        return rng.integers(0, 2, (n_clusters, size)) * 2.0 - 1.0
+    if kind == 'webb':
+        return WEBB_POINTS[rng.integers(0, 6, (n_clusters, size))]
+    if kind == 'mammen':
+        root5 = np.sqrt(5)
+        low = rng.random((n_clusters, size)) < (root5 + 1) / (2 * root5)
+        return np.where(low, -(root5 - 1) / 2, (root5 + 1) / 2)
+    raise ValueError(f"Unknown wild bootstrap weights: {kind}. Use one of {WILD_WEIGHTS}")
+
+class WithinDesign:
+    """
+    The fit_panel_model regression prepared once for resampling: outcome
+    and regressors with the fixed effects absorbed, (X'X)^-1, the cluster
+    indicator and per-cluster cross products. Every replication after
+    this only multiplies small cluster-level matrices.
+    """
+    def __init__(
+            self,
+            panel: pd.DataFrame,
+            variables: list,
+            category: str = 'size_category',
+            fixed_effects: list = FIXED_EFFECTS,
+            cluster: str = 'local_authority',
+            outcome: str = 'removals',
+            tol: float = 1e-10
+        ):
+        design = panel_design(panel, variables, category, fixed_effects, cluster, outcome)
+        self.rows = design['X'].index
+        self.names = list(design['X'].columns)
+        self.X_raw = design['X'].to_numpy(dtype=float)
+        self.tol = tol
+        self.encoded = encode_fixed_effects(design['fixed_effects'])
+        demeaned = demean(
+            np.column_stack([design['y'].to_numpy(dtype=float), self.X_raw]), self.encoded, tol
+        )
+        self.y, self.X = demeaned[:, 0], demeaned[:, 1:]
+        self.xtx_inv = np.linalg.pinv(self.X.T @ self.X)
+        self.beta = self.xtx_inv @ (self.X.T @ self.y)
+        self.resid = self.y - self.X @ self.beta
+
+        n, k = self.X.shape
+        self.cluster_codes, levels = pd.factorize(design['clusters'])
+        self.n_clusters = len(levels)
+        self.cluster_indicator = sparse.csr_matrix(
+            (np.ones(n), (self.cluster_codes, np.arange(n))), shape=(self.n_clusters, n)
+        )
+        # Same small-sample correction as fit_fixed_effects
+        self.correction = (
+            self.n_clusters / (self.n_clusters - 1) * (n - 1) / (n - design['k_columns'])
+        )
+        # X_g'X_g of each cluster (G x k x k)
+        self.cluster_xtx = (
+            self.cluster_indicator @ (self.X[:, :, np.newaxis] * self.X[:, np.newaxis, :]).reshape(n, k * k)
+        ).reshape(self.n_clusters, k, k)
+
+    def scores(self, resid: np.ndarray) -> np.ndarray:
+        """
+        Cluster score matrix (G x k): X_g' resid_g of each cluster.
+        """
+        return self.cluster_indicator @ (self.X * resid[:, np.newaxis])
+
+    def std_errors(self, scores: np.ndarray) -> np.ndarray:
+        projected = scores @ self.xtx_inv
+        return np.sqrt(self.correction * (projected ** 2).sum(axis=0))
+
+    def restricted_fit(self, j: int):
+        """
+        Coefficients (with 0 at `j`) and residuals of the fit under
+        H0: beta_j = 0.
+        """
+        keep = np.arange(self.X.shape[1]) != j
+        X_r = self.X[:, keep]
+        beta_r = np.linalg.pinv(X_r.T @ X_r) @ (X_r.T @ self.y)
+        beta = np.zeros(self.X.shape[1])
+        beta[keep] = beta_r
+        return beta, self.y - X_r @ beta_r
+
+    def fixed_effect_terms(self):
+        """
+        Dummy matrix D of all fixed effects, pinv(D'D), and the per-cluster
+        sums X_g'D_g (G x levels x k), used to re-absorb the fixed effects
+        of each bootstrap outcome without demeaning it.
+        """
+        if not hasattr(self, '_fixed_effect_terms'):
+            D = sparse.hstack([fe['indicators'] for fe in self.encoded]).tocsr()
+            dtd_pinv = np.linalg.pinv((D.T @ D).toarray())
+            cluster_dummy_sums = np.zeros((self.n_clusters, D.shape[1], self.X.shape[1]))
+            offset = 0
+            for fe in self.encoded:
+                np.add.at(cluster_dummy_sums, (self.cluster_codes, fe['codes'] + offset), self.X)
+                offset += len(fe['counts'])
+            self._fixed_effect_terms = (D, dtd_pinv, cluster_dummy_sums)
+        return self._fixed_effect_terms
+
+class WildKernel:
+    """
+    Bootstrap t statistics of a wild cluster bootstrap as linear maps of
+    the cluster weights. For outcome y* = X beta0 + resid * w (w constant
+    within a cluster), the refitted coefficient is beta0 + (X'X)^-1 S w
+    and the refit's cluster scores are M w, where S holds the cluster
+    scores of `resid` and M also removes the fixed effects and X fit of
+    resid * w. Each batch of weights is then two matrix products per
+    tested coefficient: one decomposition, many right-hand sides.
+    """
+    def __init__(self, design: WithinDesign, tested: list, impose_null: bool = True, weights: str = 'rademacher'):
+        D, dtd_pinv, cluster_dummy_sums = design.fixed_effect_terms()
+        self.weights = weights
+        self.n_clusters = design.n_clusters
+        self.correction = design.correction
+        self.shift, self.coef_maps, self.score_maps = [], [], []
+        for j in tested:
+            if impose_null:
+                beta0, resid = design.restricted_fit(j)
+                shift = beta0[j]
+            else:
+                beta0, resid, shift = design.beta, design.resid, 0.0
+            S = design.scores(resid)
+            coef_map = design.xtx_inv @ S.T
+            # Fixed effects of resid * w are pinv(D'D) D' diag(resid) C' w
+            fe_map = dtd_pinv @ (design.cluster_indicator @ D.multiply(resid[:, np.newaxis])).T.toarray()
+            # Refit scores projected on (X'X)^-1 row j, as a G x G map of the weights
+            row = design.xtx_inv[j]
+            score_map = (
+                np.diag(S @ row)
+                - (design.cluster_xtx @ row) @ coef_map
+                - (cluster_dummy_sums @ row) @ fe_map
+            )
+            self.shift.append(shift)
+            self.coef_maps.append(coef_map[j])
+            self.score_maps.append(score_map)
+        self.shift = np.array(self.shift)
+        self.coef_maps = np.array(self.coef_maps)
+        self.score_maps = np.array(self.score_maps)
+
+    def draw(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        """
+        t statistics (tested coefficients x size) of `size` replications.
+        """
+        W = wild_weights(rng, self.n_clusters, size, self.weights)
+        coef = self.shift[:, np.newaxis] + self.coef_maps @ W
+        projected = np.einsum('jgh,hb->jgb', self.score_maps, W)
+        se = np.sqrt(self.correction * (projected ** 2).sum(axis=1))
+        return coef / se
+
+class PermutationKernel:
+    """
+    Randomisation inference: receipts are reassigned between local
+    authorities by permuting authorities, so row (authority, size, year)
+    takes its regressors from (permuted authority, size, year). Authorities
+    are only exchanged with others observed in exactly the same size and
+    year cells, so every permutation keeps the estimation sample. Each
+    batch of permutations is demeaned together and solved as a stack.
+    """
+    def __init__(self, design: WithinDesign, panel: pd.DataFrame, tested: list, unit: str = 'local_authority'):
+        self.design = design
+        self.tested = list(tested)
+        rows = panel.loc[design.rows]
+        units, unit_levels = pd.factorize(rows[unit])
+        cells = rows[[col for col in ('size_category', 'financial_year', 'category') if col in rows.columns]]
+        cell_codes = pd.MultiIndex.from_frame(cells).factorize()[0]
+        # Row of each (unit, cell), and units grouped by the cells they cover
+        self.row_of = np.full((len(unit_levels), cell_codes.max() + 1), -1)
+        self.row_of[units, cell_codes] = np.arange(len(rows))
+        coverage = [self.row_of[u] >= 0 for u in range(len(unit_levels))]
+        _, self.exchange_groups = np.unique(np.array(coverage), axis=0, return_inverse=True)
+        self.exchange_groups = self.exchange_groups.ravel()
+        self.units, self.cell_codes = units, cell_codes
+
+    def permuted_units(self, rng: np.random.Generator) -> np.ndarray:
+        permutation = np.arange(len(self.exchange_groups))
+        for group in np.unique(self.exchange_groups):
+            members = np.flatnonzero(self.exchange_groups == group)
+            permutation[members] = rng.permutation(members)
+        return permutation
+
+    def draw(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        design = self.design
+        n, k = design.X.shape
+        sources = np.column_stack([
+            self.row_of[self.permuted_units(rng)[self.units], self.cell_codes] for _ in range(size)
+        ])
+        X = design.X_raw[sources].transpose(0, 2, 1).reshape(n, k * size)
+        X = demean(X, design.encoded, design.tol).reshape(n, k, size).transpose(2, 0, 1)
+        xtx = np.einsum('bnk,bnl->bkl', X, X)
+        xtx_inv = np.linalg.pinv(xtx)
+        beta = np.einsum('bkl,bl->bk', xtx_inv, np.einsum('bnk,n->bk', X, design.y))
+        resid = design.y[np.newaxis, :] - np.einsum('bnk,bk->bn', X, beta)
+        scores = np.stack([design.cluster_indicator @ (X[b] * resid[b][:, np.newaxis]) for b in range(size)])
+        projected = np.einsum('bgk,bkj->bgj', scores, xtx_inv[:, :, self.tested])
+        se = np.sqrt(design.correction * (projected ** 2).sum(axis=1))
+        return (beta[:, self.tested] / se).T
+
+_worker_kernel = None
+
+def _init_kernel(kernel):
+    global _worker_kernel
+    _worker_kernel = kernel
+
+def _draw_chunk(seed, size):
+    return _worker_kernel.draw(np.random.default_rng(seed), size)
+
+def run_replications(kernel, reps: int, batch_size: int, seed: int = 0, n_jobs: int = 1) -> np.ndarray:
+    """
+    `reps` replications drawn in batches of `batch_size`, each batch from
+    its own child of SeedSequence(seed). Results are the same for any
+    `n_jobs`; batches are spread over a process pool when n_jobs > 1.
+    """
+    sizes = [batch_size] * (reps // batch_size) + ([reps % batch_size] if reps % batch_size else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    if n_jobs == 1:
+        return np.concatenate([kernel.draw(np.random.default_rng(s), size) for s, size in zip(seeds, sizes)], axis=1)
+    with ProcessPoolExecutor(
+            max_workers=n_jobs or os.cpu_count(),
+            initializer=_init_kernel,
+            initargs=(kernel,)) as pool:
+        return np.concatenate(list(pool.map(_draw_chunk, seeds, sizes)), axis=1)
+
+def tested_columns(design: WithinDesign, coefficients: list = None) -> list:
+    """
+    Positions of the tested coefficients: `coefficients` by name, or every
+    column except the size category intercepts.
+    """
+    if coefficients is None:
+        return [i for i, name in enumerate(design.names) if not name.startswith('C(')]
+    unknown = [name for name in coefficients if name not in design.names]
+    if unknown:
+        raise KeyError(f"Not in the model: {unknown}")
+    return [design.names.index(name) for name in coefficients]
+
+def wild_cluster_bootstrap(
+        panel: pd.DataFrame,
+        variables: list,
+        reps: int = 9999,
+        weights: str = 'rademacher',
+        impose_null: bool = True,
+        coefficients: list = None,
+        alpha: float = 0.05,
+        seed: int = 0,
+        batch_size: int = 2000,
+        n_jobs: int = 1,
+        **model
+    ) -> pd.DataFrame:
+    """
+    Wild cluster bootstrap-t p-values for the fit_panel_model regression
+    (`model` takes its category, fixed_effects, cluster and outcome
+    arguments), clustered by local authority by default. With
+    `impose_null` (WCR) each coefficient is tested against zero with
+    residuals from the restricted fit; otherwise (WCU) the unrestricted
+    residuals are used and equal-tailed percentile-t intervals returned.
+    """
+    design = WithinDesign(panel, variables, **model)
+    tested = tested_columns(design, coefficients)
+    se = design.std_errors(design.scores(design.resid))
+    t = design.beta / se
+    draws = run_replications(WildKernel(design, tested, impose_null, weights), reps, batch_size, seed, n_jobs)
+
+    names = [design.names[j] for j in tested]
+    result = pd.DataFrame({
+        'coef': design.beta[tested],
+        'std_err': se[tested],
+        't': t[tested],
+        'p_boot': (np.abs(draws) >= np.abs(t[tested])[:, np.newaxis]).mean(axis=1),
+    }, index=names)
+    if not impose_null:
+        upper, lower = np.quantile(draws, [1 - alpha / 2, alpha / 2], axis=1)
+        result['ci_lower'] = result['coef'] - upper * result['std_err']
+        result['ci_upper'] = result['coef'] - lower * result['std_err']
+    result['reps'] = reps
+    return result
+
+def permutation_test(
+        panel: pd.DataFrame,
+        variables: list,
+        reps: int = 999,
+        coefficients: list = None,
+        seed: int = 0,
+        batch_size: int = 50,
+        n_jobs: int = 1,
+        **model
+    ) -> pd.DataFrame:
+    """
+    Randomisation p-values of the cluster-robust t statistics of the
+    fit_panel_model regression when receipts are permuted across local
+    authorities (see PermutationKernel), as (1 + #{|t*| >= |t|}) / (1 + reps).
+    """
+    design = WithinDesign(panel, variables, **model)
+    tested = tested_columns(design, coefficients)
+    se = design.std_errors(design.scores(design.resid))
+    t = design.beta / se
+    kernel = PermutationKernel(design, panel, tested)
+    draws = run_replications(kernel, reps, batch_size, seed, n_jobs)
+
+    extreme = (np.abs(draws) >= np.abs(t[tested])[:, np.newaxis]).sum(axis=1)
+    return pd.DataFrame({
+        'coef': design.beta[tested],
+        'std_err': se[tested],
+        't': t[tested],
+        'p_perm': (1 + extreme) / (1 + reps),
+        'reps': reps,
+    }, index=[design.names[j] for j in tested])
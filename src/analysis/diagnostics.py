@@ -0,0 +1,367 @@
+# diagnostics.py
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy import stats
+from statsmodels.tsa.adfvalues import mackinnonp
+
+UNIT = ['local_authority', 'size_category']
+TIME = 'financial_year'
+REGRESSIONS = {'n': 0, 'c': 1, 'ct': 2}
+LAG_CRITERIA = ['aic', 'bic']
+
+# KPSS (1992) table 1 critical values for p-values of 10%, 5%, 2.5% and 1%
+KPSS_CRITICAL = {'c': [0.347, 0.463, 0.574, 0.739], 'ct': [0.119, 0.146, 0.176, 0.216]}
+KPSS_PVALUES = [0.10, 0.05, 0.025, 0.01]
+
+def unit_matrix(panel: pd.DataFrame, column: str, unit=UNIT, time: str = TIME) -> pd.DataFrame:
+    """
+    One row per panel unit and one column per period, sorted by both.
+    Units not observed in a period get NaN.
+    """
+    return panel.set_index(list(unit) + [time])[column].unstack(time).sort_index().sort_index(axis=1)
+
+def lag_matrix(x: np.ndarray, lags: int) -> np.ndarray:
+    """
+    units x (periods - lags) x (lags + 1) view of x at lags 0, 1, ..., lags.
+    """
+    return sliding_window_view(x, lags + 1, axis=1)[:, :, ::-1]
+
+def deterministic_terms(n_units: int, n_obs: int, regression: str) -> list:
+    """
+    Constant and trend columns (units x obs) for a regression in REGRESSIONS.
+    """
+    if regression not in REGRESSIONS:
+        raise ValueError(f"Unknown regression: {regression}. Use one of {list(REGRESSIONS)}")
+    terms = [np.ones((n_units, n_obs)), np.broadcast_to(np.arange(1.0, n_obs + 1), (n_units, n_obs))]
+    return terms[:REGRESSIONS[regression]]
+
+def batch_ols(y: np.ndarray, X: np.ndarray):
+    """
+    OLS of each unit's y (units x obs) on its own design X (units x obs x k).
+    Returns coefficients, standard errors and residuals, all NaN for units
+    with missing values, a rank deficient design or an exact fit.
+    """
+    n_units, n_obs, k = X.shape
+    finite = np.isfinite(X).all(axis=(1, 2)) & np.isfinite(y).all(axis=1)
+    X, y = np.where(finite[:, np.newaxis, np.newaxis], X, 0), np.where(finite[:, np.newaxis], y, 0)
+    full_rank = finite & (np.linalg.matrix_rank(X) == k)
+    xtx = np.einsum('uok,uol->ukl', X, X)
+    xtx[~full_rank] = np.eye(k)
+    xtx_inv = np.linalg.inv(xtx)
+    beta = np.einsum('ukl,uol,uo->uk', xtx_inv, X, y)
+    resid = y - np.einsum('uok,uk->uo', X, beta)
+    ssr = (resid ** 2).sum(axis=1)
+    # An exact fit leaves residuals at rounding level of y
+    exact = ssr <= 1e-24 * (y ** 2).sum(axis=1)
+    valid = full_rank & ~exact
+    se = np.sqrt(ssr[:, np.newaxis] / (n_obs - k) * np.diagonal(xtx_inv, axis1=1, axis2=2))
+    beta[~valid], se[~valid], resid[~valid] = np.nan, np.nan, np.nan
+    return beta, se, resid
+
+def default_max_lags(n_periods: int, regression: str) -> int:
+    """
+    Schwert's rule, capped as adfuller caps it for short series.
+    """
+    return max(min(n_periods // 2 - REGRESSIONS[regression] - 1, int(np.ceil(12 * (n_periods / 100) ** 0.25))), 0)
+
+def mackinnon_pvalues(stat: np.ndarray, regression: str, n_series: int = 1) -> np.ndarray:
+    """
+    mackinnonp of each statistic (NaN where the statistic is). mackinnonp
+    takes one statistic at a time, so this loops in Python; the null
+    simulations skip p-values for that reason.
+    """
+    stat = np.asarray(stat, dtype=float)
+    p = [np.nan if np.isnan(s) else mackinnonp(s, regression=regression, N=n_series) for s in stat.ravel()]
+    return np.array(p, dtype=float).reshape(stat.shape)
+
+def adf_regression(x: np.ndarray, lags: int, regression: str, n_obs: int = None):
+    """
+    Differences and ADF design (lagged level, lagged differences, then the
+    deterministic terms) over the last `n_obs` usable periods of each unit.
+    """
+    dx = np.diff(x, axis=1)
+    windows = lag_matrix(dx, lags)
+    n_obs = windows.shape[1] if n_obs is None else n_obs
+    windows = windows[:, -n_obs:]
+    level = x[:, -n_obs - 1:-1, np.newaxis]
+    design = np.concatenate(
+        [level, windows[:, :, 1:]] + [t[:, :, np.newaxis] for t in deterministic_terms(len(x), n_obs, regression)],
+        axis=2
+    )
+    return windows[:, :, 0], design
+
+def adf_batch(
+        x: np.ndarray,
+        lags: int = 0,
+        regression: str = 'c',
+        autolag: str = None,
+        max_lags: int = None,
+        pvalues: bool = True
+    ) -> pd.DataFrame:
+    """
+    Augmented Dickey-Fuller test of every row of x (units x periods) as
+    adfuller computes it: a fixed number of `lags`, or with `autolag`
+    ('aic' or 'bic') the lag up to `max_lags` that minimises the criterion
+    on a common sample, refitted on all its observations. p-values are
+    MacKinnon's (NaN with `pvalues=False`); constant series get NaN.
+    """
+    n_units, n_periods = x.shape
+    chosen = np.full(n_units, lags)
+    if autolag is not None:
+        if autolag not in LAG_CRITERIA:
+            raise ValueError(f"Unknown autolag: {autolag}. Use one of {LAG_CRITERIA}")
+        max_lags = default_max_lags(n_periods, regression) if max_lags is None else max_lags
+        if max_lags > n_periods // 2 - REGRESSIONS[regression] - 1:
+            raise ValueError(f"max_lags ({max_lags}) is too long for {n_periods} periods and regression '{regression}'")
+        n_obs = n_periods - 1 - max_lags
+        criteria = np.full((n_units, max_lags + 1), np.inf)
+        for lag in range(max_lags + 1):
+            dx, design = adf_regression(x, lag, regression, n_obs)
+            _, _, resid = batch_ols(dx, design)
+            k = design.shape[2]
+            penalty = 2 * k if autolag == 'aic' else k * np.log(n_obs)
+            criteria[:, lag] = np.nan_to_num(n_obs * np.log((resid ** 2).sum(axis=1) / n_obs) + penalty, nan=np.inf)
+        # First minimum, so ties go to the shorter lag as in adfuller
+        chosen = criteria.argmin(axis=1)
+
+    stat = np.full(n_units, np.nan)
+    nobs = np.zeros(n_units, dtype=int)
+    for lag in np.unique(chosen):
+        rows = chosen == lag
+        dx, design = adf_regression(x[rows], lag, regression)
+        beta, se, _ = batch_ols(dx, design)
+        stat[rows] = beta[:, 0] / se[:, 0]
+        nobs[rows] = dx.shape[1]
+    return pd.DataFrame({
+        'stat': stat,
+        'p_value': mackinnon_pvalues(stat, regression) if pvalues else np.nan,
+        'lags': chosen,
+        'nobs': nobs,
+    })
+
+def kpss_batch(x: np.ndarray, regression: str = 'c', lags='auto', pvalues: bool = True) -> pd.DataFrame:
+    """
+    KPSS test of every row of x (units x periods) as kpss computes it, with
+    Bartlett long-run variance over `lags` lags ('auto' for Hobijn et al.'s
+    choice per unit, 'legacy' for Schwert's rule). p-values are interpolated
+    in the KPSS table, so lie between 1% and 10% (NaN with `pvalues=False`);
+    constant series get NaN.
+    """
+    n_units, n_obs = x.shape
+    if regression == 'ct':
+        design = np.stack(deterministic_terms(n_units, n_obs, 'ct'), axis=2)
+        _, _, resid = batch_ols(x, design)
+    elif regression == 'c':
+        resid = x - x.mean(axis=1, keepdims=True)
+    else:
+        raise ValueError(f"Unknown regression: {regression}. Use 'c' or 'ct'")
+    # Residual autocovariance sums at lags 0, ..., n_obs - 1
+    autocov = np.stack([(resid[:, i:] * resid[:, :n_obs - i]).sum(axis=1) for i in range(n_obs)], axis=1)
+
+    if lags == 'auto':
+        cov_lags = int(n_obs ** (2 / 9))
+        products = autocov[:, 1:cov_lags + 1] / (n_obs / 2)
+        s0 = autocov[:, 0] / n_obs + products.sum(axis=1)
+        s1 = (np.arange(1, cov_lags + 1) * products).sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            gamma = 1.1447 * ((s1 / s0) ** 2) ** (1 / 3)
+        chosen = np.minimum(np.nan_to_num(gamma * n_obs ** (1 / 3)).astype(int), n_obs - 1)
+    elif lags == 'legacy':
+        chosen = np.full(n_units, min(int(np.ceil(12 * (n_obs / 100) ** 0.25)), n_obs - 1))
+    else:
+        if lags >= n_obs:
+            raise ValueError(f"lags ({lags}) must be < number of observations ({n_obs})")
+        chosen = np.full(n_units, int(lags))
+
+    lag = np.arange(1, n_obs)
+    weights = np.where(lag <= chosen[:, np.newaxis], 1 - lag / (chosen[:, np.newaxis] + 1), 0)
+    long_run = (autocov[:, 0] + 2 * (weights * autocov[:, 1:]).sum(axis=1)) / n_obs
+    eta = (resid.cumsum(axis=1) ** 2).sum(axis=1) / n_obs ** 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        stat = np.where(autocov[:, 0] > 0, eta / long_run, np.nan)
+    p_value = np.where(np.isfinite(stat), np.interp(stat, KPSS_CRITICAL[regression], KPSS_PVALUES), np.nan)
+    return pd.DataFrame({
+        'stat': stat,
+        'p_value': p_value if pvalues else np.nan,
+        'lags': chosen,
+        'nobs': n_obs,
+    })
+
+def engle_granger_batch(
+        y: np.ndarray,
+        x: np.ndarray,
+        trend: str = 'c',
+        lags: int = None,
+        autolag: str = 'aic',
+        max_lags: int = None,
+        pvalues: bool = True
+    ) -> pd.DataFrame:
+    """
+    Engle-Granger test of no cointegration between each unit's y and x as
+    coint computes it: ADF without deterministic terms on the residuals of
+    y regressed on x and `trend`, with MacKinnon's two-variable p-values
+    (NaN with `pvalues=False`).
+    `lags` fixes the ADF lags (used as `max_lags` when autolag is set).
+    """
+    n_units, n_obs = y.shape
+    design = np.stack([x] + deterministic_terms(n_units, n_obs, trend), axis=2)
+    _, _, resid = batch_ols(y, design)
+    if autolag is None:
+        result = adf_batch(resid, 0 if lags is None else lags, regression='n', pvalues=False)
+    else:
+        result = adf_batch(
+            resid, regression='n', autolag=autolag, max_lags=lags if max_lags is None else max_lags, pvalues=False
+        )
+    result['p_value'] = mackinnon_pvalues(result['stat'], trend, n_series=2) if pvalues else np.nan
+    return result
+
+UNIT_TESTS = {'adf': adf_batch, 'kpss': kpss_batch, 'coint': engle_granger_batch}
+
+def _run_test(test, options, *arrays):
+    return UNIT_TESTS[test](*arrays, **options)
+
+def run_units(test: str, arrays: list, options: dict = None, n_jobs: int = 1, chunk_size: int = 500) -> pd.DataFrame:
+    """
+    A UNIT_TESTS test of every unit (row) of `arrays`, in chunks of
+    `chunk_size` units spread over a process pool when n_jobs > 1.
+    """
+    options = dict(options or {})
+    starts = range(0, len(arrays[0]), chunk_size)
+    chunks = [[a[start:start + chunk_size] for a in arrays] for start in starts]
+    func = partial(_run_test, test, options)
+    if n_jobs == 1 or len(chunks) == 1:
+        results = [func(*chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs or os.cpu_count()) as pool:
+            results = list(pool.map(func, *zip(*chunks)))
+    return pd.concat(results, ignore_index=True)
+
+def _simulate_null(test, options, n_obs, seed, size):
+    rng = np.random.default_rng(seed)
+    if test == 'kpss':
+        # Stationary null: white noise
+        arrays = [rng.standard_normal((size, n_obs))]
+    elif test == 'coint':
+        # No cointegration: independent random walks
+        arrays = [rng.standard_normal((size, n_obs)).cumsum(axis=1), rng.standard_normal((size, n_obs)).cumsum(axis=1)]
+    else:
+        arrays = [rng.standard_normal((size, n_obs)).cumsum(axis=1)]
+    return UNIT_TESTS[test](*arrays, **options, pvalues=False)['stat'].to_numpy()
+
+def null_distribution(
+        test: str,
+        n_obs: int,
+        options: dict = None,
+        reps: int = 20000,
+        seed: int = 0,
+        batch_size: int = 5000,
+        n_jobs: int = 1
+    ) -> np.ndarray:
+    """
+    Sorted simulated draws of a UNIT_TESTS statistic under its null for
+    series of `n_obs` periods, computed with the same options. Batches are
+    seeded from SeedSequence(seed), so the draws do not depend on n_jobs.
+    """
+    sizes = [batch_size] * (reps // batch_size) + ([reps % batch_size] if reps % batch_size else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    func = partial(_simulate_null, test, dict(options or {}), n_obs)
+    if n_jobs == 1 or len(sizes) == 1:
+        draws = [func(s, size) for s, size in zip(seeds, sizes)]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs or os.cpu_count()) as pool:
+            draws = list(pool.map(func, seeds, sizes))
+    draws = np.concatenate(draws)
+    return np.sort(draws[np.isfinite(draws)])
+
+def simulated_pvalues(stat, draws: np.ndarray, upper_tail: bool = False) -> np.ndarray:
+    """
+    Finite-sample p-values of statistics against sorted null draws,
+    (1 + #{draws at least as extreme}) / (1 + draws).
+    """
+    stat = np.asarray(stat, dtype=float)
+    if upper_tail:
+        extreme = len(draws) - np.searchsorted(draws, stat, side='left')
+    else:
+        extreme = np.searchsorted(draws, stat, side='right')
+    return np.where(np.isnan(stat), np.nan, (1 + extreme) / (1 + len(draws)))
+
+def panel_statistics(result: pd.DataFrame, draws: np.ndarray, upper_tail: bool = False, alpha: float = 0.05) -> pd.Series:
+    """
+    Combine one test's unit results (with their `p_sim` p-values): the mean
+    statistic standardised by the moments of the null draws (the IPS W
+    t-bar for ADF, a group-mean statistic for Engle-Granger and Hadri's for
+    KPSS, whose null rejects in the upper tail), and the Fisher (Maddala-Wu)
+    and Choi inverse normal combinations of the unit p-values. Simulated
+    moments and p-values stand in for the IPS tables and MacKinnon's
+    asymptotic p-values, neither of which fit series as short as the panel's.
+    """
+    valid = result.dropna(subset=['stat'])
+    n = len(valid)
+    z_bar = np.sqrt(n) * (valid['stat'].mean() - draws.mean()) / draws.std()
+    fisher = -2 * np.log(valid['p_sim']).sum()
+    choi_z = stats.norm.ppf(valid['p_sim'].clip(upper=1 - 1e-16)).sum() / np.sqrt(n)
+    return pd.Series({
+        'units': n,
+        'share_rejected': (valid['p_sim'] < alpha).mean(),
+        'mean_stat': valid['stat'].mean(),
+        'z_bar': z_bar,
+        'p_z_bar': stats.norm.sf(z_bar) if upper_tail else stats.norm.cdf(z_bar),
+        'fisher': fisher,
+        'p_fisher': stats.chi2.sf(fisher, 2 * n),
+        'choi_z': choi_z,
+        'p_choi': stats.norm.cdf(choi_z),
+    })
+
+def panel_diagnostics(
+        panel: pd.DataFrame,
+        columns: list = ('removals', 'value'),
+        outcome: str = 'removals',
+        regressor: str = 'value',
+        lags: int = 0,
+        regression: str = 'c',
+        autolag: str = None,
+        kpss_lags='auto',
+        null_reps: int = 20000,
+        seed: int = 0,
+        n_jobs: int = 1,
+        unit=UNIT,
+        time: str = TIME
+    ):
+    """
+    ADF and KPSS tests of each of `columns` and the Engle-Granger test of
+    `outcome` on `regressor`, separately for every panel unit (by default
+    local authority and size category), and their panel combinations.
+    Units with a missing period are left out. Returns the unit results
+    (columns by test and statistic, with `p_sim` the finite-sample p-value
+    against `null_reps` simulated draws) and one summary row per test.
+    """
+    wide = {column: unit_matrix(panel, column, unit, time) for column in set(columns) | {outcome, regressor}}
+    complete = np.logical_and.reduce([frame.notna().all(axis=1).to_numpy() for frame in wide.values()])
+    units = next(iter(wide.values())).index[complete]
+    arrays = {column: frame.to_numpy(dtype=float)[complete] for column, frame in wide.items()}
+    n_obs = arrays[outcome].shape[1]
+
+    adf_options = {'lags': lags, 'regression': regression, 'autolag': autolag}
+    coint_options = {'trend': regression, 'lags': lags, 'autolag': autolag}
+    kpss_options = {'regression': regression, 'lags': kpss_lags}
+    tests = {}
+    for column in columns:
+        tests[f'adf_{column}'] = ('adf', [arrays[column]], adf_options)
+        tests[f'kpss_{column}'] = ('kpss', [arrays[column]], kpss_options)
+    tests[f'coint_{outcome}_{regressor}'] = ('coint', [arrays[outcome], arrays[regressor]], coint_options)
+
+    results, summary, draws = {}, {}, {}
+    for name, (test, test_arrays, options) in tests.items():
+        if test not in draws:
+            draws[test] = null_distribution(test, n_obs, options, reps=null_reps, seed=seed, n_jobs=n_jobs)
+        result = run_units(test, test_arrays, options, n_jobs=n_jobs).set_index(units)
+        result['p_sim'] = simulated_pvalues(result['stat'], draws[test], upper_tail=test == 'kpss')
+        results[name] = result
+        summary[name] = panel_statistics(result, draws[test], upper_tail=test == 'kpss')
+    return pd.concat(results, axis=1), pd.DataFrame(summary).T
@@ -0,0 +1,273 @@
+# fixed_effects.py
+
+import numpy as np
+import pandas as pd
+from scipy import sparse, stats
+from scipy.sparse.csgraph import connected_components
+
+FIXED_EFFECTS = ['local_authority', 'financial_year']
+
+def indicator_matrix(codes: np.ndarray, n_levels: int) -> sparse.csr_matrix:
+    """
+    Sparse N x levels dummy matrix of one fixed effect.
+    """
+    n = len(codes)
+    return sparse.csr_matrix(
+        (np.ones(n), (np.arange(n), codes)), shape=(n, n_levels)
+    )
+
+def fixed_effect_encoding(name: str, codes: np.ndarray, n_levels: int) -> dict:
+    return {
+        'name': name,
+        'codes': codes,
+        'counts': np.bincount(codes, minlength=n_levels),
+        'indicators': indicator_matrix(codes, n_levels),
+    }
+
+def encode_fixed_effects(fixed_effects: pd.DataFrame) -> list:
+    """
+    Integer codes and sparse indicators for each fixed-effect column.
+    """
+    encoded = []
+    for col in fixed_effects.columns:
+        codes, levels = pd.factorize(fixed_effects[col], sort=True)
+        encoded.append(fixed_effect_encoding(col, codes, len(levels)))
+    return encoded
+
+def encode_codes(codes: dict) -> list:
+    """
+    encode_fixed_effects from integer codes ({name: codes}), renumbered to
+    the levels present. Codes of a sorted factorisation of a whole panel
+    give any subset of its rows the encoding of its own labels, so the
+    labels only need factorising once.
+    """
+    encoded = []
+    for name, fe_codes in codes.items():
+        fe_codes, levels = pd.factorize(np.asarray(fe_codes), sort=True)
+        encoded.append(fixed_effect_encoding(name, fe_codes, len(levels)))
+    return encoded
+
+def fixed_effect_rank(encoded: list) -> int:
+    """
+    Number of linearly independent dummy columns (including the intercept)
+    the absorbed fixed effects stand for. For two fixed effects this is
+    levels1 + levels2 - connected components of their bipartite graph.
+    """
+    levels = [len(fe['counts']) for fe in encoded]
+    if len(encoded) == 1:
+        return levels[0]
+    if len(encoded) == 2:
+        graph = encoded[0]['indicators'].T @ encoded[1]['indicators']
+        n_components, _ = connected_components(
+            sparse.bmat([[None, graph], [graph.T, None]]), directed=False
+        )
+        return sum(levels) - n_components
+    return sum(levels) - (len(encoded) - 1)
+
+def demean(matrix: np.ndarray, encoded: list, tol: float = 1e-10, max_iter: int = 10_000) -> np.ndarray:
+    """
+    Remove the fixed effects from every column by alternating projections:
+    subtract group means of each fixed effect in turn until nothing changes.
+    The dummy matrix is never built; group sums come from sparse products.
+    """
+    matrix = np.array(matrix, dtype=float, copy=True)
+    if matrix.ndim == 1:
+        matrix = matrix[:, np.newaxis]
+    scale = np.maximum(np.abs(matrix).max(axis=0), 1.0)
+    for _ in range(max_iter):
+        largest_step = 0.0
+        for fe in encoded:
+            means = (fe['indicators'].T @ matrix) / fe['counts'][:, np.newaxis]
+            matrix -= means[fe['codes']]
+            largest_step = max(largest_step, (np.abs(means).max(axis=0) / scale).max())
+        if largest_step < tol or len(encoded) == 1:
+            return matrix
+    raise RuntimeError(f"Fixed-effect demeaning did not converge in {max_iter} iterations")
+
+class FixedEffectsResult:
+    """
+    Coefficients and standard errors of an OLS fit with absorbed fixed
+    effects. Attribute names follow statsmodels results.
+    """
+    def __init__(self, params, cov, resid, nobs, df_resid, cov_type, n_clusters=None):
+        self.params = params
+        self.cov_params_ = cov
+        self.resid = resid
+        self.nobs = nobs
+        self.df_resid = df_resid
+        self.cov_type = cov_type
+        self.n_clusters = n_clusters
+        self.bse = pd.Series(np.sqrt(np.diag(cov)), index=params.index)
+        self.tvalues = params / self.bse
+        if cov_type == 'nonrobust':
+            self.pvalues = pd.Series(2 * stats.t.sf(np.abs(self.tvalues), df_resid), index=params.index)
+        else:
+            self.pvalues = pd.Series(2 * stats.norm.sf(np.abs(self.tvalues)), index=params.index)
+        self.ssr = float(resid @ resid)
+
+    def cov_params(self) -> pd.DataFrame:
+        return pd.DataFrame(self.cov_params_, index=self.params.index, columns=self.params.index)
+
+    def summary_frame(self) -> pd.DataFrame:
+        return pd.DataFrame({
+            'coef': self.params,
+            'std err': self.bse,
+            't': self.tvalues,
+            'P>|t|': self.pvalues,
+        })
+
+def fit_fixed_effects(
+        y: pd.Series,
+        X: pd.DataFrame,
+        fixed_effects: pd.DataFrame,
+        clusters: pd.Series = None,
+        tol: float = 1e-10,
+        k_columns: int = None
+    ) -> FixedEffectsResult:
+    """
+    OLS of y on X with the fixed effects absorbed by within-transformation.
+    By the Frisch-Waugh-Lovell theorem the coefficients and residuals equal
+    those of the dummy-variable regression; degrees of freedom count the
+    absorbed dummies, so nonrobust and cluster-robust standard errors match
+    statsmodels' `cov_type='nonrobust'` / `cov_type='cluster'` fits.
+
+    statsmodels' cluster correction (N-1)/(N-K) takes K as the design's
+    column count, which includes dummies of levels absent from the
+    estimation sample; pass that count as `k_columns` to reproduce it.
+    """
+    encoded = encode_fixed_effects(fixed_effects)
+    demeaned = demean(np.column_stack([y.to_numpy(dtype=float), X.to_numpy(dtype=float)]), encoded, tol)
+    return fit_demeaned(
+        demeaned[:, 0], demeaned[:, 1:], X.columns, fixed_effect_rank(encoded), clusters, k_columns
+    )
+
+def fit_demeaned(
+        y_tilde: np.ndarray,
+        X_tilde: np.ndarray,
+        columns,
+        absorbed_rank: int,
+        clusters: pd.Series = None,
+        k_columns: int = None
+    ) -> FixedEffectsResult:
+    """
+    The least squares step of fit_fixed_effects, on an outcome and
+    regressors that are already demeaned. `absorbed_rank` is the
+    fixed_effect_rank of the absorbed fixed effects.
+    """
+    xtx_inv = np.linalg.pinv(X_tilde.T @ X_tilde)
+    beta = xtx_inv @ (X_tilde.T @ y_tilde)
+    resid = y_tilde - X_tilde @ beta
+
+    nobs = len(y_tilde)
+    k_params = np.linalg.matrix_rank(X_tilde) + absorbed_rank
+    df_resid = nobs - k_params
+
+    if clusters is None:
+        cov = xtx_inv * (resid @ resid) / df_resid
+        cov_type, n_clusters = 'nonrobust', None
+    else:
+        cluster_codes, cluster_levels = pd.factorize(clusters)
+        n_clusters = len(cluster_levels)
+        scores = sparse.csr_matrix(
+            (np.ones(nobs), (cluster_codes, np.arange(nobs))), shape=(n_clusters, nobs)
+        ) @ (X_tilde * resid[:, np.newaxis])
+        meat = scores.T @ scores
+        k_correction = k_columns if k_columns is not None else k_params
+        correction = n_clusters / (n_clusters - 1) * (nobs - 1) / (nobs - k_correction)
+        cov = correction * xtx_inv @ meat @ xtx_inv
+        cov_type = 'cluster'
+
+    params = pd.Series(beta, index=columns)
+    return FixedEffectsResult(params, cov, resid, nobs, df_resid, cov_type, n_clusters)
+
+def size_interaction_design(
+        panel: pd.DataFrame,
+        variables: list,
+        category: str = 'size_category'
+    ) -> pd.DataFrame:
+    """
+    Regressors of `variables + C(category) + variable:C(category)` with
+    treatment coding against the first sorted level, named as patsy names
+    them in the regression notebook's formulas.
+    """
+    levels = sorted(panel[category].dropna().unique())[1:]
+    columns = {}
+    for level in levels:
+        columns[f'C({category})[T.{level}]'] = (panel[category] == level).astype(float)
+    for variable in variables:
+        columns[variable] = panel[variable].astype(float)
+    for variable in variables:
+        for level in levels:
+            columns[f'{variable}:C({category})[T.{level}]'] = (
+                panel[variable] * (panel[category] == level)
+            )
+    return pd.DataFrame(columns, index=panel.index)
+
+def absorbed_columns(panel: pd.DataFrame, fixed_effects: list = FIXED_EFFECTS) -> int:
+    """
+    Intercept and fixed-effect dummy columns a formula fit would create
+    from `panel`.
+    """
+    return 1 + sum(panel[fe].nunique() - 1 for fe in fixed_effects)
+
+def complete_rows(
+        panel: pd.DataFrame,
+        variables: list,
+        category: str = 'size_category',
+        fixed_effects: list = FIXED_EFFECTS,
+        cluster: str = 'local_authority',
+        outcome: str = 'removals'
+    ) -> np.ndarray:
+    """
+    Mask of the rows statsmodels keeps: no missing value in any column
+    the regression uses.
+    """
+    used = [outcome, category] + list(variables) + list(fixed_effects) + ([cluster] if cluster else [])
+    return panel[list(dict.fromkeys(used))].notna().all(axis=1).to_numpy()
+
+def panel_design(
+        panel: pd.DataFrame,
+        variables: list,
+        category: str = 'size_category',
+        fixed_effects: list = FIXED_EFFECTS,
+        cluster: str = 'local_authority',
+        outcome: str = 'removals'
+    ) -> dict:
+    """
+    Outcome, regressors, fixed effects and clusters of the fit_panel_model
+    regression, after dropping rows with missing values as statsmodels
+    does, and the column count a formula fit would have (`k_columns`).
+    """
+    k_columns = absorbed_columns(panel, fixed_effects)
+    panel = panel[complete_rows(panel, variables, category, fixed_effects, cluster, outcome)]
+    X = size_interaction_design(panel, variables, category)
+    return {
+        'y': panel[outcome],
+        'X': X,
+        'fixed_effects': panel[list(fixed_effects)],
+        'clusters': panel[cluster] if cluster else None,
+        'k_columns': k_columns + X.shape[1],
+    }
+
+def fit_panel_model(
+        panel: pd.DataFrame,
+        variables: list,
+        category: str = 'size_category',
+        fixed_effects: list = FIXED_EFFECTS,
+        cluster: str = 'local_authority',
+        outcome: str = 'removals'
+    ) -> FixedEffectsResult:
+    """
+    Fit `outcome ~ variables + C(LA) + C(FY) + C(category) +
+    variables:C(category)` with the local authority and year dummies
+    absorbed. Rows with missing values are dropped as statsmodels does.
+    Pass `cluster=None` for the notebook's nonrobust standard errors.
+    """
+    design = panel_design(panel, variables, category, fixed_effects, cluster, outcome)
+    return fit_fixed_effects(
+        design['y'],
+        design['X'],
+        design['fixed_effects'],
+        clusters=design['clusters'],
+        k_columns=design['k_columns']
+    )
@@ -0,0 +1,278 @@
+# spec_grid.py
+
+import hashlib
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from src.analysis.fixed_effects import (
+    FIXED_EFFECTS,
+    absorbed_columns,
+    complete_rows,
+    demean,
+    encode_codes,
+    fit_demeaned,
+    fixed_effect_rank,
+    size_interaction_design
+)
+
+LABEL_COLUMNS = ['local_authority', 'size_category', 'category']
+LAG_SETS = {
+    'contemporaneous': ['value'],
+    'lags': ['value', 'value_lag1', 'value_lag2', 'value_lag3'],
+}
+
+def specification_grid(
+        lag_sets: dict = LAG_SETS,
+        size_subsets: list = (None,),
+        year_windows: list = (None,),
+        categories: list = (None,)
+    ) -> list:
+    """
+    Cross product of lag sets, size subsets, financial year windows and
+    receipt category filters. None means no restriction on that dimension.
+    """
+    specs = []
+    for (lag_name, variables), sizes, years, category in itertools.product(
+            lag_sets.items(), size_subsets, year_windows, categories):
+        parts = [lag_name]
+        if sizes is not None:
+            parts.append('+'.join(sizes))
+        if years is not None:
+            parts.append(f'FY{years[0]}-{years[1]}')
+        if category is not None:
+            parts.append(category)
+        specs.append({
+            'name': ' | '.join(parts),
+            'variables': list(variables),
+            'sizes': sizes,
+            'years': years,
+            'category': category,
+        })
+    return specs
+
+def add_lags(panel: pd.DataFrame, max_lag: int) -> pd.DataFrame:
+    """
+    Add any `value_lag{k}` columns up to `max_lag` that the panel lacks:
+    the value of the same local authority and size k financial years
+    earlier, missing where the panel has no row for that year. Lags are
+    matched on `financial_year` rather than row position, so rows dropped
+    for missing receipts do not shift later years' lags.
+    """
+    missing = [lag for lag in range(1, max_lag + 1) if f'value_lag{lag}' not in panel.columns]
+    if not missing:
+        return panel
+    keys = ['local_authority', 'size_category'] + (['category'] if 'category' in panel.columns else [])
+    panel = panel.sort_values(keys + ['financial_year'])
+    values = panel[keys + ['financial_year', 'value']]
+    for lag in missing:
+        earlier = values.assign(financial_year=values['financial_year'] + lag)
+        panel = panel.merge(
+            earlier.rename(columns={'value': f'value_lag{lag}'}),
+            on=keys + ['financial_year'], how='left'
+        )
+    return panel
+
+class SharedPanel:
+    """
+    Panel columns placed in shared memory once, so worker processes read the
+    same arrays instead of receiving a pickled copy per fit. Label columns
+    are stored as integer codes plus their labels, and each fixed effect as
+    the codes of one sorted factorisation, which every fit reuses.
+    """
+    def __init__(self, panel: pd.DataFrame, fixed_effects: list = FIXED_EFFECTS):
+        self.blocks = []
+        self.descriptor = {'columns': {}, 'labels': {}, 'codes': {}}
+        for col in panel.columns:
+            if col in LABEL_COLUMNS:
+                codes, labels = pd.factorize(panel[col])
+                array = codes.astype(np.int32)
+                self.descriptor['labels'][col] = list(labels)
+            else:
+                array = panel[col].to_numpy(dtype=float)
+            self.descriptor['columns'][col] = self.share(array)
+        for fe in fixed_effects:
+            codes, _ = pd.factorize(panel[fe], sort=True)
+            self.descriptor['codes'][fe] = self.share(codes.astype(np.int32))
+
+    def share(self, array: np.ndarray) -> tuple:
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+        self.blocks.append(block)
+        return block.name, array.dtype.str, array.shape
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+def attach_panel(descriptor: dict):
+    """
+    Rebuild the panel from shared memory (labels restored as categoricals).
+    Returns the frame, the fixed-effect codes ({name: codes}) and the open
+    blocks, which must outlive both.
+    """
+    blocks = []
+
+    def attach(name, dtype, shape):
+        block = shared_memory.SharedMemory(name=name)
+        blocks.append(block)
+        return np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+
+    columns = {}
+    for col, shared in descriptor['columns'].items():
+        array = attach(*shared)
+        if col in descriptor['labels']:
+            columns[col] = pd.Categorical.from_codes(array, categories=descriptor['labels'][col])
+        else:
+            columns[col] = array
+    codes = {fe: attach(*shared) for fe, shared in descriptor['codes'].items()}
+    return pd.DataFrame(columns), codes, blocks
+
+_worker_panel = None
+_worker_codes = None
+_worker_blocks = None
+
+def _init_worker(descriptor):
+    global _worker_panel, _worker_codes, _worker_blocks
+    _worker_panel, _worker_codes, _worker_blocks = attach_panel(descriptor)
+
+def select_rows(panel: pd.DataFrame, spec: dict) -> pd.DataFrame:
+    return panel[selection_mask(panel, spec)]
+
+def selection_mask(panel: pd.DataFrame, spec: dict) -> np.ndarray:
+    mask = np.ones(len(panel), dtype=bool)
+    if spec['sizes'] is not None:
+        mask &= panel['size_category'].isin(spec['sizes']).to_numpy()
+    if spec['years'] is not None:
+        start, end = spec['years']
+        mask &= panel['financial_year'].between(start, end).to_numpy()
+    if spec['category'] is not None:
+        mask &= (panel['category'] == spec['category']).to_numpy()
+    return mask
+
+def estimation_sample(panel: pd.DataFrame, spec: dict, cluster: str = 'local_authority'):
+    """
+    Row positions the specification is estimated on (its selected rows
+    without missing values, as fit_panel_model drops them) and the fixed
+    effect columns a formula fit on its selected rows would have.
+    """
+    mask = selection_mask(panel, spec)
+    selected = panel[mask]
+    rows = np.flatnonzero(mask)[complete_rows(selected, spec['variables'], fixed_effects=FIXED_EFFECTS, cluster=cluster)]
+    return rows, absorbed_columns(selected, FIXED_EFFECTS)
+
+def sample_groups(panel: pd.DataFrame, specs: list, cluster: str = 'local_authority') -> list:
+    """
+    Specifications grouped by estimation sample, as (rows, [(spec,
+    fixed-effect columns), ...]) in order of first appearance.
+    """
+    groups = {}
+    for spec in specs:
+        rows, k_fixed = estimation_sample(panel, spec, cluster)
+        key = hashlib.sha1(rows.tobytes()).hexdigest()
+        groups.setdefault(key, (rows, []))[1].append((spec, k_fixed))
+    return list(groups.values())
+
+def fit_sample(
+        rows: np.ndarray,
+        specs: list,
+        cluster: str = 'local_authority',
+        panel: pd.DataFrame = None,
+        codes: dict = None,
+        outcome: str = 'removals'
+    ) -> list:
+    """
+    Fit the specifications of one estimation sample, given as (spec,
+    fixed-effect columns) pairs from sample_groups. The fixed effects are
+    encoded from the panel-wide codes, and the outcome and every regressor
+    the specifications use are demeaned together once, so each one only
+    solves its own least squares. The within transformation depends on the
+    sample, so demeaning is shared between specifications of the same
+    sample only. Results match fit_panel_model up to the demeaning tolerance.
+    """
+    panel = _worker_panel if panel is None else panel
+    codes = _worker_codes if codes is None else codes
+    sample = panel.iloc[rows]
+    encoded = encode_codes({fe: codes[fe][rows] for fe in FIXED_EFFECTS})
+    variables = list(dict.fromkeys(v for spec, _ in specs for v in spec['variables']))
+    X = size_interaction_design(sample, variables)
+    demeaned = demean(np.column_stack([sample[outcome].to_numpy(dtype=float), X.to_numpy(dtype=float)]), encoded)
+    position = {col: i + 1 for i, col in enumerate(X.columns)}
+    absorbed_rank = fixed_effect_rank(encoded)
+    clusters = sample[cluster] if cluster else None
+
+    results = []
+    for spec, k_fixed in specs:
+        columns = size_interaction_design(sample, spec['variables']).columns
+        result = fit_demeaned(
+            demeaned[:, 0], demeaned[:, [position[col] for col in columns]], columns,
+            absorbed_rank, clusters, k_columns=k_fixed + len(columns)
+        )
+        results.append((spec['name'], result))
+    return results
+
+def run_specifications(
+        panel: pd.DataFrame,
+        specs: list,
+        max_workers: int = None,
+        cluster: str = 'local_authority'
+    ) -> dict:
+    """
+    Fit every specification over a process pool. The panel (with any extra
+    lag columns the specs need) and its fixed-effect codes are prepared once
+    and shared with the workers through shared memory. Specifications are
+    sent to the workers grouped by estimation sample, so each sample is
+    demeaned once (see fit_sample). Returns {spec name: result}.
+    """
+    max_lag = max(
+        [int(v.rsplit('lag', 1)[1]) for spec in specs for v in spec['variables'] if 'lag' in v] + [0]
+    )
+    panel = add_lags(panel, max_lag).reset_index(drop=True)
+    max_workers = max_workers or os.cpu_count()
+    groups = sample_groups(panel, specs, cluster)
+
+    shared = SharedPanel(panel)
+    try:
+        with ProcessPoolExecutor(
+                max_workers=max_workers,
+                initializer=_init_worker,
+                initargs=(shared.descriptor,)) as pool:
+            fits = pool.map(
+                fit_sample, [rows for rows, _ in groups], [group for _, group in groups],
+                [cluster] * len(groups)
+            )
+            results = dict(fit for group in fits for fit in group)
+    finally:
+        shared.close()
+    return {spec['name']: results[spec['name']] for spec in specs}
+
+def summary_table(results: dict, float_format: str = '%.4f', stars: bool = False) -> pd.DataFrame:
+    """
+    One column per specification with coefficients and standard errors in
+    parentheses beneath them, in the layout of statsmodels' summary_col.
+    """
+    params = list(dict.fromkeys(p for result in results.values() for p in result.params.index))
+    rows = []
+    for param in params:
+        coef_row, se_row = {}, {}
+        for name, result in results.items():
+            if param not in result.params.index:
+                coef_row[name] = se_row[name] = ''
+                continue
+            mark = ''
+            if stars:
+                p = result.pvalues[param]
+                mark = '***' if p < 0.01 else '**' if p < 0.05 else '*' if p < 0.1 else ''
+            coef_row[name] = float_format % result.params[param] + mark
+            se_row[name] = '(' + float_format % result.bse[param] + ')'
+        rows.append((param, coef_row))
+        rows.append(('', se_row))
+    rows.append(('N', {name: str(result.nobs) for name, result in results.items()}))
+    table = pd.DataFrame([row for _, row in rows], index=[label for label, _ in rows])
+    return table[list(results)]
@@ -0,0 +1,321 @@
+# cache.py
+
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+CACHE_DIR = 'data/cache'
+CACHE_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+LOCK_NAME = 'manifest.lock'
+# Times cache_lookup looks an entry up again when its file was removed
+# before it could be read
+LOOKUP_RETRIES = 2
+
+def file_hash(filepath: str, block_size: int = 1 << 20) -> str:
+    """
+    SHA-256 of the file contents.
+    """
+    sha = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+def load_manifest(cache_dir: str = CACHE_DIR) -> dict:
+    manifest_path = os.path.join(cache_dir, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return {'hashes': {}, 'entries': {}}
+    with open(manifest_path) as f:
+        return json.load(f)
+
+def save_manifest(manifest: dict, cache_dir: str = CACHE_DIR):
+    os.makedirs(cache_dir, exist_ok=True)
+    manifest_path = os.path.join(cache_dir, MANIFEST_NAME)
+    # A temporary file per writer, then an atomic replace
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, prefix=MANIFEST_NAME, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+@contextmanager
+def cache_lock(cache_dir: str = CACHE_DIR):
+    """
+    Exclusive lock on the cache directory, held across processes.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(os.path.join(cache_dir, LOCK_NAME), 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK gives up after about ten seconds
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+@contextmanager
+def locked_manifest(cache_dir: str = CACHE_DIR):
+    """
+    Manifest read under cache_lock and saved when the block exits, so
+    processes sharing the cache do not drop each other's changes.
+    """
+    with cache_lock(cache_dir):
+        manifest = load_manifest(cache_dir)
+        yield manifest
+        save_manifest(manifest, cache_dir)
+
+def known_hash(manifest: dict, path: str, stat: os.stat_result) -> str:
+    """
+    The manifest's hash of `path` if its size and modification time are
+    unchanged, otherwise None.
+    """
+    known = manifest['hashes'].get(path)
+    if known and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+        return known['sha256']
+    return None
+
+def record_hash(manifest: dict, path: str, stat: os.stat_result, sha: str):
+    manifest['hashes'][path] = {
+        'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha
+    }
+
+def content_hash(filepath: str, manifest: dict) -> str:
+    """
+    Hash of the raw file, reusing the manifest's hash while the file size
+    and modification time are unchanged.
+    """
+    stat = os.stat(filepath)
+    path = os.path.abspath(filepath)
+    sha = known_hash(manifest, path, stat)
+    if sha is None:
+        sha = file_hash(filepath)
+        record_hash(manifest, path, stat, sha)
+    return sha
+
+def shared_content_hash(filepath: str, cache_dir: str = CACHE_DIR) -> str:
+    """
+    content_hash without holding cache_lock while the file is hashed. The
+    manifest is replaced atomically, so it can be read without the lock;
+    only recording a new hash takes it.
+    """
+    stat = os.stat(filepath)
+    path = os.path.abspath(filepath)
+    sha = known_hash(load_manifest(cache_dir), path, stat)
+    if sha is None:
+        sha = file_hash(filepath)
+        with locked_manifest(cache_dir) as manifest:
+            record_hash(manifest, path, stat, sha)
+    return sha
+
+def loader_name(loader) -> str:
+    return f"{loader.__module__}.{loader.__qualname__}"
+
+def loader_source(loader) -> str:
+    """
+    Hash of the source file of a loader defined in this project (e.g.
+    build_postcode_index), so editing it or a helper in its module does not
+    reuse entries it built before. None for library readers like
+    pd.read_csv, which the pandas version covers.
+    """
+    module = sys.modules.get(loader.__module__)
+    if not loader.__module__.startswith('src.') or getattr(module, '__file__', None) is None:
+        return None
+    return file_hash(module.__file__)
+
+def cache_key(sha: str, loader, params: dict) -> str:
+    """
+    Key on content hash, loader, the loader's source (see loader_source),
+    loader parameters and the pandas version (whose readers produce the
+    cached frames). Parameters must be json serialisable (lists, strings,
+    numbers) to give a stable key.
+    """
+    payload = json.dumps(
+        {
+            'version': CACHE_VERSION,
+            'sha256': sha,
+            'loader': loader_name(loader),
+            'source': loader_source(loader),
+            'pandas': pd.__version__,
+            'params': params
+        },
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def write_frame(df: pd.DataFrame, path_stem: str) -> str:
+    """
+    Write as Feather when Arrow can represent the frame, otherwise pickle
+    (e.g. raw excel sheets with mixed-type or non-string column labels).
+    """
+    df = df.reset_index(drop=True)
+    if all(isinstance(col, str) for col in df.columns):
+        path = path_stem + '.feather'
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            feather.write_feather(table, tmp_path)
+            os.replace(tmp_path, path)
+            return path
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    path = path_stem + '.pkl'
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    df.to_pickle(tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+def read_frame(path: str) -> pd.DataFrame:
+    if path.endswith('.pkl'):
+        return pd.read_pickle(path)
+    df = feather.read_table(path, memory_map=True).to_pandas()
+    # Arrow returns None for missing strings where the csv reader gives NaN
+    for col in df.columns[df.dtypes == object]:
+        df[col] = df[col].where(df[col].notna(), np.nan)
+    return df
+
+def remove_entry(manifest: dict, key: str):
+    entry = manifest['entries'].pop(key)
+    if os.path.exists(entry['path']):
+        os.remove(entry['path'])
+
+def cache_lookup(loader, filepath: str, cache_dir: str = CACHE_DIR, **params):
+    """
+    Cached frame for `loader(filepath, **params)`, or None on a miss.
+    Only the manifest lookup holds cache_lock; the raw file is hashed and
+    the entry read outside it. An entry evicted or replaced between the
+    two is looked up again, up to LOOKUP_RETRIES times, then treated as a
+    miss.
+    """
+    key = cache_key(shared_content_hash(filepath, cache_dir), loader, params)
+    for _ in range(LOOKUP_RETRIES + 1):
+        with locked_manifest(cache_dir) as manifest:
+            entry = manifest['entries'].get(key)
+            if not entry:
+                return None
+            entry['last_used'] = time.time()
+            path = entry['path']
+        try:
+            return read_frame(path)
+        except FileNotFoundError:
+            continue
+    return None
+
+def cache_store(df: pd.DataFrame, loader, filepath: str, cache_dir: str = CACHE_DIR, **params):
+    """
+    Store the result of `loader(filepath, **params)`, removing entries built
+    from an older version of the same file. The frame is written outside
+    the lock, as is the raw file's hash; only the manifest update holds it.
+    """
+    sha = shared_content_hash(filepath, cache_dir)
+    key = cache_key(sha, loader, params)
+    source = os.path.abspath(filepath)
+    path = write_frame(df, os.path.join(cache_dir, key))
+
+    with locked_manifest(cache_dir) as manifest:
+        # Invalidate entries built from an older version of the same file
+        stale = [
+            k for k, e in manifest['entries'].items()
+            if e['source'] == source and (e['sha256'] != sha or (k == key and e['path'] != path))
+        ]
+        for k in stale:
+            remove_entry(manifest, k)
+
+        manifest['entries'][key] = {
+            'source': source,
+            'sha256': sha,
+            'loader': loader_name(loader),
+            'params': params,
+            'path': path,
+            'bytes': os.path.getsize(path),
+            'last_used': time.time()
+        }
+
+def cached_read(loader, filepath: str, cache_dir: str = CACHE_DIR, **params) -> pd.DataFrame:
+    """
+    Read `filepath` with `loader(filepath, **params)`, converting the result
+    once to a columnar cache file. Later calls with the same file contents
+    and parameters memory-map the cache instead of reparsing. When the raw
+    file changes, cache entries built from its old contents are removed.
+    """
+    df = cache_lookup(loader, filepath, cache_dir, **params)
+    if df is None:
+        df = loader(filepath, **params)
+        cache_store(df, loader, filepath, cache_dir, **params)
+    return df
+
+def evict_cache(
+        cache_dir: str = CACHE_DIR,
+        max_bytes: int = None,
+        max_age_days: float = None
+    ) -> list:
+    """
+    Remove cache entries whose raw file is gone or has changed, entries not
+    used within `max_age_days`, then least recently used entries until the
+    cache fits in `max_bytes`. Returns the removed keys.
+    """
+    with locked_manifest(cache_dir) as manifest:
+        return evict_entries(manifest, max_bytes, max_age_days)
+
+def evict_entries(manifest: dict, max_bytes: int = None, max_age_days: float = None) -> list:
+    removed = []
+    for key, entry in list(manifest['entries'].items()):
+        source_missing = not os.path.exists(entry['source'])
+        if source_missing or content_hash(entry['source'], manifest) != entry['sha256']:
+            remove_entry(manifest, key)
+            removed.append(key)
+        elif max_age_days is not None and time.time() - entry['last_used'] > max_age_days * 86400:
+            remove_entry(manifest, key)
+            removed.append(key)
+
+    if max_bytes is not None:
+        by_last_used = sorted(manifest['entries'].items(), key=lambda kv: kv[1]['last_used'])
+        total = sum(entry['bytes'] for _, entry in by_last_used)
+        for key, entry in by_last_used:
+            if total <= max_bytes:
+                break
+            total -= entry['bytes']
+            remove_entry(manifest, key)
+            removed.append(key)
+
+    manifest['hashes'] = {
+        path: known for path, known in manifest['hashes'].items() if os.path.exists(path)
+    }
+    return removed
+
+def clear_cache(cache_dir: str = CACHE_DIR):
+    """
+    Remove every cache entry.
+    """
+    with locked_manifest(cache_dir) as manifest:
+        for key in list(manifest['entries']):
+            remove_entry(manifest, key)
+        manifest['hashes'] = {}
@@ -0,0 +1,98 @@
+# charity_store.py
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from src.cleaning.clean_charity_main import CATEGORY_MAPPING
+
+CATEGORICAL_COLUMNS = [
+    'local_authority', 'size_category', 'charity_status', 'classification_description'
+]
+DATE_COLUMNS = ['date_of_registration', 'date_of_removal']
+FY_COLUMNS = ['registration_fy', 'removal_fy']
+NUMERIC_COLUMNS = ['latest_income']
+# Classification dummies are named after the CATEGORY_MAPPING groups,
+# plus 'None' for unmapped descriptions
+DUMMY_COLUMNS = list(CATEGORY_MAPPING) + ['None']
+
+def to_compact_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert the cleaned charity table to compact dtypes: categoricals for
+    repeated labels, int8 classification dummies, nullable Int32 financial
+    years, float incomes, datetime64 dates and zero-padded string charity
+    numbers.
+    """
+    df = df.copy()
+    if 'registered_charity_number' in df.columns:
+        number = df['registered_charity_number']
+        if pd.api.types.is_numeric_dtype(number):
+            # Numbers read as floats would be padded as '0101.0'
+            number = number.astype('Int64')
+        # Missing numbers stay missing rather than padded to '000nan'
+        df['registered_charity_number'] = (
+            number.astype(str).str.strip().str.zfill(6).where(number.notna())
+        )
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    for col in DATE_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+    for col in FY_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('Int32')
+    for col in NUMERIC_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype(float)
+    dummy_cols = [col for col in DUMMY_COLUMNS if col in df.columns]
+    # Older outputs wrote the dummies as floats ('1.0' when read as text)
+    df[dummy_cols] = df[dummy_cols].apply(pd.to_numeric, errors='coerce').fillna(0).astype('int8')
+    return df
+
+def save_charity_main(df: pd.DataFrame, filepath: str):
+    """
+    Write the cleaned charity table. '.parquet' paths keep compact dtypes,
+    anything else is written as plain csv.
+    """
+    if filepath.endswith('.parquet'):
+        to_compact_dtypes(df).to_parquet(filepath, index=False)
+    else:
+        df.to_csv(filepath, index=False)
+
+def load_charity_main(filepath: str) -> pd.DataFrame:
+    """
+    Load the cleaned charity table with compact dtypes from either the
+    Parquet or the csv output. Only empty csv fields are read as missing,
+    so the 'None' classification is not turned into NaN.
+    """
+    if filepath.endswith('.parquet'):
+        return pd.read_parquet(filepath)
+    df = pd.read_csv(
+        filepath,
+        dtype={'registered_charity_number': str},
+        parse_dates=DATE_COLUMNS,
+        keep_default_na=False,
+        na_values=[''],
+        low_memory=False
+    )
+    return to_compact_dtypes(df)
+
+def iter_charity_main(filepath: str, chunksize: int = 200_000):
+    """
+    The cleaned charity table in chunks of `chunksize` rows, with the dtypes
+    load_charity_main gives. csv columns are read as text before conversion,
+    so every chunk has the same dtypes whatever its values.
+    """
+    if filepath.endswith('.parquet'):
+        for batch in pq.ParquetFile(filepath).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+        return
+    reader = pd.read_csv(
+        filepath,
+        dtype=str,
+        keep_default_na=False,
+        na_values=[''],
+        chunksize=chunksize
+    )
+    for chunk in reader:
+        yield to_compact_dtypes(chunk)
@@ -1,6 +1,10 @@
 import pandas as pd
 import numpy as np
 
+from src.cleaning.joins import attach_columns
+from src.cleaning.postcodes import PostcodeResolver, postcode_index
+from src.cleaning.profiling import profiled, stage
+
 CATEGORY_MAPPING = {
     # Charities primarily providing financial or material aid
     'Grantmaking_And_Financial_Support': [
@@ -97,18 +101,78 @@ CATEGORY_MAPPING = {
     ]
 }
 
+# Inverted CATEGORY_MAPPING: classification column -> group
+CATEGORY_LOOKUP = {
+    column: key
+    for key, columns in CATEGORY_MAPPING.items()
+    for column in columns
+}
+
 def apply_category_mapping(
         value: str
     ) -> str:
     
     value = str(value).replace(' ', '_').replace('-', '_').lower()
-    value = f"classification_{value}"
-    for key in CATEGORY_MAPPING.keys():
-        if value in CATEGORY_MAPPING[key]:
-            return key
-    else:
-        return 'None'
+    return CATEGORY_LOOKUP.get(f"classification_{value}", 'None')
 
+@profiled()
+def map_categories(descriptions: pd.Series, report: bool = False):
+    """
+    apply_category_mapping over a column, run once per distinct description.
+    With `report=True` also return the row counts of descriptions that
+    mapped to no group ('None').
+    """
+    codes, uniques = pd.factorize(descriptions)
+    # Missing descriptions (code -1) map like str(nan) does, to 'None'
+    mapped = np.array([apply_category_mapping(value) for value in uniques] + ['None'], dtype=object)
+    result = pd.Series(mapped[codes], index=descriptions.index, name=descriptions.name)
+    if report:
+        unmapped = descriptions[result == 'None'].value_counts(dropna=False)
+        return result, unmapped
+    return result
+
+@profiled()
+def classification_dummies(
+        numbers: pd.Series,
+        descriptions: pd.Series,
+        dtype=np.int8
+    ) -> pd.DataFrame:
+    """
+    0/1 indicator matrix with one row per distinct charity number (in order
+    of first appearance) and one column per distinct description (sorted),
+    set where the pair occurs. Pairs with a missing value are ignored. The
+    matrix is filled by indexing into np.zeros instead of a pivot_table.
+    """
+    row_codes, rows = pd.factorize(numbers)
+    col_codes, columns = pd.factorize(descriptions, sort=True)
+    keep = (row_codes >= 0) & (col_codes >= 0)
+    matrix = np.zeros((len(rows), len(columns)), dtype=dtype)
+    matrix[row_codes[keep], col_codes[keep]] = 1
+    # Drop descriptions only seen next to a missing charity number
+    used = matrix.any(axis=0)
+    if not used.all():
+        matrix, columns = matrix[:, used], columns[used]
+    return pd.DataFrame(matrix, index=pd.Index(rows, name=numbers.name), columns=list(columns))
+
+@profiled()
+def attach_dummies(
+        df: pd.DataFrame,
+        dummies: pd.DataFrame,
+        key: str = 'registered_charity_number'
+    ) -> pd.DataFrame:
+    """
+    Append the dummy columns to a one-row-per-charity frame by looking up
+    each charity's row in `dummies`. Charities without dummies get zeros.
+    """
+    positions = dummies.index.get_indexer(df[key])
+    # Position -1 (charity not in dummies) picks the appended zero row
+    matrix = np.vstack([dummies.to_numpy(), np.zeros((1, dummies.shape[1]), dtype=dummies.to_numpy().dtype)])
+    return pd.concat(
+        [df.reset_index(drop=True), pd.DataFrame(matrix[positions], columns=dummies.columns)],
+        axis=1
+    )
+
+@profiled()
 def base_cleaning(
         charity: pd.DataFrame
     )-> pd.DataFrame:
@@ -138,22 +202,35 @@ def base_cleaning(
         )
     
     # Charity status for filtering
-    charity['charity_status'] = charity['date_of_removal'].apply(
-        lambda x: 'active' if pd.isna(x) else 'inactive'
-        )
+    charity['charity_status'] = np.where(
+        charity['date_of_removal'].isna(), 'active', 'inactive'
+    ).astype(object)
+
     # Drop duplicates via charity number keep most recent active record
-    charity_sorted = charity.sort_values(
-        by=[
-            'registered_charity_number', 
-            'charity_status', 
-            'has_company_number', 
-            'date_of_removal'
-            ],
-        ascending=[True, True, False, False]
-    ).drop_duplicates(subset='registered_charity_number', keep='first')
-
-    return charity_sorted
+    return charity.iloc[dedup_positions(charity)]
+
+def dedup_positions(charity: pd.DataFrame) -> np.ndarray:
+    """
+    Row position of the record kept for each charity, in charity number
+    order. Same result as a stable sort by charity number, status (active
+    first), has_company_number (descending) and date_of_removal (latest
+    first, missing last) followed by keeping the first row per charity, but
+    the sort runs on integer codes instead of strings.
+    """
+    numbers, _ = pd.factorize(charity['registered_charity_number'], sort=True)
+    inactive = (charity['charity_status'] == 'inactive').to_numpy()
+    no_company = 1 - charity['has_company_number'].to_numpy()
+    removal = charity['date_of_removal'].to_numpy().view('i8')
+    latest_first = np.where(
+        charity['date_of_removal'].isna().to_numpy(), np.iinfo(np.int64).max, -removal
+    )
+    # np.lexsort sorts by the last key first; row position breaks ties as a stable sort does
+    order = np.lexsort((np.arange(len(charity)), latest_first, no_company, inactive, numbers))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = numbers[order][1:] != numbers[order][:-1]
+    return order[first]
 
+@profiled()
 def process_company_house(company_house: pd.DataFrame):
     """
     Process Company House data to ensure correct column names & types.
@@ -174,6 +251,7 @@ def process_company_house(company_house: pd.DataFrame):
     )
     return company_house
 
+@profiled()
 def process_charity_web(charity_web: pd.DataFrame):
     charity_web['charityNumber'] = (
         charity_web['charityNumber'].astype(str).str.strip()
@@ -185,65 +263,71 @@ def process_charity_web(charity_web: pd.DataFrame):
     )
     return charity_web
 
-def load_postcode2lad_lookup(
-        postcodes: pd.DataFrame, 
-        local_authority: pd.DataFrame,
-) -> pd.DataFrame:
-    """Create and load postcode2lad lookup df"""
-    # Create mapping for postcodes and LAD
-    postcode_and_la = pd.merge(
-        postcodes[['oslaua', 'pcds']],
-        local_authority[['LAD23CD', 'LAD23NM']],
-        left_on='oslaua',
-        right_on='LAD23CD',
-        how='left'
-    ).rename(columns={'pcds': 'postcode', 'LAD23NM': 'local_authority_name'})
-    postcode_and_la = (
-        postcode_and_la.set_index('postcode')['local_authority_name']
+def classify_size(income: pd.Series) -> pd.Series:
+    """
+    Classify charities by latest income into Small (< £25k),
+    Medium (<= £1m) and Large. Missing income stays NaN.
+    """
+    size = np.select(
+        [income < 25000, income <= 1_000_000],
+        ['Small', 'Medium'],
+        default='Large'
+    ).astype(object)
+    size[income.isna().to_numpy()] = np.nan
+    return pd.Series(size, index=income.index)
+
+def get_financial_year(dates: pd.Series) -> pd.Series:
+    """
+    Financial year (April to March) of each date, NaN for missing dates.
+    """
+    financial_year = (
+        dates.dt.year.astype(float) - (dates.dt.month < 4).astype(int)
     )
-    return postcode_and_la
+    # Keep integer dtype when no dates are missing
+    if financial_year.notna().all():
+        return financial_year.astype('int64')
+    return financial_year
 
 
-
-
-def clean_charity_main(
-    charity: pd.DataFrame,
-    company_house: pd.DataFrame,
-    charity_web: pd.DataFrame,
-    postcodes: pd.DataFrame,
-    local_authority: pd.DataFrame,
-    category: pd.DataFrame,
-) -> pd.DataFrame:
+def enrich_register(
+        charity: pd.DataFrame,
+        company_house: pd.DataFrame,
+        charity_web: pd.DataFrame
+    ):
     """
-    Cleans the main charity register and returns a sorted dataset with
-    key information such as charity registration and deregistration
-    date, status, local authority, and size classification.
+    Deduplicate the charity register, join the Companies House and charity
+    web columns onto it and combine their postcodes into `postcode`.
+    Returns the register and the share of charities matched by each join.
     """
     # Basic cleaning
     charity_sorted = base_cleaning(charity)
     company_house = process_company_house(company_house)
     charity_web = process_charity_web(charity_web)
 
+    # Enrichment joins attach columns to the deduplicated register in place
+    df = charity_sorted
+    df.index = pd.RangeIndex(len(df))
+    match_rates = {}
+
     # Data merging: company house
-    merged_data = pd.merge(
-        charity_sorted,
-        company_house[['CompanyNumber', 'CompanyStatus', 'RegAddress.PostCode']],
-        left_on='charity_company_registration_number',
-        right_on='CompanyNumber',
-        how='left'
-    )
-    merged_data.drop(columns=['CompanyNumber'], inplace=True)
+    with stage('merge_company_house', df, company_house) as current:
+        df, match_rates['company_house'] = attach_columns(
+            df, company_house,
+            left_on='charity_company_registration_number',
+            right_on='CompanyNumber',
+            columns=['CompanyStatus', 'RegAddress.PostCode']
+        )
+        current.output(df)
     
     # Data merging: charity web
-    merged_data = pd.merge(
-        merged_data,
-        charity_web[['registered_charity_number', 'charity_name', 'postalCode', 'latestIncome']],
-        on=['registered_charity_number', 'charity_name'],
-        how='left'
-    )
-
-    # Copy merged data for location cleaning
-    df = merged_data.copy()
+    with stage('merge_charity_web', df, charity_web) as current:
+        df, match_rates['charity_web'] = attach_columns(
+            df, charity_web,
+            left_on=['registered_charity_number', 'charity_name'],
+            right_on=['registered_charity_number', 'charity_name'],
+            columns=['postalCode', 'latestIncome']
+        )
+        current.output(df)
 
     # Treate empty string as NaN
     df['RegAddress.PostCode'] = df['RegAddress.PostCode'].replace('', np.nan)
@@ -259,29 +343,19 @@ def clean_charity_main(
         .fillna(df['charity_contact_postcode'])
     ).astype(str).str.strip().str.upper()
 
-    # Load the lookup df for postcode and LAD
-    postcode2lad_lookup = load_postcode2lad_lookup(
-        postcodes=postcodes, local_authority=local_authority
-    )
+    return df, match_rates
 
-    # Map the postcode in df to the proper LAD
-    df['local_authority'] = df['postcode'].map(postcode2lad_lookup)
-    
+def classify_register(df: pd.DataFrame, category: pd.DataFrame):
+    """
+    Size, financial years and classification dummies of the enriched
+    register, one row per charity. Returns the register, the descriptions
+    that mapped to no CATEGORY_MAPPING group and the share of charities
+    with a classification.
+    """
     # Size classification
-    def classify_size_combined(row):
-        income = row['latest_income']
-        if pd.isna(income):
-            income = row['latestIncome']
-        if pd.isna(income):
-            return np.nan
-        elif income < 25000:
-            return 'Small'
-        elif income <= 1_000_000:
-            return 'Medium'
-        else:
-            return 'Large'
-
-    df['size_category'] = df.apply(classify_size_combined, axis=1)
+    df['size_category'] = classify_size(
+        df['latest_income'].fillna(df['latestIncome'])
+    )
 
     # Clean registered charity number
     df['registered_charity_number'] = (
@@ -291,8 +365,15 @@ def clean_charity_main(
         category['registered_charity_number'].astype(str).str.strip().str.zfill(6)
     )
 
-    # Merge categories back into the dataframe
-    df = pd.merge(df, category, on='registered_charity_number', how='left')
+    # Merge categories back into the dataframe (one row per charity x classification)
+    with stage('merge_category', df, category) as current:
+        df, category_match_rate = attach_columns(
+            df, category,
+            left_on='registered_charity_number',
+            right_on='registered_charity_number',
+            columns=[col for col in category.columns if col != 'registered_charity_number']
+        )
+        current.output(df)
 
     # Drop columns that will not be used (or duplicate columns)
     columns_to_drop = [
@@ -343,12 +424,6 @@ def clean_charity_main(
         cols2front + [col for col in df.columns if col not in cols2front]
     ]
 
-    # Define function to get financial year
-    def get_financial_year(date):
-        if pd.isna(date):
-            return np.nan
-        return date.year if date.month >= 4 else date.year - 1
-
     # Datetime formatting
     df['date_of_registration'] = pd.to_datetime(
         df['date_of_registration'], errors='coerce')
@@ -356,40 +431,63 @@ def clean_charity_main(
     df['date_of_removal'] = pd.to_datetime(
         df['date_of_removal'], errors='coerce')
 
-    df['registration_fy'] = df['date_of_registration'].apply(get_financial_year)
-    df['removal_fy'] = df['date_of_removal'].apply(get_financial_year)
+    df['registration_fy'] = get_financial_year(df['date_of_registration'])
+    df['removal_fy'] = get_financial_year(df['date_of_removal'])
 
-    df['classification_description'] = df['classification_description'].apply(apply_category_mapping)
+    df['classification_description'], unmapped = map_categories(df['classification_description'], report=True)
     
     # Drop duplicates incase charity match multiple sub-cat inside the same category
     df.drop_duplicates(
         subset =['registered_charity_number', 'classification_description'], inplace=True
         )
 
-    # Proceed to final cleaning and classification dummies generation
-    classification_df = df.copy()
-
-    # Create binary indicator (1) for each classification
-    classification_df['value'] = 1
-
-    # Pivot to wide format with binary columns
-    classification_dummies = classification_df.pivot_table(
-        index='registered_charity_number',
-        columns='classification_description',
-        values='value',
-        aggfunc='max',
-        fill_value=0
+    # Classification dummies: one int8 column per group, one row per charity
+    dummies = classification_dummies(
+        df['registered_charity_number'], df['classification_description']
     )
-
-    # Reset index and merge with original dataset
-    classification_dummies = classification_dummies.reset_index()
     df = df.drop_duplicates(subset='registered_charity_number')  # ensure one row per charity
-    df = df.merge(classification_dummies, on='registered_charity_number', how='left')
+    df = attach_dummies(df, dummies)
 
-    # Identify classification dummy columns (typically start with 'classification_')
-    category_cols = [col for col in df.columns if col.startswith('classification_')]
+    return df, unmapped, category_match_rate
 
-    # Fill NaNs with 0 in those columns only
-    df[category_cols] = df[category_cols].fillna(0)
+def clean_charity_main(
+    charity: pd.DataFrame,
+    company_house: pd.DataFrame,
+    charity_web: pd.DataFrame,
+    postcodes: pd.DataFrame,
+    local_authority: pd.DataFrame,
+    category: pd.DataFrame,
+    report: bool = False
+) -> pd.DataFrame:
+    """
+    Cleans the main charity register and returns a sorted dataset with
+    key information such as charity registration and deregistration
+    date, status, local authority, and size classification.
 
+    `postcodes` is either ONSPD rows or a prebuilt PostcodeResolver. With
+    `report=True` also return a dict with how many charities matched their
+    local authority by postcode, sector or district, or were not matched
+    ('postcode_matches'), the classification descriptions that mapped to
+    no CATEGORY_MAPPING group ('unmapped_classifications') and the share
+    of charities matched by each enrichment join ('join_match_rates').
+    """
+    df, match_rates = enrich_register(charity, company_house, charity_web)
+
+    # Build the postcode to LAD resolver unless one was passed in
+    if not isinstance(postcodes, PostcodeResolver):
+        postcodes = PostcodeResolver(postcode_index(postcodes), local_authority)
+
+    # Map the postcode in df to the proper LAD, falling back to its sector or district
+    with stage('postcode_mapping', df['postcode']) as current:
+        df['local_authority'], postcode_matches = postcodes.resolve(df['postcode'], report=True)
+        current.output(df['local_authority'])
+    
+    df, unmapped, match_rates['category'] = classify_register(df, category)
+
+    if report:
+        return df, {
+            'postcode_matches': postcode_matches,
+            'unmapped_classifications': unmapped,
+            'join_match_rates': pd.Series(match_rates)
+        }
     return df
@@ -1,14 +1,31 @@
 # clean_receipt.py
 
+import re
+
 import pandas as pd
 import numpy as np
-import itertools
+from functools import lru_cache
+
+from src.cleaning.profiling import profiled
 
-YEAR_SKIP_MAPPING = {
-    "2014": 0, "2015": 0, "2016": 2, "2017": 3, "2018": 3,
-    "2019": 4, "2020": 4, "2021": 4, "2022": 4, "2023": 4,
+# One row per receipts sheet: rows to skip before the header, then either
+# `rename_from_col`/`header_row` for older sheets whose header row has to be
+# rebuilt, or `start_col` for newer sheets whose disposal columns are kept
+SHEET_LAYOUT = {
+    "2014": {"skiprows": 0, "rename_from_col": 3, "header_row": 1},
+    "2015": {"skiprows": 0, "rename_from_col": 4, "header_row": 1},
+    "2016": {"skiprows": 2, "rename_from_col": 4, "header_row": 2},
+    "2017": {"skiprows": 3, "rename_from_col": 5, "header_row": 0},
+    "2018": {"skiprows": 3, "rename_from_col": 5, "header_row": 0},
+    "2019": {"skiprows": 4, "start_col": 5},
+    "2020": {"skiprows": 4, "start_col": 5},
+    "2021": {"skiprows": 4, "start_col": 5},
+    "2022": {"skiprows": 4, "start_col": 5},
+    "2023": {"skiprows": 4, "start_col": 6},
 }
 
+YEAR_SKIP_MAPPING = {year: layout["skiprows"] for year, layout in SHEET_LAYOUT.items()}
+
 merge_columns = {
     "community safety": ["community safety", "community safety (cctv)"],
     'agricultural & fisheries services':['agriculture & fisheries'],
@@ -51,6 +68,11 @@ merge_columns = {
     #'water supply, sewerage & remediation'
 }
 
+# Receipt category the panel is built from, and the sheet columns that
+# identify an authority rather than hold a category's receipts
+PANEL_CATEGORIES = ['all services total']
+ID_COLUMNS = ["ecode", 'lgf code', 'ons code', "class", "subclass", "local_authority", "financial_year", 'certification complete']
+
 # Combined mapping: new_name → list of old names
 unified_map = {
     'buckinghamshire': ['aylesbury vale', 'chiltern', 'south bucks', 'wycombe','south buckinghamshire'],
@@ -94,6 +116,91 @@ non_england_keywords = [
     'west lothian', 'wrexham','city of edinburgh','channel islands'
 ]
 
+# Official names of the Scottish, Welsh and Northern Irish councils and the
+# Crown dependencies, with the variants and former names found in the data
+non_england_authorities = {
+    # Scotland
+    'aberdeen city': ['aberdeen'],
+    'aberdeenshire': [],
+    'angus': [],
+    'argyll and bute': ['argyll'],
+    'city of edinburgh': ['edinburgh', 'edinburgh city'],
+    'clackmannanshire': [],
+    'dumfries and galloway': ['dumfries'],
+    'dundee city': ['dundee'],
+    'east ayrshire': [],
+    'east dunbartonshire': [],
+    'east lothian': [],
+    'east renfrewshire': [],
+    'falkirk': [],
+    'fife': [],
+    'glasgow city': ['glasgow'],
+    'highland': [],
+    'inverclyde': [],
+    'midlothian': [],
+    'moray': [],
+    'na h eileanan siar': ['comhairle nan eilean siar', 'eilean siar', 'western isles'],
+    'north ayrshire': [],
+    'north lanarkshire': [],
+    'orkney islands': ['orkney'],
+    'perth and kinross': [],
+    'renfrewshire': [],
+    'scottish borders': ['borders'],
+    'shetland islands': ['shetland'],
+    'south ayrshire': [],
+    'south lanarkshire': [],
+    'stirling': [],
+    'west dunbartonshire': [],
+    'west lothian': [],
+    # Wales
+    'blaenau gwent': [],
+    'bridgend': [],
+    'caerphilly': [],
+    'cardiff': [],
+    'carmarthenshire': [],
+    'ceredigion': [],
+    'conwy': [],
+    'denbighshire': [],
+    'flintshire': [],
+    'gwynedd': [],
+    'isle of anglesey': ['anglesey', 'ynys mon'],
+    'merthyr tydfil': ['merthyr'],
+    'monmouthshire': [],
+    'neath port talbot': ['neath'],
+    'newport': [],
+    'pembrokeshire': [],
+    'powys': [],
+    'rhondda cynon taf': ['rhondda cynon taff', 'rhondda'],
+    'swansea': [],
+    'torfaen': [],
+    'vale of glamorgan': [],
+    'wrexham': [],
+    # Northern Ireland, with the districts merged in 2015
+    'antrim and newtownabbey': ['antrim', 'newtownabbey'],
+    'ards and north down': ['ards', 'north down'],
+    'armagh city banbridge and craigavon': ['armagh banbridge and craigavon', 'armagh', 'banbridge', 'craigavon'],
+    'belfast': [],
+    'causeway coast and glens': ['ballymoney', 'coleraine', 'limavady', 'moyle'],
+    'derry city and strabane': ['derry and strabane', 'derry', 'londonderry', 'strabane'],
+    'fermanagh and omagh': ['fermanagh', 'omagh'],
+    'lisburn and castlereagh': ['lisburn', 'castlereagh'],
+    'mid and east antrim': ['ballymena', 'carrickfergus', 'larne'],
+    'mid ulster': ['cookstown', 'dungannon', 'magherafelt'],
+    'newry mourne and down': ['newry and mourne', 'down'],
+    # Crown dependencies
+    'isle of man': [],
+    'channel islands': [],
+    'guernsey': ['states of guernsey'],
+    'jersey': ['states of jersey'],
+}
+
+# official name or variant → official name
+non_england_names = {
+    name: official
+    for official, variants in non_england_authorities.items()
+    for name in [official] + variants
+}
+
 def clean_sheet(df, rename_from_col=3, header_row=1):
     renamed_mask = [not str(col).startswith("Unnamed:") for col in df.columns]
     cols_to_keep = list(range(rename_from_col + 1))
@@ -137,19 +244,121 @@ def basic_cleaning(df, index):
         df = df[~df['class'].isin(['O','SC'])]
     return df.reset_index(drop=True)
 
-def merge_columns_func(dfs, merge_columns):
+class ColumnAliasResolver:
+    """
+    Merge alias columns into their standard names as listed in
+    merge_columns. The alias -> standard lookup is built once; each sheet is
+    then resolved with one sum per matched standard column and a single
+    column selection, rather than a copy and drop per merge_columns entry.
+    """
+    def __init__(self, merge_columns):
+        self.merge_columns = merge_columns
+        self.lookup = {
+            alias: standard_col
+            for standard_col, aliases in merge_columns.items()
+            for alias in aliases
+        }
+
+    @staticmethod
+    def standardise(columns):
+        return [str(col).strip().lower().replace(" and ", " & ") for col in columns]
+
+    def matched(self, columns):
+        """
+        {standard column: aliases present in `columns`}, in merge_columns order.
+        """
+        found = {}
+        for col in dict.fromkeys(columns):
+            if col in self.lookup:
+                found.setdefault(self.lookup[col], set()).add(col)
+        return {
+            standard_col: [alias for alias in aliases if alias in found[standard_col]]
+            for standard_col, aliases in self.merge_columns.items()
+            if standard_col in found
+        }
+
+    def resolve(self, df, categories=None):
+        """
+        Return the sheet with standardised column names and aliases merged,
+        and the aliases that matched. With `categories`, only the ID_COLUMNS
+        and the columns of those categories (or their aliases) are kept.
+        """
+        columns = self.standardise(df.columns)
+        if categories is not None:
+            categories = set(categories)
+            keep = [
+                i for i, col in enumerate(columns)
+                if col in ID_COLUMNS or col in categories or self.lookup.get(col) in categories
+            ]
+            df = df.iloc[:, keep]
+            columns = [columns[i] for i in keep]
+        matched = self.matched(columns)
+        df = df.set_axis(columns, axis=1)
+        totals = {
+            standard_col: df[aliases].sum(axis=1, skipna=True)
+            for standard_col, aliases in matched.items()
+        }
+        merged = {
+            alias for standard_col, aliases in matched.items()
+            for alias in aliases if alias != standard_col
+        }
+        df = df.iloc[:, [i for i, col in enumerate(columns) if col not in merged]].copy()
+        for standard_col, total in totals.items():
+            if standard_col in df.columns:
+                df.loc[:, standard_col] = total
+            else:
+                df[standard_col] = total
+        return df, matched
+
+merge_resolver = ColumnAliasResolver(merge_columns)
+
+def merge_columns_func(dfs, merge_columns, report=False, resolver=None, categories=None):
+    """
+    Merge alias columns of each sheet into their standard names, keeping
+    only `categories` if given. With `report=True` also return the aliases
+    matched in each sheet.
+    """
+    resolver = resolver or ColumnAliasResolver(merge_columns)
+    matched = []
     for idx in range(len(dfs)):
-        df = dfs[idx].copy()
-        df.columns = [str(col).strip().lower().replace(" and ", " & ") for col in df.columns]
-        for standard_col, aliases in merge_columns.items():
-            present_cols = [col for col in aliases if col in df.columns]
-            if present_cols:
-                df.loc[:, standard_col] = df[present_cols].sum(axis=1, skipna=True)
-                cols_to_drop = [col for col in present_cols if col != standard_col]
-                df.drop(columns=cols_to_drop, inplace=True)
-        dfs[idx] = df
+        dfs[idx], found = resolver.resolve(dfs[idx], categories)
+        matched.append(found)
+    if report:
+        return dfs, matched
     return dfs
 
+def alias_report(matched_by_year):
+    """
+    One row per year, standard column and alias merged into it.
+    """
+    rows = [
+        (year, standard_col, alias)
+        for year, matched in matched_by_year.items()
+        for standard_col, aliases in matched.items()
+        for alias in aliases
+    ]
+    return pd.DataFrame(rows, columns=['year', 'column', 'alias'])
+
+@profiled()
+def clean_year_sheet(df, year, report=False, categories=None):
+    """
+    Run sheet cleaning, basic cleaning and column merging for one year's
+    sheet. Pass `categories` to keep only those receipt categories (all are
+    kept by default). With `report=True` also return the aliases merged.
+    """
+    layout = SHEET_LAYOUT[year]
+    if 'start_col' in layout:
+        df = rename_and_filter_disposal(df, start_col=layout['start_col'])
+    else:
+        df = clean_sheet(df, rename_from_col=layout['rename_from_col'], header_row=layout['header_row'])
+    df = basic_cleaning(df, list(YEAR_SKIP_MAPPING).index(year))
+    dfs, matched = merge_columns_func(
+        [df], merge_columns, report=True, resolver=merge_resolver, categories=categories
+    )
+    if report:
+        return dfs[0], matched[0]
+    return dfs[0]
+
 def clean_local_authority(name, flat_lookup):
     if pd.isna(name):
         return name
@@ -157,58 +366,227 @@ def clean_local_authority(name, flat_lookup):
             .replace(' city of', '').replace(' county of', '').strip())
     return flat_lookup.get(name, name)
 
-def apply_local_authority_cleaning(dfs, dataset, flat_lookup):
+class LocalAuthorityNormaliser:
+    """
+    Vectorised clean_local_authority: each column is factorized and only its
+    distinct names are normalised, with results kept in an LRU cache so the
+    same names across sheets and the charity dataset are cleaned once.
+    """
+    def __init__(self, flat_lookup, maxsize=4096):
+        self.flat_lookup = flat_lookup
+        self.normalise = lru_cache(maxsize=maxsize)(self._normalise)
+
+    def _normalise(self, name):
+        return clean_local_authority(name, self.flat_lookup)
+
+    def __call__(self, names):
+        codes, uniques = pd.factorize(names)
+        cleaned = np.array([self.normalise(name) for name in uniques], dtype=object)
+        # Missing names (code -1) are returned unchanged, as in clean_local_authority
+        result = names.to_numpy(dtype=object, copy=True)
+        found = codes != -1
+        result[found] = cleaned[codes[found]]
+        return pd.Series(result, index=names.index, name=names.name).infer_objects()
+
+@profiled()
+def apply_local_authority_cleaning(dfs, dataset, flat_lookup, normaliser=None):
+    normaliser = normaliser or LocalAuthorityNormaliser(flat_lookup)
     for i in range(len(dfs)):
         if 'local_authority' in dfs[i].columns:
-            dfs[i]['local_authority'] = dfs[i]['local_authority'].apply(lambda x: clean_local_authority(x, flat_lookup))
+            dfs[i]['local_authority'] = normaliser(dfs[i]['local_authority'])
     if 'local_authority' in dataset.columns:
-        dataset['local_authority'] = dataset['local_authority'].apply(lambda x: clean_local_authority(x, flat_lookup))
+        dataset['local_authority'] = normaliser(dataset['local_authority'])
     return dfs, dataset
 
-def filter_non_england(dataset, non_england_keywords):
-    dataset['local_authority_lower'] = dataset['local_authority'].str.lower()
-    dataset = dataset[~dataset['local_authority_lower'].str.contains('|'.join(non_england_keywords), na=False)]
-    return dataset.drop(columns=['local_authority_lower'])
+class KeywordMatcher:
+    """
+    Match local authority names against keywords, built once and applied to
+    the distinct names of a column. `keywords` is a list, or a dict from
+    each keyword to the name reported for it (e.g. non_england_names).
+
+    Modes:
+        'exact': the whole normalised name (lower case, '&' as 'and',
+            punctuation as spaces, without a leading 'the' or a trailing
+            'council') must be a keyword, so 'newport' does not match
+            'newport pagnell'. Used with a list of full names.
+        'prefix': the keyword's words must be the leading words of the name
+            ('rhondda' matches 'rhondda cynon taf', 'fife' does not match
+            inside another word).
+        'substring': the keyword may appear anywhere, as the original
+            alternation regex did. Kept for compatibility.
+    """
+    END = object()
 
+    def __init__(self, keywords, mode='exact'):
+        if mode not in ('exact', 'prefix', 'substring'):
+            raise ValueError(f"Unknown match mode: {mode}")
+        self.mode = mode
+        labels = keywords if isinstance(keywords, dict) else {keyword: keyword for keyword in keywords}
+        self.labels = labels
+        self.names = {self.normalise(keyword): label for keyword, label in labels.items()}
+        self.pattern = re.compile('|'.join(labels))
+        # Word trie: each path of words ends at the keyword it spells
+        self.trie = {}
+        for keyword, label in labels.items():
+            node = self.trie
+            for word in self.words(keyword):
+                node = node.setdefault(word, {})
+            node.setdefault(self.END, label)
+
+    @staticmethod
+    def words(name):
+        return re.sub(r'[^a-z0-9]+', ' ', str(name).lower()).split()
+
+    @classmethod
+    def normalise(cls, name):
+        words = cls.words(str(name).replace('&', ' and '))
+        if words[:1] == ['the']:
+            words = words[1:]
+        if words[-1:] == ['council']:
+            words = words[:-1]
+        return ' '.join(words)
+
+    def match(self, name):
+        """
+        Return the keyword (or its reported name) matching `name`, or None.
+        """
+        if pd.isna(name):
+            return None
+        if self.mode == 'exact':
+            return self.names.get(self.normalise(name))
+        if self.mode == 'substring':
+            found = self.pattern.search(str(name).lower())
+            return self.labels.get(found.group(0), found.group(0)) if found else None
+        node, matched = self.trie, None
+        for word in self.words(name):
+            if word not in node:
+                break
+            node = node[word]
+            matched = node.get(self.END, matched)
+        return matched
+
+    def matches(self, names):
+        """
+        Keyword matched by each name (NaN where none matched).
+        """
+        codes, uniques = pd.factorize(names)
+        matched = np.array([self.match(name) for name in uniques] + [None], dtype=object)
+        return pd.Series(matched[codes], index=names.index, name='keyword')
+
+    def mask(self, names):
+        """
+        Boolean mask of names matching any keyword.
+        """
+        return self.matches(names).notna()
+
+@profiled()
+def filter_non_england(dataset, non_england_keywords=non_england_names, mode='exact', report=False):
+    """
+    Drop rows whose local authority is a devolved nation or Crown dependency
+    council, matching whole names against non_england_names by default.
+    Pass the old non_england_keywords with mode='prefix' or 'substring' for
+    keyword matching. With `report=True` also return the number of rows
+    dropped per council (or keyword).
+    """
+    matcher = KeywordMatcher(non_england_keywords, mode=mode)
+    matches = matcher.matches(dataset['local_authority'])
+    filtered = dataset[matches.isna()]
+    if report:
+        return filtered, matches.value_counts()
+    return filtered
+
+@profiled()
+def melt_sheet(df, year):
+    df['financial_year'] = year
+    return df.melt(
+        id_vars=["local_authority", "financial_year"],
+        value_vars=[col for col in df.columns if col not in ID_COLUMNS],
+        var_name="category", value_name="value"
+    )
+
+@profiled()
 def melt_disposal(dfs):
     long_frames = []
     years = list(range(2014, 2024))
     for i, df in enumerate(dfs):
         if df.empty or 'local_authority' not in df.columns:
             continue
-        df['financial_year'] = years[i]
-        long_df = df.melt(
-            id_vars=["local_authority", "financial_year"],
-            value_vars=[col for col in df.columns if col not in ["ecode", 'lgf code', 'ons code', "class", "subclass", "local_authority", "financial_year", 'certification complete']],
-            var_name="category", value_name="value"
-        )
-        long_frames.append(long_df)
+        long_frames.append(melt_sheet(df, years[i]))
     return pd.concat(long_frames, ignore_index=True)
 
-def create_complete_panel(disposal_long_df, dataset):
-    removals = dataset.groupby(['local_authority', 'removal_fy', 'size_category']).size().reset_index(name='removals').rename(columns={'removal_fy': 'financial_year'})
-    disposal_long_df = disposal_long_df[disposal_long_df['category'] == 'all services total']
-    disposal_long_df = disposal_long_df.groupby(['local_authority', 'financial_year', 'category']).agg({'value': 'sum'}).reset_index()
-    
-    unique_years = disposal_long_df['financial_year'].unique()
-    unique_authorities = disposal_long_df['local_authority'].unique()
-    unique_size_categories = removals['size_category'].dropna().unique()
-    all_combinations = list(itertools.product(unique_years, unique_authorities, unique_size_categories))
-    complete_index = pd.DataFrame(all_combinations, columns=['financial_year', 'local_authority', 'size_category'])
-    
-    complete_disposal = pd.merge(complete_index, disposal_long_df, on=["financial_year", "local_authority"], how="left")
-    panel = pd.merge(complete_disposal, removals, how="left", on=['local_authority', 'financial_year','size_category'] )
-    
-    panel['removals'] = panel['removals'].fillna(0).astype(int)
-    panel = panel[(panel['financial_year'] >= 2015) & (panel['financial_year'] <= 2023)]
-    panel['value'] = pd.to_numeric(panel['value'], errors='coerce')/1000 # Convert from (All figures in £000s) to millions
-    panel['removals'] = panel['removals'].fillna(0).astype(int)
-    panel['value'] = panel.groupby(['local_authority', 'financial_year'])['value'].transform('first')
-    filtered_panel = panel.drop(columns=['category'], errors='ignore').sort_values(['local_authority', 'size_category', 'financial_year'])
-    
-    for lag in [1, 2, 3]:
-        filtered_panel[f'value_lag{lag}'] = filtered_panel.groupby(['local_authority', 'size_category'])['value'].shift(lag)
-    
-    filtered_panel = filtered_panel.dropna(subset=['value'])
-    
-    return filtered_panel
+@profiled()
+def count_removals(dataset):
+    return dataset.groupby(['local_authority', 'removal_fy', 'size_category'], observed=True).size().reset_index(name='removals').rename(columns={'removal_fy': 'financial_year'})
+
+def create_complete_panel(disposal_long_df, dataset, categories=None):
+    return build_panel(disposal_long_df, count_removals(dataset), categories=categories)
+
+@profiled()
+def build_panel(disposal_long_df, removals, lags=(1, 2, 3), categories=None, years=None, size_categories=None):
+    """
+    Build the complete local authority x size category x financial year
+    panel with a MultiIndex product instead of merging a cartesian frame.
+    Receipts are held as an authority x year matrix, so lags are a single
+    shift along the year axis, then broadcast across size categories.
+
+    By default the panel is built from PANEL_CATEGORIES. Pass a list of
+    receipt categories (or 'all') to build each category's panel in the
+    same pass, stacked with a leading `category` column.
+
+    `years` and `size_categories` default to those in the receipts and
+    removals; the out-of-core build passes the panel-wide ones so every
+    partition has the same panel shape.
+    """
+    if categories is None:
+        selected = PANEL_CATEGORIES
+    elif categories == 'all':
+        selected = sorted(disposal_long_df['category'].dropna().unique())
+    else:
+        selected = list(dict.fromkeys(categories))
+    disposal_long_df = disposal_long_df[disposal_long_df['category'].isin(selected)]
+    receipts = disposal_long_df.groupby(['category', 'local_authority', 'financial_year']).agg({'value': 'sum'})['value']
+
+    if years is None:
+        years = np.sort(receipts.index.unique('financial_year'))
+    years = years[(years >= 2015) & (years <= 2023)]
+    authorities = np.sort(receipts.index.unique('local_authority'))
+    if size_categories is None:
+        size_categories = np.sort(removals['size_category'].dropna().unique())
+
+    # Category x authority rows by year columns, converted from (All
+    # figures in £000s) to millions. Authorities without receipts in a
+    # category get missing values, so their rows are dropped below
+    values = receipts.unstack('financial_year').reindex(
+        index=pd.MultiIndex.from_product([selected, authorities]), columns=years
+    )
+    values = values.apply(pd.to_numeric, errors='coerce') / 1000
+
+    index = pd.MultiIndex.from_product(
+        [authorities, size_categories, years],
+        names=['local_authority', 'size_category', 'financial_year']
+    )
+    removals = removals.dropna(subset=['local_authority', 'financial_year', 'size_category'])
+    removal_counts = (
+        removals.astype({'financial_year': years.dtype})
+        .set_index(['local_authority', 'size_category', 'financial_year'])['removals']
+        .reindex(index, fill_value=0)
+        .astype(int)
+    )
+
+    shape = (len(selected), len(authorities), len(size_categories), len(years))
+
+    def broadcast(matrix):
+        # Repeat each category and authority's year row once per size category
+        matrix = np.asarray(matrix, dtype=float).reshape(shape[0], shape[1], 1, shape[3])
+        return np.broadcast_to(matrix, shape).ravel()
+
+    frame = index.to_frame(index=False)[['financial_year', 'local_authority', 'size_category']]
+    panel = frame.iloc[np.tile(np.arange(len(frame)), len(selected))].reset_index(drop=True)
+    panel['value'] = broadcast(values)
+    panel['removals'] = np.tile(removal_counts.to_numpy(), len(selected))
+    for lag in lags:
+        panel[f'value_lag{lag}'] = broadcast(values.shift(lag, axis=1))
+    if categories is not None:
+        panel.insert(0, 'category', np.repeat(selected, len(index)))
+
+    return panel[panel['value'].notna()]
@@ -0,0 +1,165 @@
+# incremental.py
+
+import glob
+import json
+import os
+
+import pandas as pd
+
+from src.cleaning.cache import file_hash, write_frame, read_frame
+from src.cleaning.clean_receipt import build_panel
+
+PANEL_STORE_DIR = 'data/processed/panel_store'
+MAX_LAG = 3
+PANEL_KEYS = ['local_authority', 'size_category', 'financial_year']
+
+def store_path(store_dir: str, kind: str, name) -> str:
+    os.makedirs(os.path.join(store_dir, kind), exist_ok=True)
+    return os.path.join(store_dir, kind, str(name))
+
+def find_stored(store_dir: str, kind: str, name) -> str:
+    matches = glob.glob(os.path.join(store_dir, kind, f"{name}.*"))
+    if not matches:
+        raise FileNotFoundError(f"No stored '{kind}' result for {name} in {store_dir}")
+    return matches[0]
+
+def save_stored(df: pd.DataFrame, store_dir: str, kind: str, name):
+    for old in glob.glob(os.path.join(store_dir, kind, f"{name}.*")):
+        os.remove(old)
+    write_frame(df, store_path(store_dir, kind, name))
+
+def load_stored(store_dir: str, kind: str, name) -> pd.DataFrame:
+    return read_frame(find_stored(store_dir, kind, name))
+
+def stored_years(store_dir: str = PANEL_STORE_DIR) -> list:
+    """
+    Financial years with a stored melted receipts frame.
+    """
+    paths = glob.glob(os.path.join(store_dir, 'long', '*.*'))
+    return sorted({int(os.path.basename(p).split('.')[0]) for p in paths})
+
+def save_year_long(long_df: pd.DataFrame, year: int, store_dir: str = PANEL_STORE_DIR):
+    """
+    Store one year's cleaned and melted receipts. The cleaned sheet itself
+    is not stored: the raw sheet is kept in the raw input cache and
+    cleaning it again is cheaper than reading a stored copy back.
+    """
+    save_stored(long_df, store_dir, 'long', year)
+
+def remove_year(year: int, store_dir: str = PANEL_STORE_DIR):
+    """
+    Remove a year's stored receipts and panel rows.
+    """
+    for kind in ['long', 'panel']:
+        for old in glob.glob(os.path.join(store_dir, kind, f"{year}.*")):
+            os.remove(old)
+
+def prune_years(keep_years, store_dir: str = PANEL_STORE_DIR) -> list:
+    """
+    Remove stored years not in `keep_years`, e.g. sheets a full build
+    skipped as empty. Returns the removed years.
+    """
+    removed = [year for year in stored_years(store_dir) if year not in set(keep_years)]
+    for year in removed:
+        remove_year(year, store_dir)
+    return removed
+
+def save_removals(removals: pd.DataFrame, store_dir: str = PANEL_STORE_DIR):
+    """
+    Store removal counts per local authority, financial year and size.
+    """
+    save_stored(removals, store_dir, 'removals', 'all')
+
+def save_year_panel(panel: pd.DataFrame, year: int, store_dir: str = PANEL_STORE_DIR):
+    """
+    Store one year's panel rows. Years outside the panel window hold no rows
+    and have no stored partition.
+    """
+    if panel.empty:
+        for old in glob.glob(os.path.join(store_dir, 'panel', f"{year}.*")):
+            os.remove(old)
+        return
+    save_stored(panel.reset_index(drop=True), store_dir, 'panel', year)
+
+def charity_changed(charity_path: str, store_dir: str = PANEL_STORE_DIR) -> bool:
+    """
+    Whether the cleaned charity dataset differs from the one the stored
+    removal counts were built from.
+    """
+    sha_path = os.path.join(store_dir, 'charity.sha256')
+    if not os.path.exists(sha_path) or not glob.glob(os.path.join(store_dir, 'removals', '*.*')):
+        return True
+    with open(sha_path) as f:
+        return f.read().strip() != file_hash(charity_path)
+
+def record_charity(charity_path: str, store_dir: str = PANEL_STORE_DIR):
+    os.makedirs(store_dir, exist_ok=True)
+    with open(os.path.join(store_dir, 'charity.sha256'), 'w') as f:
+        f.write(file_hash(charity_path))
+
+def categories_changed(categories, store_dir: str = PANEL_STORE_DIR) -> bool:
+    """
+    Whether the stored receipts were melted for a different category
+    selection (None for every category).
+    """
+    path = os.path.join(store_dir, 'categories.json')
+    if not os.path.exists(path):
+        return True
+    with open(path) as f:
+        return json.load(f) != categories
+
+def record_categories(categories, store_dir: str = PANEL_STORE_DIR):
+    os.makedirs(store_dir, exist_ok=True)
+    with open(os.path.join(store_dir, 'categories.json'), 'w') as f:
+        json.dump(categories, f)
+
+def affected_years(changed_years, years, max_lag: int = MAX_LAG) -> list:
+    """
+    Changed years plus the `max_lag` following years whose lag columns
+    read the changed values. A changed year missing from `years` (its
+    receipts were removed) shifts the lags of the `max_lag` years after it.
+    """
+    years = sorted(years)
+    affected = set()
+    for year in changed_years:
+        later = [y for y in years if y >= year]
+        affected.update(later[:max_lag + 1 if year in years else max_lag])
+    return sorted(affected)
+
+def rebuild_panel_years(
+        changed_years,
+        store_dir: str = PANEL_STORE_DIR,
+        max_lag: int = MAX_LAG,
+        categories=None
+    ) -> list:
+    """
+    Recompute and store the panel rows of the changed years and of the
+    years whose lags depend on them. Each rebuilt year only needs its own
+    receipts, those of the `max_lag` preceding years and the removal counts.
+    `categories` is passed to build_panel. Returns the rebuilt years.
+    """
+    years = stored_years(store_dir)
+    rebuild = affected_years(changed_years, years, max_lag)
+    if not rebuild:
+        return rebuild
+    removals = load_stored(store_dir, 'removals', 'all')
+
+    for year in rebuild:
+        position = years.index(year)
+        window = years[max(0, position - max_lag):position + 1]
+        long_df = pd.concat(
+            [load_stored(store_dir, 'long', y) for y in window], ignore_index=True
+        )
+        panel = build_panel(long_df, removals, categories=categories)
+        save_year_panel(panel[panel['financial_year'] == year], year, store_dir)
+    return rebuild
+
+def assemble_panel(store_dir: str = PANEL_STORE_DIR) -> pd.DataFrame:
+    """
+    Concatenate the stored per-year panel rows in create_complete_panel order
+    (by category first for per-category panels).
+    """
+    paths = glob.glob(os.path.join(store_dir, 'panel', '*.*'))
+    panel = pd.concat([read_frame(p) for p in paths], ignore_index=True)
+    keys = (['category'] if 'category' in panel.columns else []) + PANEL_KEYS
+    return panel.sort_values(keys).reset_index(drop=True)
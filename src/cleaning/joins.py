@@ -0,0 +1,86 @@
+# joins.py
+
+import numpy as np
+import pandas as pd
+
+def key_codes(left: pd.DataFrame, right: pd.DataFrame):
+    """
+    One int64 code per row of each side, equal where all key columns are
+    equal. Missing keys get their own code, so they match each other as
+    they do in pd.merge.
+    """
+    left_codes = np.zeros(len(left), dtype=np.int64)
+    right_codes = np.zeros(len(right), dtype=np.int64)
+    for left_col, right_col in zip(left.columns, right.columns):
+        codes, uniques = pd.factorize(
+            np.concatenate([left[left_col].to_numpy(dtype=object), right[right_col].to_numpy(dtype=object)])
+        )
+        n_codes = len(uniques) + 1
+        codes = np.where(codes == -1, len(uniques), codes)
+        left_codes = left_codes * n_codes + codes[:len(left)]
+        right_codes = right_codes * n_codes + codes[len(left):]
+    return left_codes, right_codes
+
+def join_indexer(left: pd.DataFrame, right: pd.DataFrame):
+    """
+    Row positions of a left join on the key columns of `left` and `right`:
+    every left row in order, followed by its matching right rows in their
+    original order, with -1 where a left row has no match. The left
+    positions are None when no left row matches more than one right row,
+    i.e. the left side is kept as it is. Also returns the number of
+    matches of each left row.
+    """
+    left_codes, right_codes = key_codes(left, right)
+    order = np.argsort(right_codes, kind='stable')
+    sorted_codes = right_codes[order]
+    start = np.searchsorted(sorted_codes, left_codes, side='left')
+    counts = np.searchsorted(sorted_codes, left_codes, side='right') - start
+
+    if counts.max(initial=0) <= 1:
+        right_take = np.full(len(left), -1, dtype=np.int64)
+        right_take[counts == 1] = order[start[counts == 1]]
+        return None, right_take, counts
+
+    # Repeat each left row once per match (once if it has none)
+    repeats = np.maximum(counts, 1)
+    left_take = np.repeat(np.arange(len(left)), repeats)
+    offset = np.arange(len(left_take)) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+    matched = np.repeat(counts > 0, repeats)
+    right_take = np.full(len(left_take), -1, dtype=np.int64)
+    right_take[matched] = order[np.repeat(start, repeats)[matched] + offset[matched]]
+    return left_take, right_take, counts
+
+def attach_columns(
+        base: pd.DataFrame,
+        right: pd.DataFrame,
+        left_on,
+        right_on,
+        columns: list,
+        suffixes: tuple = ('_x', '_y')
+    ):
+    """
+    Left join `columns` of `right` onto `base` by positional take, with the
+    rows, column order, suffixes and missing values of pd.merge(how='left').
+    When no base row matches more than once, the columns are added to
+    `base` itself and nothing else is copied; otherwise the base rows are
+    repeated into a new frame. `base` must have a RangeIndex. Returns the
+    joined frame and the share of base rows with a match.
+    """
+    left_on = [left_on] if isinstance(left_on, str) else list(left_on)
+    right_on = [right_on] if isinstance(right_on, str) else list(right_on)
+    left_take, right_take, counts = join_indexer(base[left_on], right[right_on])
+    if left_take is not None:
+        base = base.take(left_take).reset_index(drop=True)
+
+    # Overlapping non-key columns get merge's suffixes
+    shared_keys = {l for l, r in zip(left_on, right_on) if l == r}
+    overlap = [col for col in columns if col in base.columns and col not in shared_keys]
+    if overlap:
+        base.columns = [col + suffixes[0] if col in overlap else col for col in base.columns]
+
+    # Position -1 is not in the RangeIndex, so unmatched rows become missing
+    for col in columns:
+        taken = right[col].reset_index(drop=True).reindex(right_take)
+        base[col + suffixes[1] if col in overlap else col] = taken.array
+    match_rate = float((counts > 0).mean()) if len(counts) else np.nan
+    return base, match_rate
@@ -0,0 +1,157 @@
+# load_raw.py
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from src.cleaning.cache import CACHE_DIR, cache_lookup, cache_store
+from src.cleaning.clean_receipt import SHEET_LAYOUT, clean_year_sheet, alias_report
+from src.cleaning.profiling import (
+    active_profiler, enable_profiling, profiler_settings, profiled, stage
+)
+
+CHUNKSIZE = 500_000
+
+COMPANY_HOUSE_COLUMNS = ['CompanyNumber', 'CompanyStatus', 'RegAddress.PostCode']
+
+def normalise_keys(values: pd.Series) -> pd.Series:
+    """
+    Normalise join keys the same way the cleaning functions do.
+    """
+    return values.astype(str).str.strip()
+
+def read_csv_filtered(
+        filepath: str,
+        columns: list,
+        key: str,
+        keep: set,
+        normalise=normalise_keys,
+        chunksize: int = CHUNKSIZE
+    ) -> pd.DataFrame:
+    """
+    Stream a large csv in chunks, reading only `columns` as strings and
+    keeping rows whose normalised `key` is in `keep`. Column names are
+    matched after stripping whitespace, so ' CompanyNumber' matches
+    'CompanyNumber'.
+    """
+    wanted = set(columns)
+    reader = pd.read_csv(
+        filepath,
+        usecols=lambda col: col.strip() in wanted,
+        dtype=str,
+        chunksize=chunksize
+    )
+    chunks = []
+    for chunk in reader:
+        # Header names may carry padding, e.g. ' CompanyNumber'
+        key_col = [col for col in chunk.columns if col.strip() == key][0]
+        chunks.append(chunk[normalise(chunk[key_col]).isin(keep)])
+
+    return pd.concat(chunks, ignore_index=True)
+
+@profiled()
+def load_company_house(
+        filepath: str,
+        company_numbers: pd.Series,
+        chunksize: int = CHUNKSIZE
+    ) -> pd.DataFrame:
+    """
+    Load the Companies House columns used by clean_charity_main, keeping
+    only companies that appear in the charity register.
+    """
+    keep = set(normalise_keys(company_numbers))
+    return read_csv_filtered(
+        filepath,
+        columns=COMPANY_HOUSE_COLUMNS,
+        key='CompanyNumber',
+        keep=keep,
+        chunksize=chunksize
+    )
+
+_workbook = None
+
+def _open_workbook(filepath, profiling=None):
+    # Each worker opens the workbook once (read-only) and parses its sheets from it
+    global _workbook
+    _workbook = pd.ExcelFile(filepath)
+    if profiling is not None:
+        enable_profiling(**profiling)
+
+def _parse_sheet(workbook, year, categories=None):
+    with stage(f'load_sheet_{year}') as current:
+        raw = pd.read_excel(workbook, sheet_name=year, skiprows=SHEET_LAYOUT[year]['skiprows'])
+        sheet, matched = clean_year_sheet(raw.copy(), year, report=True, categories=categories)
+        current.output(sheet)
+    return raw, sheet, matched
+
+def _load_and_clean_sheet(year, categories=None):
+    # Stage records made in the worker go back to the parent with the sheet
+    profiler = active_profiler()
+    first_record = len(profiler.records) if profiler is not None else 0
+    raw, sheet, matched = _parse_sheet(_workbook, year, categories)
+    records = profiler.records[first_record:] if profiler is not None else []
+    return year, raw, sheet, matched, records
+
+@profiled()
+def load_receipt_sheets(
+        filepath: str,
+        years: list = None,
+        max_workers: int = None,
+        cache_dir: str = CACHE_DIR,
+        report: bool = False,
+        categories: list = None
+    ) -> dict:
+    """
+    Load and clean the receipts sheets listed in SHEET_LAYOUT (or `years`).
+    Sheets found in the raw input cache are cleaned in this process; the
+    rest are parsed and cleaned in a process pool whose workers each open
+    the workbook once (in this process when `max_workers=1` or only one
+    sheet is parsed), then written to the cache. Returns {year: cleaned
+    sheet} in SHEET_LAYOUT order. Pass `cache_dir=None` to skip the cache.
+    With `categories`, each sheet keeps only those receipt categories, so
+    cleaning and melting skip the rest. With `report=True` also return the
+    alias_report of merged columns.
+    """
+    years = list(years or SHEET_LAYOUT)
+    cleaned, matched, to_parse = {}, {}, []
+    for year in years:
+        raw = None
+        if cache_dir is not None:
+            raw = cache_lookup(
+                pd.read_excel, filepath, cache_dir,
+                skiprows=SHEET_LAYOUT[year]['skiprows'], sheet_name=year
+            )
+        if raw is None:
+            to_parse.append(year)
+        else:
+            with stage(f'load_sheet_{year}', raw) as current:
+                cleaned[year], matched[year] = clean_year_sheet(raw, year, report=True, categories=categories)
+                current.output(cleaned[year])
+
+    if to_parse:
+        max_workers = min(max_workers or os.cpu_count(), len(to_parse))
+        if max_workers == 1:
+            # No pool of its own, e.g. inside a pipeline task already running in a worker
+            with pd.ExcelFile(filepath) as workbook:
+                parsed = [(year, *_parse_sheet(workbook, year, categories), []) for year in to_parse]
+        else:
+            with ProcessPoolExecutor(
+                    max_workers=max_workers,
+                    initializer=_open_workbook,
+                    initargs=(filepath, profiler_settings())) as pool:
+                parsed = list(pool.map(_load_and_clean_sheet, to_parse, [categories] * len(to_parse)))
+        for year, raw, sheet, found, records in parsed:
+            cleaned[year], matched[year] = sheet, found
+            if records:
+                active_profiler().extend(records)
+            if cache_dir is not None:
+                cache_store(
+                    raw, pd.read_excel, filepath, cache_dir,
+                    skiprows=SHEET_LAYOUT[year]['skiprows'], sheet_name=year
+                )
+
+    sheets = {year: cleaned[year] for year in years}
+    if report:
+        return sheets, alias_report({year: matched[year] for year in years})
+    return sheets
@@ -0,0 +1,325 @@
+# partitioned.py
+
+import glob
+import heapq
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from src.cleaning.charity_store import iter_charity_main
+from src.cleaning.clean_receipt import (
+    PANEL_CATEGORIES,
+    flat_lookup,
+    non_england_names,
+    apply_local_authority_cleaning,
+    filter_non_england,
+    melt_sheet,
+    count_removals,
+    build_panel
+)
+
+PARTITION_DIR = 'data/processed/partitioned'
+N_PARTITIONS = 16
+METADATA_NAME = 'dataset.json'
+REMOVAL_COLUMNS = ['local_authority', 'removal_fy', 'size_category']
+
+def partition_of(labels: pd.Series, n_partitions: int) -> np.ndarray:
+    """
+    Partition number of each local authority name from a stable hash, so
+    the charity register and the receipts put an authority in the same
+    partition in every run.
+    """
+    return (pd.util.hash_array(labels.astype(object).to_numpy()) % n_partitions).astype(int)
+
+def partition_path(dataset_dir: str, kind: str, partition: int) -> str:
+    return os.path.join(dataset_dir, kind, f'partition={partition:03d}')
+
+def write_partitions(df: pd.DataFrame, dataset_dir: str, kind: str, name: str, n_partitions: int):
+    """
+    Split rows by local authority partition and write each part as
+    `<kind>/partition=<k>/<name>.parquet`.
+    """
+    parts = partition_of(df['local_authority'], n_partitions)
+    # One stable sort by partition, then a slice per partition
+    order = np.argsort(parts, kind='stable')
+    df, parts = df.take(order), parts[order]
+    partitions, starts = np.unique(parts, return_index=True)
+    for partition, start, end in zip(partitions, starts, list(starts[1:]) + [len(df)]):
+        directory = partition_path(dataset_dir, kind, partition)
+        os.makedirs(directory, exist_ok=True)
+        df.iloc[start:end].to_parquet(os.path.join(directory, f'{name}.parquet'), index=False)
+
+def read_partition(dataset_dir: str, kind: str, partition: int, columns: list = None) -> pd.DataFrame:
+    """
+    All files of one partition. Files are read one by one, as chunks may
+    differ in which columns are entirely missing.
+    """
+    paths = sorted(glob.glob(os.path.join(partition_path(dataset_dir, kind, partition), '*.parquet')))
+    if not paths:
+        return pd.DataFrame(columns=columns)
+    return pd.concat([pd.read_parquet(path, columns=columns) for path in paths], ignore_index=True)
+
+def clear_partitions(dataset_dir: str, kind: str):
+    shutil.rmtree(os.path.join(dataset_dir, kind), ignore_errors=True)
+
+def load_metadata(dataset_dir: str = PARTITION_DIR) -> dict:
+    with open(os.path.join(dataset_dir, METADATA_NAME)) as f:
+        return json.load(f)
+
+def save_metadata(metadata: dict, dataset_dir: str = PARTITION_DIR):
+    os.makedirs(dataset_dir, exist_ok=True)
+    with open(os.path.join(dataset_dir, METADATA_NAME), 'w') as f:
+        json.dump(metadata, f, indent=2, sort_keys=True)
+
+def encode_values(long_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Parquet-safe melted receipts: sheet cells mix numbers and text, which
+    build_panel sums as they are, so text cells are kept apart in
+    `value_text` and `value` holds the numbers.
+    """
+    if long_df['value'].dtype != object:
+        return long_df
+    is_text = long_df['value'].map(lambda v: isinstance(v, str)).astype(bool)
+    return long_df.assign(
+        value=pd.to_numeric(long_df['value'].where(~is_text), errors='coerce').astype(float),
+        value_text=long_df['value'].where(is_text).astype(object)
+    )
+
+def decode_values(long_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Inverse of encode_values, back to the object column melt_sheet gives.
+    """
+    if 'value_text' not in long_df.columns:
+        return long_df
+    text = long_df['value_text'].notna()
+    values = long_df['value'].astype(object)
+    values[text] = long_df['value_text'][text]
+    return long_df.drop(columns='value_text').assign(value=values)
+
+def partition_receipts(
+        sheets: dict,
+        dataset_dir: str = PARTITION_DIR,
+        n_partitions: int = N_PARTITIONS,
+        categories=None
+    ) -> dict:
+    """
+    Melt each cleaned receipts sheet ({year: sheet}) and write it to the
+    receipts partitions, one year in memory at a time. Returns the panel
+    years and categories found, for `categories` as build_panel takes them.
+    """
+    clear_partitions(dataset_dir, 'receipts')
+    if categories is None:
+        selected = set(PANEL_CATEGORIES)
+    elif categories != 'all':
+        selected = set(categories)
+    years, found = set(), set()
+    for year, df in sheets.items():
+        if df.empty or 'local_authority' not in df.columns:
+            continue
+        long_df = melt_sheet(df, int(year))
+        found.update(long_df['category'].dropna().unique())
+        keyed = long_df['local_authority'].notna() & long_df['category'].notna()
+        if categories != 'all':
+            keyed &= long_df['category'].isin(selected)
+        if keyed.any():
+            years.add(int(year))
+        write_partitions(encode_values(long_df), dataset_dir, 'receipts', str(year), n_partitions)
+    return {'years': sorted(years), 'categories': sorted(found)}
+
+def partition_charity(
+        charity_path: str,
+        dataset_dir: str = PARTITION_DIR,
+        n_partitions: int = N_PARTITIONS,
+        chunksize: int = 200_000,
+        normaliser=None
+    ) -> dict:
+    """
+    Read the cleaned charity dataset in chunks, clean local authority names,
+    drop non-England charities and write the rows to the charity partitions.
+    Returns the size categories that removals are counted for and the
+    dropped charities per matched keyword.
+    """
+    clear_partitions(dataset_dir, 'charity')
+    size_categories, dropped = set(), []
+    for i, chunk in enumerate(iter_charity_main(charity_path, chunksize)):
+        _, chunk = apply_local_authority_cleaning([], chunk, flat_lookup, normaliser)
+        chunk, chunk_dropped = filter_non_england(chunk, non_england_names, report=True)
+        dropped.append(chunk_dropped)
+        counted = chunk[REMOVAL_COLUMNS].notna().all(axis=1)
+        size_categories.update(chunk.loc[counted, 'size_category'].astype(object).unique())
+        # Plain strings, as each chunk's categoricals have their own categories
+        categorical = chunk.columns[chunk.dtypes == 'category']
+        chunk = chunk.astype({col: object for col in categorical})
+        write_partitions(chunk, dataset_dir, 'charity', f'chunk-{i:05d}', n_partitions)
+    dropped = pd.concat(dropped).groupby(level=0).sum() if dropped else pd.Series(dtype=int)
+    return {'size_categories': sorted(size_categories), 'dropped': dropped}
+
+def partition_inputs(
+        sheets: dict,
+        charity_path: str,
+        dataset_dir: str = PARTITION_DIR,
+        n_partitions: int = N_PARTITIONS,
+        chunksize: int = 200_000,
+        categories=None,
+        normaliser=None
+    ) -> pd.Series:
+    """
+    Write the receipts and charity partitions and the dataset metadata the
+    partition builds share. Returns the dropped non-England charities per
+    matched keyword.
+    """
+    receipts = partition_receipts(sheets, dataset_dir, n_partitions, categories)
+    charity = partition_charity(charity_path, dataset_dir, n_partitions, chunksize, normaliser)
+    save_metadata({
+        'n_partitions': n_partitions,
+        'years': receipts['years'],
+        'categories': receipts['categories'],
+        'size_categories': charity['size_categories'],
+    }, dataset_dir)
+    return charity['dropped']
+
+def build_partition(
+        partition: int,
+        dataset_dir: str,
+        years: list,
+        size_categories: list,
+        categories=None,
+        lags=(1, 2, 3)
+    ) -> int:
+    """
+    Count removals and build the panel for the authorities of one
+    partition, with the panel-wide years and size categories, and write
+    both. Returns the number of panel rows.
+    """
+    charity = read_partition(dataset_dir, 'charity', partition, columns=REMOVAL_COLUMNS)
+    removals = count_removals(charity.astype({'removal_fy': 'Int32'}))
+    if len(removals):
+        directory = partition_path(dataset_dir, 'removals', partition)
+        os.makedirs(directory, exist_ok=True)
+        removals.to_parquet(os.path.join(directory, 'removals.parquet'), index=False)
+
+    receipts = decode_values(read_partition(dataset_dir, 'receipts', partition))
+    if receipts.empty:
+        return 0
+    panel = build_panel(
+        receipts, removals, lags=lags, categories=categories,
+        years=np.array(years, dtype=receipts['financial_year'].dtype),
+        size_categories=np.array(size_categories, dtype=object)
+    )
+    if panel.empty:
+        return 0
+    directory = partition_path(dataset_dir, 'panel', partition)
+    os.makedirs(directory, exist_ok=True)
+    panel.to_parquet(os.path.join(directory, 'panel.parquet'), index=False)
+    return len(panel)
+
+def panel_categories(categories, metadata: dict) -> list:
+    """
+    Receipt categories of the panel in build_panel order (None for the
+    default panel, which has no category column).
+    """
+    if categories is None:
+        return None
+    if categories == 'all':
+        return metadata['categories']
+    return list(dict.fromkeys(categories))
+
+def build_partitioned_panel(
+        dataset_dir: str = PARTITION_DIR,
+        categories=None,
+        lags=(1, 2, 3),
+        workers: int = 1
+    ) -> int:
+    """
+    Build removals and panel partitions from the charity and receipts
+    partitions, each worker holding one partition at a time. `workers=1`
+    builds them in this process. Returns the number of panel rows.
+    """
+    metadata = load_metadata(dataset_dir)
+    for kind in ['removals', 'panel']:
+        clear_partitions(dataset_dir, kind)
+    build = partial(
+        build_partition,
+        dataset_dir=dataset_dir,
+        years=metadata['years'],
+        size_categories=metadata['size_categories'],
+        categories=panel_categories(categories, metadata),
+        lags=lags
+    )
+    partitions = range(metadata['n_partitions'])
+    if workers == 1:
+        return sum(build(partition) for partition in partitions)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return sum(pool.map(build, partitions))
+
+def panel_groups(path: str, categories: list = None, batch_size: int = 100_000):
+    """
+    One partition's panel rows per category and local authority, in file
+    order, as ((category position, local authority), batch, start, end)
+    with the rows being batch[start:end]. Reads `batch_size` rows at a time.
+    """
+    rank = {category: i for i, category in enumerate(categories or [])}
+    pending = None
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+        frame = batch.to_pandas()
+        if pending is not None:
+            frame = pd.concat([pending, frame], ignore_index=True)
+        authority = frame['local_authority'].to_numpy(dtype=object)
+        category = frame['category'].to_numpy(dtype=object) if categories else np.zeros(len(frame), dtype=object)
+        change = (authority[1:] != authority[:-1]) | (category[1:] != category[:-1])
+        bounds = np.concatenate([[0], np.flatnonzero(change) + 1, [len(frame)]])
+        # The last group may continue in the next batch
+        for start, end in zip(bounds[:-2], bounds[1:-1]):
+            yield (rank.get(category[start], 0), authority[start]), frame, start, end
+        pending = frame.iloc[bounds[-2]:]
+    if pending is not None and len(pending):
+        category = pending['category'].iloc[0] if categories else 0
+        yield (rank.get(category, 0), pending['local_authority'].iloc[0]), pending, 0, len(pending)
+
+def gather_groups(groups: list) -> pd.DataFrame:
+    """
+    Rows of (batch, start, end) groups in list order, with one take per
+    batch rather than a slice per group.
+    """
+    by_batch = {}
+    for position, (frame, start, end) in enumerate(groups):
+        by_batch.setdefault(id(frame), (frame, []))[1].append((position, start, end))
+    pieces, positions = [], []
+    for frame, ranges in by_batch.values():
+        pieces.append(frame.take(np.concatenate([np.arange(start, end) for _, start, end in ranges])))
+        positions.append(np.concatenate([np.full(end - start, position) for position, start, end in ranges]))
+    rows = pd.concat(pieces, ignore_index=True)
+    return rows.take(np.argsort(np.concatenate(positions), kind='stable'))
+
+def write_panel_csv(
+        output_path: str,
+        dataset_dir: str = PARTITION_DIR,
+        categories=None,
+        buffer_rows: int = 100_000
+    ) -> int:
+    """
+    Merge the sorted panel partitions into one csv in create_complete_panel
+    order, holding a batch per partition and `buffer_rows` rows to write.
+    Returns the number of rows written.
+    """
+    order = panel_categories(categories, load_metadata(dataset_dir))
+    paths = sorted(glob.glob(os.path.join(dataset_dir, 'panel', 'partition=*', 'panel.parquet')))
+    merged = heapq.merge(*[panel_groups(path, order) for path in paths], key=lambda group: group[0])
+    written, buffered, buffer = 0, 0, []
+    with open(output_path, 'w', newline='') as f:
+        for _, frame, start, end in merged:
+            buffer.append((frame, start, end))
+            buffered += end - start
+            if buffered >= buffer_rows:
+                gather_groups(buffer).to_csv(f, header=written == 0, index=False)
+                written, buffered, buffer = written + buffered, 0, []
+        if buffer:
+            gather_groups(buffer).to_csv(f, header=written == 0, index=False)
+            written += buffered
+    return written
@@ -0,0 +1,247 @@
+# pipeline.py
+
+import hashlib
+import importlib
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from graphlib import TopologicalSorter
+
+import pandas as pd
+
+from src.cleaning.cache import content_hash, file_hash, read_frame, write_frame
+from src.cleaning.profiling import (
+    active_profiler, enable_profiling, profiler_settings, stage
+)
+
+PIPELINE_DIR = 'data/pipeline'
+PIPELINE_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+
+class Task:
+    """
+    One pipeline stage: `func` is called with the frames of the `inputs`
+    tasks, the `files` and `outputs` paths and the `params` as keyword
+    arguments, and returns a DataFrame that is stored for later tasks, or
+    a (DataFrame, report) pair with a JSON-serialisable report (e.g. match
+    rates) kept in the manifest for the caller to show.
+    `outputs` are files the task writes itself (e.g. the processed csv);
+    the task reruns if one is missing. `modules` are the modules whose
+    source is part of the task's fingerprint (by default func's module).
+    """
+    def __init__(
+            self,
+            name: str,
+            func,
+            inputs: list = (),
+            files: dict = None,
+            outputs: dict = None,
+            params: dict = None,
+            modules: list = None
+        ):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.files = dict(files or {})
+        self.outputs = dict(outputs or {})
+        self.params = dict(params or {})
+        self.modules = list(modules or [func.__module__])
+
+    def code_hash(self) -> str:
+        sha = hashlib.sha256()
+        for module in sorted(self.modules):
+            sha.update(file_hash(importlib.import_module(module).__file__).encode())
+        return sha.hexdigest()
+
+def load_manifest(pipeline_dir: str = PIPELINE_DIR) -> dict:
+    manifest_path = os.path.join(pipeline_dir, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return {'hashes': {}, 'tasks': {}}
+    with open(manifest_path) as f:
+        return json.load(f)
+
+def save_manifest(manifest: dict, pipeline_dir: str = PIPELINE_DIR):
+    os.makedirs(pipeline_dir, exist_ok=True)
+    manifest_path = os.path.join(pipeline_dir, MANIFEST_NAME)
+    with open(manifest_path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+def _start_worker(profiling=None):
+    if profiling is not None:
+        enable_profiling(**profiling)
+
+def execute_task(task: Task, input_paths: dict, pipeline_dir: str = PIPELINE_DIR):
+    """
+    Load the task's input frames from the store, run it and store its
+    result. Returns the stored path, the run time, any stage records made
+    (when profiling is on in this process) and the task's report.
+    """
+    profiler = active_profiler()
+    first_record = len(profiler.records) if profiler is not None else 0
+    start = time.perf_counter()
+    with stage(task.name) as current:
+        inputs = {name: read_frame(path) for name, path in input_paths.items()}
+        result = task.func(**inputs, **task.files, **task.outputs, **task.params)
+        report = None
+        if isinstance(result, tuple):
+            result, report = result
+        current.output(result)
+        os.makedirs(pipeline_dir, exist_ok=True)
+        for old in [p for p in os.listdir(pipeline_dir) if p.split('.')[0] == task.name]:
+            os.remove(os.path.join(pipeline_dir, old))
+        path = write_frame(result, os.path.join(pipeline_dir, task.name))
+    records = profiler.records[first_record:] if profiler is not None else []
+    return task.name, path, time.perf_counter() - start, records, report
+
+class Pipeline:
+    """
+    Tasks run in dependency order, independent tasks concurrently in a
+    process pool. Each task's fingerprint covers its code, parameters,
+    raw file contents and the stored frames of its inputs; a task whose
+    fingerprint matches its last run is skipped and its stored frame
+    reused.
+    """
+    def __init__(self, tasks: list, pipeline_dir: str = PIPELINE_DIR):
+        self.tasks = {task.name: task for task in tasks}
+        self.pipeline_dir = pipeline_dir
+        for task in tasks:
+            unknown = [name for name in task.inputs if name not in self.tasks]
+            if unknown:
+                raise ValueError(f"Task '{task.name}' depends on unknown tasks: {unknown}")
+        graph = {task.name: task.inputs for task in tasks}
+        # Raises graphlib.CycleError on circular dependencies
+        self.order = list(TopologicalSorter(graph).static_order())
+
+    def upstream(self, targets) -> list:
+        """
+        `targets` and every task they depend on, in dependency order.
+        """
+        needed, stack = set(), list(targets)
+        while stack:
+            name = stack.pop()
+            if name not in needed:
+                needed.add(name)
+                stack.extend(self.tasks[name].inputs)
+        return [name for name in self.order if name in needed]
+
+    def fingerprint(self, name: str, manifest: dict) -> str:
+        """
+        Hash of the task's code, parameters, raw file contents and the
+        contents of its input frames, so a rerun upstream task that stores
+        the same frame does not make its dependants rerun.
+        """
+        task = self.tasks[name]
+        payload = json.dumps({
+            'version': PIPELINE_VERSION,
+            'name': name,
+            'code': task.code_hash(),
+            'files': {key: content_hash(path, manifest) for key, path in task.files.items()},
+            'outputs': task.outputs,
+            'params': task.params,
+            'inputs': {dep: manifest['tasks'][dep]['output_hash'] for dep in task.inputs}
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def is_current(self, name: str, fingerprint: str, manifest: dict) -> bool:
+        """
+        Whether the last run of the task had this fingerprint and its
+        stored frame and output files still exist.
+        """
+        entry = manifest['tasks'].get(name)
+        return (
+            entry is not None
+            and entry['fingerprint'] == fingerprint
+            and os.path.exists(entry['path'])
+            and all(os.path.exists(path) for path in self.tasks[name].outputs.values())
+        )
+
+    def run(self, targets: list = None, max_workers: int = None, force: bool = False) -> dict:
+        """
+        Bring `targets` (all tasks by default) up to date. Returns {task:
+        'ran' or 'skipped'} in dependency order. With `force`, every
+        needed task reruns. `max_workers=1` runs tasks in this process.
+        """
+        names = self.upstream(targets or self.order)
+        manifest = load_manifest(self.pipeline_dir)
+        pending, done, status = list(names), set(), {}
+
+        def dispatch():
+            # Skip ready tasks that are current (which may make more ready),
+            # and return the ones that need to run with their fingerprints
+            launch, progress = [], True
+            while progress:
+                progress = False
+                for name in [n for n in pending if all(dep in done for dep in self.tasks[n].inputs)]:
+                    pending.remove(name)
+                    fingerprint = self.fingerprint(name, manifest)
+                    if not force and self.is_current(name, fingerprint, manifest):
+                        status[name] = 'skipped'
+                        done.add(name)
+                        progress = True
+                    else:
+                        launch.append((name, fingerprint))
+            save_manifest(manifest, self.pipeline_dir)
+            return launch
+
+        def finished(fingerprint, name, path, seconds, records, report):
+            manifest['tasks'][name] = {
+                'fingerprint': fingerprint,
+                'path': path,
+                'output_hash': file_hash(path),
+                'seconds': round(seconds, 3),
+                'report': report
+            }
+            save_manifest(manifest, self.pipeline_dir)
+            if records and active_profiler() is not None:
+                active_profiler().extend(records)
+            status[name] = 'ran'
+            done.add(name)
+
+        def input_paths(name):
+            return {dep: manifest['tasks'][dep]['path'] for dep in self.tasks[name].inputs}
+
+        if max_workers == 1:
+            launch = dispatch()
+            while launch:
+                for name, fingerprint in launch:
+                    finished(fingerprint, *execute_task(self.tasks[name], input_paths(name), self.pipeline_dir))
+                launch = dispatch()
+            return {name: status[name] for name in names}
+
+        with ProcessPoolExecutor(
+                max_workers=max_workers,
+                initializer=_start_worker,
+                initargs=(profiler_settings(),)) as pool:
+            running = {}
+            launch = dispatch()
+            while launch or running:
+                for name, fingerprint in launch:
+                    future = pool.submit(execute_task, self.tasks[name], input_paths(name), self.pipeline_dir)
+                    running[future] = fingerprint
+                completed, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in completed:
+                    finished(running.pop(future), *future.result())
+                launch = dispatch()
+        return {name: status[name] for name in names}
+
+    def reports(self, names: list = None) -> dict:
+        """
+        Reports of the last run of `names` (all tasks by default), for the
+        tasks that made one.
+        """
+        entries = load_manifest(self.pipeline_dir)['tasks']
+        return {
+            name: entries[name]['report'] for name in (self.order if names is None else names)
+            if entries.get(name, {}).get('report') is not None
+        }
+
+    def load(self, name: str) -> pd.DataFrame:
+        """
+        Stored frame of a task from its last run.
+        """
+        entry = load_manifest(self.pipeline_dir)['tasks'].get(name)
+        if entry is None:
+            raise FileNotFoundError(f"Task '{name}' has not been run in {self.pipeline_dir}")
+        return read_frame(entry['path'])
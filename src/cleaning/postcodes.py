@@ -0,0 +1,156 @@
+# postcodes.py
+
+import numpy as np
+import pandas as pd
+
+from src.cleaning.cache import CACHE_DIR, cached_read
+from src.cleaning.load_raw import CHUNKSIZE
+from src.cleaning.profiling import profiled
+
+# Full postcode split into outward code, sector digit and unit letters,
+# and a bare outward code (district) as given by some charities
+POSTCODE_PATTERN = r'^(?P<district>[A-Z]{1,2}[0-9][A-Z0-9]?)(?P<digit>[0-9])[A-Z]{2}$'
+DISTRICT_PATTERN = r'^[A-Z]{1,2}[0-9][A-Z0-9]?$'
+MATCH_LEVELS = ['postcode', 'sector', 'district']
+
+def normalise_postcodes(postcodes: pd.Series) -> pd.Series:
+    """
+    Upper case postcodes with all whitespace removed ('ab1 2cd ' -> 'AB12CD').
+    Missing or empty postcodes are NaN.
+    """
+    keys = postcodes.astype(str).str.upper().str.replace(r'\s+', '', regex=True)
+    return keys.where(postcodes.notna() & (keys != ''))
+
+def prefix_keys(keys: pd.Series) -> pd.DataFrame:
+    """
+    Sector ('AB12') and district ('AB1') keys of normalised postcodes. Bare
+    outward codes only have a district; anything else has neither.
+    """
+    parts = keys.str.extract(POSTCODE_PATTERN)
+    sector = parts['district'] + parts['digit']
+    district = parts['district'].fillna(keys.where(keys.str.match(DISTRICT_PATTERN, na=False)))
+    return pd.DataFrame({'sector': sector, 'district': district}, index=keys.index)
+
+def postcode_index(onspd: pd.DataFrame) -> pd.DataFrame:
+    """
+    Lookup rows for every level: normalised ONSPD postcodes with their
+    local authority code, and each sector's and district's most common
+    code (ties go to the smallest code). Sorted by level and key.
+    """
+    postcodes = pd.DataFrame({
+        'key': normalise_postcodes(onspd['pcds']),
+        'oslaua': onspd['oslaua'].str.strip()
+    }).dropna().drop_duplicates('key')
+    prefixes = prefix_keys(postcodes['key'])
+
+    frames = [postcodes.assign(level='postcode')]
+    for level in MATCH_LEVELS[1:]:
+        counts = (
+            pd.DataFrame({'key': prefixes[level], 'oslaua': postcodes['oslaua']})
+            .dropna()
+            .groupby(['key', 'oslaua']).size().reset_index(name='n')
+            .sort_values(['key', 'n', 'oslaua'], ascending=[True, False, True])
+        )
+        frames.append(counts.drop_duplicates('key')[['key', 'oslaua']].assign(level=level))
+    index = pd.concat(frames, ignore_index=True)[['level', 'key', 'oslaua']]
+    return index.sort_values(['level', 'key']).reset_index(drop=True)
+
+@profiled()
+def build_postcode_index(filepath: str, chunksize: int = CHUNKSIZE) -> pd.DataFrame:
+    """
+    Read the ONSPD postcode and local authority columns in chunks and build
+    the postcode_index from them.
+    """
+    reader = pd.read_csv(
+        filepath,
+        usecols=lambda col: col.strip() in ('pcds', 'oslaua'),
+        dtype=str,
+        chunksize=chunksize
+    )
+    onspd = pd.concat(
+        [chunk.rename(columns=str.strip) for chunk in reader], ignore_index=True
+    )
+    return postcode_index(onspd)
+
+class PostcodeResolver:
+    """
+    Postcode -> local authority name lookups on sorted arrays of normalised
+    postcodes, built once from the postcode_index. A postcode missing from
+    ONSPD falls back to the most common local authority of its sector
+    ('AB1 2') and then of its district ('AB1').
+    """
+    def __init__(self, index: pd.DataFrame, local_authority: pd.DataFrame):
+        names = (
+            local_authority.drop_duplicates('LAD23CD')
+            .set_index('LAD23CD')['LAD23NM']
+        )
+        self.levels = {}
+        for level in MATCH_LEVELS:
+            rows = index[index['level'] == level]
+            rows = rows.assign(name=rows['oslaua'].map(names)).dropna(subset=['name'])
+            rows = rows.sort_values('key')
+            self.levels[level] = (
+                rows['key'].to_numpy(dtype=str),
+                rows['name'].to_numpy(dtype=object)
+            )
+
+    def find(self, level: str, keys: pd.Series) -> np.ndarray:
+        """
+        Local authority of each key at one level (NaN where not found).
+        """
+        sorted_keys, names = self.levels[level]
+        result = np.full(len(keys), np.nan, dtype=object)
+        if not len(sorted_keys):
+            return result
+        wanted = keys.fillna('').to_numpy(dtype=str)
+        position = np.minimum(np.searchsorted(sorted_keys, wanted), len(sorted_keys) - 1)
+        found = (sorted_keys[position] == wanted) & keys.notna().to_numpy()
+        result[found] = names[position[found]]
+        return result
+
+    def lookup(self, postcodes: pd.Series) -> pd.DataFrame:
+        """
+        Local authority of each postcode and the level it was found at
+        ('postcode', 'sector', 'district', or NaN). Each distinct postcode
+        is looked up once.
+        """
+        codes, uniques = pd.factorize(normalise_postcodes(postcodes))
+        keys = pd.Series(uniques, dtype=object)
+        prefixes = prefix_keys(keys)
+        candidates = {'postcode': keys, 'sector': prefixes['sector'], 'district': prefixes['district']}
+
+        names = np.full(len(keys) + 1, np.nan, dtype=object)
+        levels = np.full(len(keys) + 1, np.nan, dtype=object)
+        for level in MATCH_LEVELS:
+            open_ = pd.isna(names[:-1])
+            found = self.find(level, candidates[level])
+            filled = open_ & pd.notna(found)
+            names[:-1][filled] = found[filled]
+            levels[:-1][filled] = level
+        # Code -1 (missing postcode) picks the trailing NaN
+        return pd.DataFrame(
+            {'local_authority': names[codes], 'match': levels[codes]},
+            index=postcodes.index
+        )
+
+    def resolve(self, postcodes: pd.Series, report: bool = False):
+        """
+        Local authority name of each postcode. With `report=True` also
+        return the number of postcodes found at each level and missed.
+        """
+        found = self.lookup(postcodes)
+        if report:
+            counts = found['match'].fillna('missing').value_counts()
+            return found['local_authority'], counts.reindex(MATCH_LEVELS + ['missing'], fill_value=0)
+        return found['local_authority']
+
+def load_postcode_resolver(
+        onspd_path: str,
+        local_authority: pd.DataFrame,
+        cache_dir: str = CACHE_DIR
+    ) -> PostcodeResolver:
+    """
+    PostcodeResolver over the full ONSPD file. The postcode_index is built
+    once per ONSPD version and kept in the raw input cache.
+    """
+    return PostcodeResolver(cached_read(build_postcode_index, onspd_path, cache_dir), local_authority)
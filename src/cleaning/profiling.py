@@ -0,0 +1,228 @@
+# profiling.py
+
+import cProfile
+import functools
+import json
+import os
+import re
+import time
+import tracemalloc
+
+import pandas as pd
+
+# The active Profiler, or None when profiling is off. Stages check it once
+# on entry, so disabled instrumentation costs a global lookup per stage
+_profiler = None
+
+def frame_stats(objects, deep: bool = False):
+    """
+    Total rows and bytes of the DataFrames and Series in `objects`,
+    looking inside tuples, lists and dict values. None when there are none.
+    """
+    rows, size, found = 0, 0, False
+    stack = list(objects)
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, (pd.DataFrame, pd.Series)):
+            found = True
+            rows += len(obj)
+            usage = obj.memory_usage(index=True, deep=deep)
+            size += int(usage.sum()) if isinstance(obj, pd.DataFrame) else int(usage)
+        elif isinstance(obj, (tuple, list)):
+            stack.extend(obj)
+        elif isinstance(obj, dict):
+            stack.extend(obj.values())
+    return (rows, size) if found else (None, None)
+
+class _NullStage:
+    """
+    Shared no-op stage used while profiling is off.
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def output(self, *objects):
+        pass
+
+_NULL_STAGE = _NullStage()
+
+class Stage:
+    """
+    One timed stage. Use as a context manager and call `output` with the
+    frames the stage produced to record their rows and bytes.
+    """
+    def __init__(self, profiler, name: str, inputs: tuple):
+        self.profiler = profiler
+        self.record = {'name': name, 'pid': os.getpid()}
+        self.record['rows_in'], self.record['bytes_in'] = frame_stats(inputs, profiler.deep)
+        self.record['rows_out'] = self.record['bytes_out'] = None
+
+    def output(self, *objects):
+        self.record['rows_out'], self.record['bytes_out'] = frame_stats(objects, self.profiler.deep)
+
+    def __enter__(self):
+        profiler = self.profiler
+        self.parent = profiler.stack[-1] if profiler.stack else None
+        profiler.stack.append(self)
+        if profiler.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if self.parent is not None:
+                self.parent.max_peak = max(self.parent.max_peak, peak)
+            tracemalloc.reset_peak()
+            self.start_memory, self.max_peak = current, current
+        # cProfile cannot nest, so only outermost stages are dumped
+        self.cprofile = None
+        if profiler.cprofile_dir and self.parent is None:
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+        self.start_wall, self.start_cpu = time.perf_counter(), time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall, cpu = time.perf_counter() - self.start_wall, time.process_time() - self.start_cpu
+        profiler = self.profiler
+        if self.cprofile is not None:
+            self.cprofile.disable()
+            self.record['cprofile'] = profiler.dump_cprofile(self.cprofile, self.record['name'])
+        if profiler.trace_memory:
+            peak = max(self.max_peak, tracemalloc.get_traced_memory()[1])
+            self.record['peak_bytes'] = peak - self.start_memory
+            if self.parent is not None:
+                self.parent.max_peak = max(self.parent.max_peak, peak)
+            tracemalloc.reset_peak()
+        profiler.stack.pop()
+        self.record.update({
+            'parent': self.parent.record['name'] if self.parent is not None else None,
+            'wall_seconds': round(wall, 6),
+            'cpu_seconds': round(cpu, 6),
+            'failed': exc_type is not None,
+        })
+        profiler.records.append(self.record)
+        return False
+
+class Profiler:
+    """
+    Collects one record per stage: wall and CPU time, peak traced memory
+    (with `trace_memory`), rows and bytes in and out, and the enclosing
+    stage. With `cprofile_dir`, each outermost stage also writes a cProfile
+    dump there. Frame bytes are shallow unless `deep=True`, which scans
+    every string.
+    """
+    def __init__(self, trace_memory: bool = True, cprofile_dir: str = None, deep: bool = False):
+        self.trace_memory = trace_memory
+        self.cprofile_dir = cprofile_dir
+        self.deep = deep
+        self.records = []
+        self.stack = []
+        self.started_tracing = False
+
+    def stage(self, name: str, *inputs) -> Stage:
+        return Stage(self, name, inputs)
+
+    def dump_cprofile(self, profile: cProfile.Profile, name: str) -> str:
+        os.makedirs(self.cprofile_dir, exist_ok=True)
+        # Worker processes dump into the same directory, so names carry the pid
+        filename = f"{os.getpid()}_{len(self.records):03d}_{re.sub(r'[^A-Za-z0-9_.-]+', '_', name)}.prof"
+        path = os.path.join(self.cprofile_dir, filename)
+        profile.dump_stats(path)
+        return path
+
+    def start(self):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+
+    def stop(self):
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+
+    def extend(self, records: list):
+        """
+        Add records collected elsewhere, e.g. in a worker process. Their
+        outermost stages are placed under the stage currently running here.
+        """
+        parent = self.stack[-1].record['name'] if self.stack else None
+        for record in records:
+            self.records.append(dict(record, parent=record['parent'] or parent))
+
+    def summary(self) -> pd.DataFrame:
+        """
+        One row per stage in completion order, timing columns first.
+        """
+        columns = [
+            'name', 'parent', 'wall_seconds', 'cpu_seconds', 'peak_bytes',
+            'rows_in', 'rows_out', 'bytes_in', 'bytes_out', 'pid', 'failed', 'cprofile'
+        ]
+        summary = pd.DataFrame(self.records)
+        return summary[[col for col in columns if col in summary.columns]]
+
+    def to_json(self, filepath: str):
+        with open(filepath, 'w') as f:
+            json.dump(self.records, f, indent=2)
+
+def enable_profiling(trace_memory: bool = True, cprofile_dir: str = None, deep: bool = False) -> Profiler:
+    """
+    Start recording stages in this process. Returns the active Profiler.
+    """
+    global _profiler
+    _profiler = Profiler(trace_memory=trace_memory, cprofile_dir=cprofile_dir, deep=deep)
+    _profiler.start()
+    return _profiler
+
+def disable_profiling() -> Profiler:
+    """
+    Stop recording and return the Profiler that was active (or None).
+    """
+    global _profiler
+    profiler, _profiler = _profiler, None
+    if profiler is not None:
+        profiler.stop()
+    return profiler
+
+def active_profiler() -> Profiler:
+    return _profiler
+
+def profiler_settings() -> dict:
+    """
+    enable_profiling arguments of the active Profiler, for starting the
+    same profiling in worker processes (None while profiling is off).
+    """
+    if _profiler is None:
+        return None
+    return {
+        'trace_memory': _profiler.trace_memory,
+        'cprofile_dir': _profiler.cprofile_dir,
+        'deep': _profiler.deep
+    }
+
+def stage(name: str, *inputs):
+    """
+    Context manager timing the enclosed block as stage `name`, with the
+    rows and bytes of `inputs`. A shared no-op while profiling is off.
+    """
+    if _profiler is None:
+        return _NULL_STAGE
+    return _profiler.stage(name, *inputs)
+
+def profiled(name: str = None):
+    """
+    Decorator recording each call as a stage, with the frames among the
+    arguments as inputs and the frames returned as outputs.
+    """
+    def decorator(func):
+        stage_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _profiler is None:
+                return func(*args, **kwargs)
+            with _profiler.stage(stage_name, args, kwargs) as current:
+                result = func(*args, **kwargs)
+                current.output(result)
+            return result
+        return wrapper
+    return decorator
@@ -0,0 +1,205 @@
+# tasks.py
+
+import pandas as pd
+
+from src.cleaning.charity_store import save_charity_main, to_compact_dtypes
+from src.cleaning.clean_charity_main import classify_register, enrich_register
+from src.cleaning.clean_receipt import (
+    PANEL_CATEGORIES,
+    SHEET_LAYOUT,
+    flat_lookup,
+    non_england_names,
+    LocalAuthorityNormaliser,
+    apply_local_authority_cleaning,
+    filter_non_england,
+    melt_sheet,
+    count_removals,
+    build_panel
+)
+from src.cleaning.load_raw import load_company_house, load_receipt_sheets
+from src.cleaning.pipeline import PIPELINE_DIR, Pipeline, Task
+from src.cleaning.postcodes import PostcodeResolver, build_postcode_index
+
+RAW_PATHS = {
+    'charity': 'data/raw/charities_RegisteredCharitiesInEnglandAndWales2025.csv',
+    'company_house': 'data/raw/companyHouseData2025.csv',
+    'charity_web': 'data/raw/registeredCharityDataFromWeb.csv',
+    'local_authority': 'data/raw/local_authority_names_and_codes_ONSPD2023.csv',
+    'category': 'data/raw/charityClassification_RegisteredCharitiesInEnglandAndWales2025.csv',
+    'onspd': 'data/raw/match_postcode_ONSPD2025.csv',
+    'receipts': 'data/raw/council_disposal_receipts.xlsx',
+}
+CHARITY_OUTPUT = 'data/processed/charity_main_cleaned.csv'
+PANEL_OUTPUT = 'data/processed/final_panel_data.csv'
+
+# Sources of the cleaning steps each task calls, hashed into its fingerprint
+CHARITY_MODULES = ['src.cleaning.tasks', 'src.cleaning.clean_charity_main', 'src.cleaning.joins']
+RECEIPT_MODULES = ['src.cleaning.tasks', 'src.cleaning.clean_receipt', 'src.cleaning.load_raw']
+
+def read_table(filepath: str) -> pd.DataFrame:
+    return pd.read_csv(filepath, low_memory=False)
+
+def company_house_task(filepath: str, charity: pd.DataFrame) -> pd.DataFrame:
+    return load_company_house(filepath, company_numbers=charity['charity_company_registration_number'])
+
+def postcode_index_task(filepath: str) -> pd.DataFrame:
+    return build_postcode_index(filepath)
+
+def charity_enriched_task(
+        charity: pd.DataFrame,
+        company_house: pd.DataFrame,
+        charity_web: pd.DataFrame
+    ) -> tuple:
+    """
+    The deduplicated register with its Companies House and charity web
+    columns and combined postcode, reporting the join match rates.
+    """
+    df, match_rates = enrich_register(charity, company_house, charity_web)
+    return df, {'join_match_rates': pd.Series(match_rates).round(4).to_dict()}
+
+def charity_located_task(
+        charity_enriched: pd.DataFrame,
+        postcode_index: pd.DataFrame,
+        local_authority: pd.DataFrame
+    ) -> tuple:
+    """
+    Local authority of each enriched charity's postcode, in register order,
+    reporting how many matched by postcode, sector or district.
+    """
+    resolver = PostcodeResolver(postcode_index, local_authority)
+    located, postcode_matches = resolver.resolve(charity_enriched['postcode'], report=True)
+    return pd.DataFrame({'local_authority': located.array}), {'postcode_matches': postcode_matches.to_dict()}
+
+def charity_main_task(
+        charity_enriched: pd.DataFrame,
+        charity_located: pd.DataFrame,
+        category: pd.DataFrame,
+        output_path: str
+    ) -> tuple:
+    """
+    Classify the located register as clean_charity_main does and write it
+    to `output_path`, reporting the share of charities with a classification.
+    """
+    df = charity_enriched
+    df['local_authority'] = charity_located['local_authority'].array
+    df, _, category_match_rate = classify_register(df, category)
+    save_charity_main(df, output_path)
+    return df, {'category_match_rate': round(category_match_rate, 4)}
+
+def receipt_sheet_task(filepath: str, year: str, categories=PANEL_CATEGORIES) -> pd.DataFrame:
+    """
+    Load, clean and melt one receipts sheet, parsed in this process (the
+    task already runs in a pipeline worker). Empty when the sheet has no
+    receipts.
+    """
+    dfs = load_receipt_sheets(filepath, [year], max_workers=1, categories=categories)
+    normaliser = LocalAuthorityNormaliser(flat_lookup)
+    (df,), _ = apply_local_authority_cleaning(list(dfs.values()), pd.DataFrame(), flat_lookup, normaliser)
+    if df.empty or 'local_authority' not in df.columns:
+        return pd.DataFrame()
+    return melt_sheet(df, int(year))
+
+def receipts_long_task(**sheets) -> pd.DataFrame:
+    """
+    The melted sheets ({task name: frame}) as one long frame, in the order
+    given.
+    """
+    return pd.concat([df for df in sheets.values() if not df.empty], ignore_index=True)
+
+def removals_task(charity_main: pd.DataFrame) -> tuple:
+    """
+    Removal counts of English charities by local authority, financial year
+    and size, with the dtypes load_charity_main gives the cleaned register,
+    reporting the non-England charities dropped per matched name.
+    """
+    charity_df = to_compact_dtypes(charity_main)
+    _, charity_df = apply_local_authority_cleaning([], charity_df, flat_lookup)
+    charity_df, dropped = filter_non_england(charity_df, non_england_names, report=True)
+    return count_removals(charity_df), {'dropped_non_england': {k: int(v) for k, v in dropped.items()}}
+
+def panel_task(receipts_long: pd.DataFrame, removals: pd.DataFrame, output_path: str, categories=None) -> pd.DataFrame:
+    """
+    Build the final panel and write it to `output_path`.
+    """
+    panel = build_panel(receipts_long, removals, categories=categories)
+    panel.to_csv(output_path, index=False)
+    return panel
+
+def cleaning_tasks(
+        raw_paths: dict = None,
+        charity_output: str = CHARITY_OUTPUT,
+        panel_output: str = PANEL_OUTPUT,
+        categories=None
+    ) -> list:
+    """
+    Both cleaning pipelines as one task graph. `categories` is as for
+    run_clean_receipt.py: None for the default panel, a list of receipt
+    categories, or 'all'.
+    """
+    paths = dict(RAW_PATHS, **(raw_paths or {}))
+    if categories is None:
+        sheet_categories = PANEL_CATEGORIES
+    elif categories == 'all':
+        sheet_categories = None
+    else:
+        sheet_categories = list(categories)
+
+    sheet_tasks = [
+        Task(
+            f'receipts_{year}', receipt_sheet_task, files={'filepath': paths['receipts']},
+            params={'year': year, 'categories': sheet_categories}, modules=RECEIPT_MODULES
+        )
+        for year in SHEET_LAYOUT
+    ]
+    return [
+        # Charity inputs: the register, then the lookups joined onto it
+        Task('charity', read_table, files={'filepath': paths['charity']}),
+        Task('charity_web', read_table, files={'filepath': paths['charity_web']}),
+        Task('local_authority', read_table, files={'filepath': paths['local_authority']}),
+        Task('category', read_table, files={'filepath': paths['category']}),
+        Task(
+            'company_house', company_house_task, inputs=['charity'],
+            files={'filepath': paths['company_house']},
+            modules=['src.cleaning.tasks', 'src.cleaning.load_raw']
+        ),
+        Task(
+            'postcode_index', postcode_index_task, files={'filepath': paths['onspd']},
+            modules=['src.cleaning.tasks', 'src.cleaning.postcodes']
+        ),
+        # Charity cleaning in three steps, so a changed ONSPD file only
+        # relocates the register and a changed category file only reclassifies it
+        Task(
+            'charity_enriched', charity_enriched_task,
+            inputs=['charity', 'company_house', 'charity_web'],
+            modules=CHARITY_MODULES
+        ),
+        Task(
+            'charity_located', charity_located_task,
+            inputs=['charity_enriched', 'postcode_index', 'local_authority'],
+            modules=['src.cleaning.tasks', 'src.cleaning.postcodes']
+        ),
+        Task(
+            'charity_main', charity_main_task,
+            inputs=['charity_enriched', 'charity_located', 'category'],
+            outputs={'output_path': charity_output},
+            modules=CHARITY_MODULES + ['src.cleaning.charity_store']
+        ),
+        # Receipts branch, one task per sheet, independent of the charity register until removals
+        *sheet_tasks,
+        Task(
+            'receipts_long', receipts_long_task, inputs=[task.name for task in sheet_tasks],
+            modules=['src.cleaning.tasks']
+        ),
+        Task(
+            'removals', removals_task, inputs=['charity_main'],
+            modules=RECEIPT_MODULES + ['src.cleaning.charity_store']
+        ),
+        Task(
+            'panel', panel_task, inputs=['receipts_long', 'removals'],
+            outputs={'output_path': panel_output}, params={'categories': categories},
+            modules=RECEIPT_MODULES
+        ),
+    ]
+
+def cleaning_pipeline(pipeline_dir: str = PIPELINE_DIR, **kwargs) -> Pipeline:
+    return Pipeline(cleaning_tasks(**kwargs), pipeline_dir=pipeline_dir)
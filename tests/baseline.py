@@ -0,0 +1,122 @@
+# baseline.py
+
+"""
+Row-wise implementations from before the cleaning functions were
+vectorised, kept as references for the equivalence tests and benchmarks.
+"""
+
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from src.cleaning.clean_charity_main import CATEGORY_MAPPING
+
+def classify_size_combined(row):
+    income = row['latest_income']
+    if pd.isna(income):
+        income = row['latestIncome']
+    if pd.isna(income):
+        return np.nan
+    elif income < 25000:
+        return 'Small'
+    elif income <= 1_000_000:
+        return 'Medium'
+    else:
+        return 'Large'
+
+def get_financial_year(date):
+    if pd.isna(date):
+        return np.nan
+    return date.year if date.month >= 4 else date.year - 1
+
+def apply_category_mapping(value):
+    value = str(value).replace(' ', '_').replace('-', '_').lower()
+    value = f"classification_{value}"
+    for key in CATEGORY_MAPPING.keys():
+        if value in CATEGORY_MAPPING[key]:
+            return key
+    else:
+        return 'None'
+
+def attach_classification_dummies(df):
+    classification_df = df.copy()
+    classification_df['value'] = 1
+    classification_dummies = classification_df.pivot_table(
+        index='registered_charity_number',
+        columns='classification_description',
+        values='value',
+        aggfunc='max',
+        fill_value=0
+    )
+    classification_dummies = classification_dummies.reset_index()
+    df = df.drop_duplicates(subset='registered_charity_number')
+    df = df.merge(classification_dummies, on='registered_charity_number', how='left')
+    category_cols = [col for col in df.columns if col.startswith('classification_')]
+    df[category_cols] = df[category_cols].fillna(0)
+    return df
+
+def base_cleaning(charity):
+    type_map = {
+        'registered_charity_number': str,
+        'date_of_removal': 'datetime64[ns]',
+        'charity_company_registration_number': str,
+        'charity_status': str
+    }
+    for col, dtype in type_map.items():
+        if col in charity.columns:
+            if dtype == 'datetime64[ns]':
+                charity[col] = pd.to_datetime(charity[col], errors='coerce')
+            elif dtype == str:
+                charity[col] = charity[col].astype(str).str.strip()
+    charity['has_company_number'] = (
+        charity['charity_company_registration_number'].ne("").astype(int)
+    )
+    charity['charity_status'] = charity['date_of_removal'].apply(
+        lambda x: 'active' if pd.isna(x) else 'inactive'
+    )
+    return charity.sort_values(
+        by=['registered_charity_number', 'charity_status', 'has_company_number', 'date_of_removal'],
+        ascending=[True, True, False, False]
+    ).drop_duplicates(subset='registered_charity_number', keep='first')
+
+def merge_columns_func(dfs, merge_columns):
+    for idx in range(len(dfs)):
+        df = dfs[idx].copy()
+        df.columns = [str(col).strip().lower().replace(" and ", " & ") for col in df.columns]
+        for standard_col, aliases in merge_columns.items():
+            present_cols = [col for col in aliases if col in df.columns]
+            if present_cols:
+                df.loc[:, standard_col] = df[present_cols].sum(axis=1, skipna=True)
+                cols_to_drop = [col for col in present_cols if col != standard_col]
+                df.drop(columns=cols_to_drop, inplace=True)
+        dfs[idx] = df
+    return dfs
+
+def create_complete_panel(disposal_long_df, dataset):
+    removals = dataset.groupby(['local_authority', 'removal_fy', 'size_category']).size().reset_index(name='removals').rename(columns={'removal_fy': 'financial_year'})
+    disposal_long_df = disposal_long_df[disposal_long_df['category'] == 'all services total']
+    disposal_long_df = disposal_long_df.groupby(['local_authority', 'financial_year', 'category']).agg({'value': 'sum'}).reset_index()
+
+    unique_years = disposal_long_df['financial_year'].unique()
+    unique_authorities = disposal_long_df['local_authority'].unique()
+    unique_size_categories = removals['size_category'].dropna().unique()
+    all_combinations = list(itertools.product(unique_years, unique_authorities, unique_size_categories))
+    complete_index = pd.DataFrame(all_combinations, columns=['financial_year', 'local_authority', 'size_category'])
+
+    complete_disposal = pd.merge(complete_index, disposal_long_df, on=["financial_year", "local_authority"], how="left")
+    panel = pd.merge(complete_disposal, removals, how="left", on=['local_authority', 'financial_year','size_category'] )
+
+    panel['removals'] = panel['removals'].fillna(0).astype(int)
+    panel = panel[(panel['financial_year'] >= 2015) & (panel['financial_year'] <= 2023)]
+    panel['value'] = pd.to_numeric(panel['value'], errors='coerce')/1000 # Convert from (All figures in £000s) to millions
+    panel['removals'] = panel['removals'].fillna(0).astype(int)
+    panel['value'] = panel.groupby(['local_authority', 'financial_year'])['value'].transform('first')
+    filtered_panel = panel.drop(columns=['category'], errors='ignore').sort_values(['local_authority', 'size_category', 'financial_year'])
+
+    for lag in [1, 2, 3]:
+        filtered_panel[f'value_lag{lag}'] = filtered_panel.groupby(['local_authority', 'size_category'])['value'].shift(lag)
+
+    filtered_panel = filtered_panel.dropna(subset=['value'])
+
+    return filtered_panel
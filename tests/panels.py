@@ -0,0 +1,39 @@
+# panels.py
+
+"""
+Synthetic regression panels shared by the analysis tests and benchmarks.
+"""
+
+import numpy as np
+import pandas as pd
+
+LAG_VARIABLES = ['value', 'value_lag1', 'value_lag2', 'value_lag3']
+
+def synthetic_panel(n_authorities=300, years=range(2015, 2024), seed=0):
+    """
+    Panel shaped like create_complete_panel output.
+    """
+    rng = np.random.default_rng(seed)
+    authorities = [f"authority {i}" for i in range(n_authorities)]
+    sizes = ['Large', 'Medium', 'Small']
+    index = pd.MultiIndex.from_product(
+        [authorities, sizes, list(years)],
+        names=['local_authority', 'size_category', 'financial_year']
+    )
+    panel = index.to_frame(index=False)
+    value = pd.Series(rng.lognormal(2, 1, len(authorities) * len(years)))
+    panel['value'] = np.repeat(value.to_numpy().reshape(len(authorities), 1, -1), len(sizes), axis=1).ravel()
+    panel['removals'] = rng.poisson(3 + 0.05 * panel['value'])
+    for lag in [1, 2, 3]:
+        panel[f'value_lag{lag}'] = panel.groupby(['local_authority', 'size_category'])['value'].shift(lag)
+    return panel
+
+def formula(variables):
+    """
+    The regression notebook's formula for `variables`.
+    """
+    return (
+        'removals ~ ' + ' + '.join(variables)
+        + ' + C(local_authority) + C(financial_year) + C(size_category) + '
+        + ' + '.join(f'{v}:C(size_category)' for v in variables)
+    )
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+import pytest
+
+from src.analysis import bootstrap
+from src.analysis.bootstrap import (
+    WILD_WEIGHTS,
+    WildKernel,
+    WithinDesign,
+    permutation_test,
+    wild_cluster_bootstrap,
+    wild_weights
+)
+from src.analysis.fixed_effects import fit_fixed_effects, panel_design
+from tests.panels import synthetic_panel
+
+VARIABLES = ['value', 'value_lag1']
+
+@pytest.fixture(scope='module')
+def panel():
+    panel = synthetic_panel(n_authorities=15, seed=3)
+    panel.loc[panel.sample(10, random_state=0).index, 'removals'] = np.nan
+    return panel
+
+@pytest.mark.parametrize('weights', WILD_WEIGHTS)
+@pytest.mark.parametrize('impose_null', [True, False])
+def test_wild_kernel_matches_refits(panel, impose_null, weights):
+    design = WithinDesign(panel, VARIABLES)
+    tested = bootstrap.tested_columns(design)
+    kernel = WildKernel(design, tested, impose_null, weights)
+    draws = kernel.draw(np.random.default_rng(7), 5)
+    W = wild_weights(np.random.default_rng(7), design.n_clusters, 5, weights)
+
+    # Refit every bootstrap outcome from scratch, fixed effects included
+    model = panel_design(panel, VARIABLES)
+    for i, j in enumerate(tested):
+        if impose_null:
+            beta0, resid = design.restricted_fit(j)
+        else:
+            beta0, resid = design.beta, design.resid
+        for b in range(W.shape[1]):
+            y_star = pd.Series(design.X @ beta0 + resid * W[design.cluster_codes, b], index=design.rows)
+            refit = fit_fixed_effects(
+                y_star, model['X'], model['fixed_effects'], model['clusters'], k_columns=model['k_columns']
+            )
+            expected = (refit.params.iloc[j] - beta0[j]) / refit.bse.iloc[j]
+            np.testing.assert_allclose(draws[i, b], expected, rtol=1e-6)
+
+@pytest.mark.parametrize('impose_null', [True, False])
+def test_wild_bootstrap_is_the_same_for_any_n_jobs(panel, impose_null):
+    results = [
+        wild_cluster_bootstrap(panel, VARIABLES, reps=500, impose_null=impose_null, seed=11, batch_size=120, n_jobs=n_jobs)
+        for n_jobs in [1, 2, 3]
+    ]
+    for result in results[1:]:
+        tm.assert_frame_equal(result, results[0])
+    assert results[0]['p_boot'].between(0, 1).all()
+
+def test_permutation_test_is_the_same_for_any_n_jobs(panel):
+    results = [
+        permutation_test(panel, ['value'], reps=40, seed=5, batch_size=15, n_jobs=n_jobs)
+        for n_jobs in [1, 2]
+    ]
+    tm.assert_frame_equal(results[1], results[0])
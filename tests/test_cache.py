@@ -0,0 +1,106 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import pandas as pd
+import pandas.testing as tm
+
+from src.cleaning import cache
+
+def read_rows(filepath, skiprows=0):
+    return pd.read_csv(filepath, skiprows=range(1, skiprows + 1))
+
+def store_and_read(cache_dir, filepath, skiprows):
+    return len(cache.cached_read(read_rows, filepath, cache_dir, skiprows=skiprows))
+
+def test_cached_read_round_trip(tmp_path):
+    filepath = tmp_path / 'raw.csv'
+    pd.DataFrame({'a': [1, 2, 3], 'b': ['x', None, 'z']}).to_csv(filepath, index=False)
+    first = cache.cached_read(read_rows, str(filepath), str(tmp_path / 'cache'))
+    second = cache.cached_read(read_rows, str(filepath), str(tmp_path / 'cache'))
+    tm.assert_frame_equal(first, second)
+    assert len(cache.load_manifest(str(tmp_path / 'cache'))['entries']) == 1
+
+def test_concurrent_stores_keep_every_entry(tmp_path):
+    filepath = tmp_path / 'raw.csv'
+    pd.DataFrame({'a': range(50)}).to_csv(filepath, index=False)
+    cache_dir = str(tmp_path / 'cache')
+    skips = list(range(24))
+    with ProcessPoolExecutor(max_workers=8) as pool:
+        rows = list(pool.map(store_and_read, [cache_dir] * len(skips), [str(filepath)] * len(skips), skips))
+    assert rows == [50 - skip for skip in skips]
+    entries = cache.load_manifest(cache_dir)['entries']
+    assert sorted(entry['params']['skiprows'] for entry in entries.values()) == skips
+
+def test_key_changes_with_pandas_version(monkeypatch):
+    key = cache.cache_key('sha', read_rows, {'skiprows': 1})
+    monkeypatch.setattr(pd, '__version__', '0.0.0')
+    assert cache.cache_key('sha', read_rows, {'skiprows': 1}) != key
+
+def test_key_changes_with_project_loader_source(monkeypatch):
+    from src.cleaning.postcodes import build_postcode_index
+    key = cache.cache_key('sha', build_postcode_index, {})
+    monkeypatch.setattr(cache, 'file_hash', lambda filepath: 'edited source')
+    assert cache.cache_key('sha', build_postcode_index, {}) != key
+    assert cache.loader_source(pd.read_csv) is None
+
+def write_raw(tmp_path):
+    filepath = tmp_path / 'raw.csv'
+    pd.DataFrame({'a': range(10), 'b': list('abcdefghij')}).to_csv(filepath, index=False)
+    return str(filepath), str(tmp_path / 'cache')
+
+def test_hashing_and_reading_do_not_hold_the_lock(tmp_path, monkeypatch):
+    filepath, cache_dir = write_raw(tmp_path)
+    held, calls = [], []
+    lock = cache.cache_lock
+
+    @contextmanager
+    def tracked_lock(cache_dir=cache.CACHE_DIR):
+        with lock(cache_dir):
+            held.append(True)
+            try:
+                yield
+            finally:
+                held.pop()
+
+    def tracked(func):
+        def wrapper(*args, **kwargs):
+            calls.append((func.__name__, bool(held)))
+            return func(*args, **kwargs)
+        return wrapper
+
+    monkeypatch.setattr(cache, 'cache_lock', tracked_lock)
+    monkeypatch.setattr(cache, 'file_hash', tracked(cache.file_hash))
+    monkeypatch.setattr(cache, 'read_frame', tracked(cache.read_frame))
+    cache.cached_read(read_rows, filepath, cache_dir)
+    cache.cached_read(read_rows, filepath, cache_dir)
+    assert calls == [('file_hash', False), ('read_frame', False)]
+
+def test_lookup_retries_an_entry_replaced_before_reading(tmp_path, monkeypatch):
+    filepath, cache_dir = write_raw(tmp_path)
+    expected = cache.cached_read(read_rows, filepath, cache_dir)
+    read_frame = cache.read_frame
+    reads = []
+
+    def replaced_once(path):
+        reads.append(path)
+        if len(reads) == 1:
+            # Another process replaces the entry after the lookup
+            os.remove(path)
+            cache.cache_store(expected, read_rows, filepath, cache_dir)
+            raise FileNotFoundError(path)
+        return read_frame(path)
+
+    monkeypatch.setattr(cache, 'read_frame', replaced_once)
+    tm.assert_frame_equal(cache.cache_lookup(read_rows, filepath, cache_dir), expected)
+    assert len(reads) == 2
+
+def test_lookup_of_a_removed_entry_file_is_a_miss(tmp_path):
+    filepath, cache_dir = write_raw(tmp_path)
+    expected = cache.cached_read(read_rows, filepath, cache_dir)
+    for entry in cache.load_manifest(cache_dir)['entries'].values():
+        os.remove(entry['path'])
+    assert cache.cache_lookup(read_rows, filepath, cache_dir) is None
+    tm.assert_frame_equal(cache.cached_read(read_rows, filepath, cache_dir), expected)
+    entry, = cache.load_manifest(cache_dir)['entries'].values()
+    assert os.path.exists(entry['path'])
@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+import pytest
+
+from src.cleaning.charity_store import (
+    DUMMY_COLUMNS,
+    iter_charity_main,
+    load_charity_main,
+    save_charity_main,
+    to_compact_dtypes
+)
+
+def cleaned_register():
+    """
+    A cleaned charity table as the csv output holds it, with the float
+    dummies written before they became int8.
+    """
+    return pd.DataFrame({
+        'registered_charity_number': ['000101', '020202', '303030', '404040', '505050'],
+        'charity_name': ['A', 'B', 'C', 'D', 'E'],
+        'postcode': ['AB1 2CD', 'EF3 4GH', 'NAN', 'IJ5 6KL', 'MN7 8OP'],
+        'charity_status': ['active', 'inactive', 'active', 'inactive', 'active'],
+        'date_of_registration': ['1995-05-01', '2001-02-03', '2010-10-10', '1980-01-01', None],
+        'date_of_removal': [None, '2016-07-01', None, '2019-03-31', None],
+        'latest_income': [1000.0, np.nan, 2e6, 30000.0, np.nan],
+        'local_authority': ['Leeds', 'York', None, 'Leeds', 'Bath'],
+        'size_category': ['Small', None, 'Large', 'Medium', None],
+        'classification_description': ['Religious_Activities', 'None', 'Elderly_Support', 'None', 'None'],
+        'registration_fy': [1995, 2000, 2010, 1979, np.nan],
+        'removal_fy': [np.nan, 2016, np.nan, 2018, np.nan],
+        'Religious_Activities': [1.0, 0.0, 0.0, 0.0, 0.0],
+        'Elderly_Support': [0.0, 0.0, 1.0, 1.0, 0.0],
+        'None': [0.0, 1.0, 0.0, 1.0, 1.0],
+    })
+
+def test_iter_charity_main_reads_float_dummies_in_chunks(tmp_path):
+    path = str(tmp_path / 'charity_main_cleaned.csv')
+    cleaned_register().to_csv(path, index=False)
+
+    chunks = list(iter_charity_main(path, chunksize=2))
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    # Each chunk has its own categories, so compare the labels
+    result = pd.concat([chunk.astype({col: object for col in chunk.columns[chunk.dtypes == 'category']})
+                        for chunk in chunks], ignore_index=True)
+    expected = load_charity_main(path)
+    expected = expected.astype({col: object for col in expected.columns[expected.dtypes == 'category']})
+    tm.assert_frame_equal(result, expected, check_dtype=False)
+    for chunk in chunks:
+        assert (chunk[['Religious_Activities', 'Elderly_Support', 'None']].dtypes == np.int8).all()
+    assert result['None'].tolist() == [0, 1, 0, 1, 1]
+
+@pytest.fixture
+def register():
+    df = cleaned_register()
+    # An unpadded and a missing charity number
+    df.loc[1, 'registered_charity_number'] = '20202'
+    df.loc[4, 'registered_charity_number'] = None
+    return df
+
+def test_parquet_and_csv_round_trips_agree(tmp_path, register):
+    save_charity_main(register, str(tmp_path / 'charity.parquet'))
+    save_charity_main(register, str(tmp_path / 'charity.csv'))
+    from_parquet = load_charity_main(str(tmp_path / 'charity.parquet'))
+    from_csv = load_charity_main(str(tmp_path / 'charity.csv'))
+
+    tm.assert_frame_equal(from_parquet, from_csv)
+    assert from_csv['size_category'].dtype == 'category'
+    assert from_csv['registration_fy'].dtype == 'Int32'
+    assert pd.api.types.is_datetime64_any_dtype(from_csv['date_of_removal'])
+    assert (from_csv[[col for col in DUMMY_COLUMNS if col in from_csv]].dtypes == np.int8).all()
+
+@pytest.mark.parametrize('suffix', ['parquet', 'csv'])
+def test_none_classification_is_not_missing(tmp_path, register, suffix):
+    path = str(tmp_path / f'charity.{suffix}')
+    save_charity_main(register, path)
+    loaded = load_charity_main(path)
+    assert loaded['classification_description'].tolist() == register['classification_description'].tolist()
+    assert loaded['None'].tolist() == [0, 1, 0, 1, 1]
+
+@pytest.mark.parametrize('suffix', ['parquet', 'csv'])
+def test_charity_numbers_are_zero_padded(tmp_path, register, suffix):
+    path = str(tmp_path / f'charity.{suffix}')
+    save_charity_main(register, path)
+    numbers = load_charity_main(path)['registered_charity_number']
+    assert numbers.iloc[:4].tolist() == ['000101', '020202', '303030', '404040']
+    assert pd.isna(numbers.iloc[4])
+
+def test_numeric_charity_numbers_are_padded_without_decimals():
+    numbers = pd.DataFrame({'registered_charity_number': [101.0, np.nan, 202020.0]})
+    result = to_compact_dtypes(numbers)['registered_charity_number']
+    assert result.iloc[[0, 2]].tolist() == ['000101', '202020']
+    assert pd.isna(result.iloc[1])
@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+
+from src.cleaning.clean_charity_main import (
+    classify_size,
+    get_financial_year,
+    map_categories,
+    classification_dummies,
+    attach_dummies,
+    base_cleaning
+)
+from tests import baseline
+
+def test_classify_size_matches_row_wise():
+    incomes = pd.DataFrame({
+        'latest_income': [np.nan, 0, 24999.99, 25000, 25000.01, 1_000_000, 1_000_000.01, np.nan, -5, np.nan, 3e9],
+        'latestIncome': [np.nan, 1e7, np.nan, 1, np.nan, np.nan, np.nan, 24999, np.nan, 1_000_001, np.nan],
+    })
+    expected = incomes.apply(baseline.classify_size_combined, axis=1)
+    result = classify_size(incomes['latest_income'].fillna(incomes['latestIncome']))
+    tm.assert_series_equal(result, expected)
+
+def test_classify_size_all_missing():
+    incomes = pd.DataFrame({'latest_income': [np.nan, np.nan], 'latestIncome': [np.nan, np.nan]})
+    expected = incomes.apply(baseline.classify_size_combined, axis=1)
+    result = classify_size(incomes['latest_income'].fillna(incomes['latestIncome']))
+    assert result.isna().all() and expected.isna().all()
+
+def test_financial_year_matches_row_wise():
+    dates = pd.to_datetime(pd.Series([
+        '2015-03-31', '2015-04-01', '2016-01-01', '2016-12-31', None, '2020-02-29', '2023-04-01'
+    ]))
+    expected = dates.apply(baseline.get_financial_year)
+    tm.assert_series_equal(get_financial_year(dates), expected)
+
+def test_financial_year_without_missing_dates_keeps_int_dtype():
+    dates = pd.to_datetime(pd.Series(['2019-03-01', '2019-04-01', '2024-11-30']))
+    expected = dates.apply(baseline.get_financial_year)
+    result = get_financial_year(dates)
+    tm.assert_series_equal(result, expected)
+    assert result.dtype == np.int64
+
+def test_financial_year_all_missing():
+    dates = pd.Series(pd.NaT, index=range(3), dtype='datetime64[ns]')
+    expected = dates.apply(baseline.get_financial_year)
+    tm.assert_series_equal(get_financial_year(dates), expected)
+
+def test_map_categories_matches_linear_scan():
+    descriptions = pd.Series([
+        'Makes Grants To Individuals', 'Animals', 'animals', None, 'Elderly/Old People',
+        'The Advancement Of Health Or Saving Of Lives', 'Not A Classification', np.nan,
+        'Economic/Community Development/Employment', 'Animals', 'Other-Charitable-Purposes', ''
+    ], name='classification_description')
+    expected = descriptions.apply(baseline.apply_category_mapping)
+    # apply infers pandas' string dtype; the mapped labels are kept as objects
+    tm.assert_series_equal(map_categories(descriptions), expected, check_dtype=False)
+
+def test_map_categories_reports_unmapped_descriptions():
+    descriptions = pd.Series(['Animals', 'Unknown', None, 'Unknown'])
+    result, unmapped = map_categories(descriptions, report=True)
+    assert result.tolist() == ['Environment_And_Animals', 'None', 'None', 'None']
+    assert unmapped.tolist() == [2, 1]
+    assert unmapped.index[0] == 'Unknown' and pd.isna(unmapped.index[1])
+
+def test_classification_dummies_match_pivot_table():
+    df = pd.DataFrame({
+        'registered_charity_number': ['000300', '000100', '000300', '000200', '000300', '000400', '000100'],
+        'charity_name': ['c', 'a', 'c', 'b', 'c', 'd', 'a'],
+        'classification_description': [
+            'Religious_Activities', 'Elderly_Support', 'Elderly_Support', 'None',
+            'Arts_And_Recreation', 'Elderly_Support', 'Arts_And_Recreation'
+        ],
+    }, index=[10, 11, 12, 13, 14, 15, 16])
+    expected = baseline.attach_classification_dummies(df)
+    dummies = classification_dummies(df['registered_charity_number'], df['classification_description'])
+    result = attach_dummies(df.drop_duplicates(subset='registered_charity_number'), dummies)
+    # pivot_table and the merge give int64 columns; the matrix is int8
+    tm.assert_frame_equal(result, expected, check_dtype=False)
+    assert (result[dummies.columns].dtypes == np.int8).all()
+
+def test_attach_dummies_fills_charities_without_dummies():
+    df = pd.DataFrame({'registered_charity_number': ['000100', '000200']})
+    dummies = classification_dummies(pd.Series(['000100']), pd.Series(['Animals']))
+    result = attach_dummies(df, dummies)
+    assert result['Animals'].tolist() == [1, 0]
+
+def random_register(n_rows, n_charities, seed):
+    rng = np.random.default_rng(seed)
+    removal = pd.Series(
+        np.datetime64('2010-01-01') + rng.integers(0, 5, n_rows) * np.timedelta64(400, 'D')
+    ).astype(str).where(rng.random(n_rows) < 0.5)
+    return pd.DataFrame({
+        'registered_charity_number': rng.integers(1, n_charities, n_rows).astype(str),
+        'charity_company_registration_number': np.array(['', ' ', '0123', '0456 '], dtype=object)[rng.integers(0, 4, n_rows)],
+        'date_of_removal': removal,
+        'charity_status': 'R',
+        'row': np.arange(n_rows),
+    })
+
+def test_base_cleaning_matches_frame_sort():
+    for seed in range(5):
+        register = random_register(2000, 150, seed)
+        expected = baseline.base_cleaning(register.copy())
+        result = base_cleaning(register.copy())
+        tm.assert_frame_equal(result, expected)
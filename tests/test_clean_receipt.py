@@ -0,0 +1,165 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+import pytest
+
+from src.cleaning.clean_receipt import (
+    ColumnAliasResolver,
+    KeywordMatcher,
+    build_panel,
+    count_removals,
+    create_complete_panel,
+    filter_non_england,
+    merge_columns,
+    melt_sheet,
+    merge_columns_func,
+    non_england_authorities,
+    non_england_keywords,
+    non_england_names
+)
+from tests import baseline
+
+@pytest.mark.parametrize('name', [
+    'newport', 'Newport', 'fife', 'vale of glamorgan', 'the vale of glamorgan', 'Vale of Glamorgan Council',
+    'rhondda cynon taf', 'rhondda, cynon, taff', 'glasgow city', 'orkney islands', 'argyll and bute',
+    'argyll & bute', 'na h-eileanan siar', 'city of edinburgh', 'armagh city, banbridge and craigavon',
+])
+def test_non_england_names_match(name):
+    assert KeywordMatcher(non_england_names).match(name) is not None
+
+@pytest.mark.parametrize('name', [
+    'newport pagnell', 'north fife', 'vale of white horse', 'newcastle upon tyne', 'north tyneside',
+    'east riding of yorkshire', 'highlands and islands', 'cardiff road', None,
+])
+def test_english_and_partial_names_do_not_match(name):
+    assert KeywordMatcher(non_england_names).match(name) is None
+
+def test_every_official_name_matches_itself():
+    matcher = KeywordMatcher(non_england_names)
+    assert all(matcher.match(official) == official for official in non_england_authorities)
+
+def test_keyword_modes_kept_for_compatibility():
+    prefix = KeywordMatcher(non_england_keywords, mode='prefix')
+    substring = KeywordMatcher(non_england_keywords, mode='substring')
+    assert prefix.match('rhondda cynon taf') == 'rhondda'
+    assert prefix.match('north fife') is None
+    assert substring.match('north fife') == 'fife'
+    with pytest.raises(ValueError):
+        KeywordMatcher(non_england_keywords, mode='regex')
+
+def test_filter_non_england_reports_by_council():
+    dataset = pd.DataFrame({'local_authority': [
+        'newport', 'newport pagnell', 'north fife', 'fife', 'the vale of glamorgan', 'vale of glamorgan', 'leeds', None
+    ]})
+    filtered, dropped = filter_non_england(dataset, report=True)
+    tm.assert_series_equal(
+        filtered['local_authority'],
+        pd.Series(['newport pagnell', 'north fife', 'leeds', None], index=[1, 2, 6, 7], name='local_authority')
+    )
+    assert dropped.to_dict() == {'vale of glamorgan': 2, 'newport': 1, 'fife': 1}
+
+@pytest.fixture(scope='module')
+def receipts_long():
+    """
+    melt_disposal output with missing values, authorities without some
+    years' receipts, a year missing from every sheet and duplicate rows
+    that are summed.
+    """
+    rng = np.random.default_rng(0)
+    authorities = [f'authority {i}' for i in range(12)]
+    years = [year for year in range(2014, 2024) if year != 2019]
+    categories = ['all services total', 'parking', 'community safety']
+    long_df = pd.DataFrame(
+        [(la, year, category) for year in years for la in authorities for category in categories],
+        columns=['local_authority', 'financial_year', 'category']
+    )
+    long_df['value'] = rng.lognormal(5, 1, len(long_df)).round(1)
+    long_df.loc[rng.choice(len(long_df), 20, replace=False), 'value'] = np.nan
+    long_df = long_df.drop(index=rng.choice(len(long_df), 40, replace=False))
+    duplicates = long_df.sample(10, random_state=1)
+    return pd.concat([long_df, duplicates], ignore_index=True)
+
+@pytest.fixture(scope='module')
+def charities():
+    rng = np.random.default_rng(1)
+    n = 2000
+    authorities = [f'authority {i}' for i in range(14)] + [None]
+    return pd.DataFrame({
+        'local_authority': rng.choice(np.array(authorities, dtype=object), n),
+        'removal_fy': rng.choice([np.nan, 2013, 2014, 2015, 2017, 2019, 2020, 2023, 2024], n),
+        'size_category': rng.choice(np.array(['Small', 'Medium', 'Large', None], dtype=object), n),
+    })
+
+def assert_panels_equal(result, expected):
+    tm.assert_frame_equal(result.reset_index(drop=True), expected.reset_index(drop=True))
+
+def test_build_panel_matches_baseline(receipts_long, charities):
+    expected = baseline.create_complete_panel(receipts_long, charities)
+    assert_panels_equal(create_complete_panel(receipts_long, charities), expected)
+    assert_panels_equal(build_panel(receipts_long, count_removals(charities)), expected)
+
+@pytest.fixture
+def sheets():
+    """
+    Sheets after basic_cleaning: aliases next to or instead of their
+    standard column, ' and ' spellings, padded names and missing values.
+    """
+    rng = np.random.default_rng(2)
+
+    def sheet(columns, n=6):
+        values = rng.lognormal(3, 1, (n, len(columns))).round(1)
+        values[rng.random(values.shape) < 0.2] = np.nan
+        df = pd.DataFrame(values, columns=columns)
+        df.insert(0, 'local_authority', [f'authority {i}' for i in range(n)])
+        return df
+
+    return [
+        sheet(['community safety', 'community safety (cctv)', 'total all services', 'parking of vehicles',
+               ' Education ', 'Highways and Transport', 'libraries']),
+        sheet(['all services total', 'all services', 'parking', 'social services', 'social care',
+               'total social care', 'culture & heritage']),
+        sheet(['total all services', 'parking', 'public health', 'total public health']),
+    ]
+
+def test_merge_columns_func_matches_baseline(sheets):
+    expected = baseline.merge_columns_func([df.copy() for df in sheets], merge_columns)
+    result, matched = merge_columns_func([df.copy() for df in sheets], merge_columns, report=True)
+    for df, expected_df in zip(result, expected):
+        tm.assert_frame_equal(df, expected_df)
+    assert matched[0] == {
+        'community safety': ['community safety', 'community safety (cctv)'],
+        'all services total': ['total all services'],
+        'parking': ['parking of vehicles'],
+        'total education': ['education'],
+        'total highways & transport': ['highways & transport'],
+    }
+    assert matched[1]['total social care'] == ['social services', 'social care']
+    assert matched[2] == {'all services total': ['total all services'], 'total public health': ['public health']}
+
+def test_resolver_is_reusable_across_sheets(sheets):
+    resolver = ColumnAliasResolver(merge_columns)
+    expected = baseline.merge_columns_func([df.copy() for df in sheets], merge_columns)
+    for df, expected_df in zip(sheets, expected):
+        resolved, _ = resolver.resolve(df.copy())
+        tm.assert_frame_equal(resolved, expected_df)
+
+def test_category_pushdown_matches_filtering_after_melt(sheets):
+    categories = ['parking', 'all services total', 'total social care', 'libraries']
+    merged = baseline.merge_columns_func([df.copy() for df in sheets], merge_columns)
+    selected = merge_columns_func([df.copy() for df in sheets], merge_columns, categories=categories)
+    for year, (df, expected_df) in enumerate(zip(selected, merged), start=2020):
+        expected = melt_sheet(expected_df, year)
+        expected = expected[expected['category'].isin(categories)]
+        tm.assert_frame_equal(melt_sheet(df, year), expected.reset_index(drop=True))
+
+@pytest.mark.parametrize('categories', [['parking', 'all services total', 'community safety'], 'all'])
+def test_category_panels_match_baseline(receipts_long, charities, categories):
+    panel = build_panel(receipts_long, count_removals(charities), categories=categories)
+    if categories == 'all':
+        categories = sorted(receipts_long['category'].unique())
+    assert list(panel['category'].unique()) == categories
+    for category, result in panel.groupby('category', sort=False):
+        # The original only builds the 'all services total' panel
+        receipts = receipts_long[receipts_long['category'] == category].assign(category='all services total')
+        expected = baseline.create_complete_panel(receipts, charities)
+        assert_panels_equal(result.drop(columns='category'), expected)
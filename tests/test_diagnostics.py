@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+from statsmodels.tsa.stattools import adfuller, coint, kpss
+
+from src.analysis.diagnostics import adf_batch, engle_granger_batch, kpss_batch, mackinnon_pvalues
+
+# adfuller's tuple return is deprecated and kpss warns when its p-value hits the table's ends
+pytestmark = [
+    pytest.mark.filterwarnings('ignore::FutureWarning'),
+    pytest.mark.filterwarnings('ignore::statsmodels.tools.sm_exceptions.InterpolationWarning'),
+]
+
+def random_walks(n_units=12, n_periods=30, seed=0):
+    rng = np.random.default_rng(seed)
+    y = rng.standard_normal((n_units, n_periods)).cumsum(axis=1)
+    x = rng.standard_normal((n_units, n_periods)).cumsum(axis=1)
+    # Some units stationary or cointegrated, so p-values span the range
+    y[::3] = rng.standard_normal((len(y[::3]), n_periods))
+    y[1::3] = 2 * x[1::3] + rng.standard_normal((len(y[1::3]), n_periods))
+    return y, x
+
+@pytest.mark.parametrize('regression', ['n', 'c', 'ct'])
+@pytest.mark.parametrize('lags', [0, 2])
+def test_adf_batch_matches_adfuller(regression, lags):
+    y, _ = random_walks()
+    result = adf_batch(y, lags, regression=regression)
+    for unit, row in zip(y, result.itertuples()):
+        stat, p_value, used_lags, nobs, _ = adfuller(unit, maxlag=lags, regression=regression, autolag=None)
+        assert row.stat == pytest.approx(stat, rel=1e-10)
+        assert row.p_value == pytest.approx(p_value, rel=1e-10)
+        assert (row.lags, row.nobs) == (used_lags, nobs)
+
+@pytest.mark.parametrize('autolag', ['aic', 'bic'])
+def test_adf_batch_autolag_matches_adfuller(autolag):
+    y, _ = random_walks(seed=1)
+    result = adf_batch(y, regression='c', autolag=autolag)
+    for unit, row in zip(y, result.itertuples()):
+        stat, p_value, used_lags, nobs, _, _ = adfuller(unit, regression='c', autolag=autolag.upper())
+        assert row.stat == pytest.approx(stat, rel=1e-10)
+        assert row.p_value == pytest.approx(p_value, rel=1e-10)
+        assert (row.lags, row.nobs) == (used_lags, nobs)
+
+@pytest.mark.parametrize('regression', ['c', 'ct'])
+@pytest.mark.parametrize('lags', ['auto', 'legacy', 3])
+def test_kpss_batch_matches_kpss(regression, lags):
+    y, _ = random_walks(seed=2)
+    result = kpss_batch(y, regression=regression, lags=lags)
+    for unit, row in zip(y, result.itertuples()):
+        stat, p_value, used_lags, _ = kpss(unit, regression=regression, nlags=lags)
+        assert row.stat == pytest.approx(stat, rel=1e-10)
+        assert row.p_value == pytest.approx(p_value, rel=1e-10)
+        assert row.lags == used_lags
+
+@pytest.mark.parametrize('trend', ['c', 'ct'])
+def test_engle_granger_batch_matches_coint(trend):
+    y, x = random_walks(seed=3)
+    result = engle_granger_batch(y, x, trend=trend, autolag=None)
+    for unit_y, unit_x, row in zip(y, x, result.itertuples()):
+        stat, p_value, _ = coint(unit_y, unit_x, trend=trend, maxlag=0, autolag=None)
+        assert row.stat == pytest.approx(stat, rel=1e-10)
+        assert row.p_value == pytest.approx(p_value, rel=1e-10)
+
+def test_mackinnon_pvalues_keeps_missing_and_tails():
+    p = mackinnon_pvalues(np.array([np.nan, -40.0, 10.0, -2.5]), 'c')
+    assert np.isnan(p[0]) and p[1] == 0.0 and p[2] == 1.0 and 0 < p[3] < 1
+
+def test_pvalues_can_be_skipped():
+    y, x = random_walks(seed=4)
+    for result in [adf_batch(y, pvalues=False), kpss_batch(y, pvalues=False),
+                   engle_granger_batch(y, x, pvalues=False)]:
+        assert result['p_value'].isna().all() and result['stat'].notna().all()
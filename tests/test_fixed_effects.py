@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+import statsmodels.formula.api as smf
+
+from src.analysis.fixed_effects import fit_panel_model
+from tests.panels import LAG_VARIABLES, formula, synthetic_panel
+
+@pytest.fixture(scope='module')
+def panel():
+    panel = synthetic_panel(n_authorities=30)
+    # Missing values outside the lags, and a financial year only one row has:
+    # that row has no lags, so the lagged formula fit keeps an all-zero dummy
+    rng = np.random.default_rng(1)
+    panel.loc[rng.choice(len(panel), 20, replace=False), 'value'] = np.nan
+    panel.loc[rng.choice(len(panel), 5, replace=False), 'removals'] = np.nan
+    panel.loc[0, 'financial_year'] = 2014
+    return panel
+
+@pytest.mark.filterwarnings('ignore:The design matrix is rank-deficient')
+@pytest.mark.parametrize('variables', [['value'], LAG_VARIABLES], ids=['contemporaneous', 'lags'])
+@pytest.mark.parametrize('cluster', ['local_authority', None])
+def test_matches_formula_fit(panel, variables, cluster):
+    model = smf.ols(formula(variables), data=panel)
+    if cluster:
+        sample = panel.dropna(subset=['removals'] + variables)
+        expected = model.fit(cov_type='cluster', cov_kwds={'groups': sample[cluster]})
+    else:
+        expected = model.fit()
+    result = fit_panel_model(panel, variables, cluster=cluster)
+
+    idx = result.params.index
+    assert set(idx) <= set(expected.params.index)
+    assert len(idx) == 2 + 3 * len(variables)
+    np.testing.assert_allclose(result.params, expected.params[idx], rtol=1e-7, atol=1e-10)
+    np.testing.assert_allclose(result.bse, expected.bse[idx], rtol=1e-7, atol=1e-10)
+    np.testing.assert_allclose(result.pvalues, expected.pvalues[idx], rtol=1e-6, atol=1e-12)
+    np.testing.assert_allclose(result.resid, expected.resid, rtol=1e-7, atol=1e-8)
+    assert result.nobs == expected.nobs
+    assert result.df_resid == expected.df_resid
+    assert result.cov_type == ('cluster' if cluster else 'nonrobust')
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+
+from src.cleaning import incremental
+from src.cleaning.clean_receipt import PANEL_CATEGORIES, build_panel
+
+YEARS = list(range(2014, 2024))
+
+def year_long(year, seed=0):
+    rng = np.random.default_rng([seed, year])
+    authorities = [f'authority {i}' for i in range(6)]
+    return pd.DataFrame({
+        'local_authority': authorities,
+        'financial_year': year,
+        'category': PANEL_CATEGORIES[0],
+        'value': rng.integers(0, 5000, len(authorities)).astype(float),
+    })
+
+def removals():
+    rng = np.random.default_rng(1)
+    index = pd.MultiIndex.from_product(
+        [[f'authority {i}' for i in range(6)], YEARS, ['Large', 'Medium', 'Small']],
+        names=['local_authority', 'financial_year', 'size_category']
+    )
+    return index.to_frame(index=False).assign(removals=rng.poisson(2, len(index)))
+
+def full_panel(years):
+    long_df = pd.concat([year_long(year) for year in years], ignore_index=True)
+    return build_panel(long_df, removals()).reset_index(drop=True)
+
+def full_build(store_dir, years):
+    # The full-build path of run_clean_receipt.py
+    incremental.save_removals(removals(), store_dir)
+    for year in years:
+        incremental.save_year_long(year_long(year), year, store_dir)
+    incremental.prune_years(years, store_dir)
+    incremental.rebuild_panel_years(incremental.stored_years(store_dir), store_dir)
+    return incremental.assemble_panel(store_dir)
+
+def test_full_build_matches_build_panel(tmp_path):
+    tm.assert_frame_equal(full_build(str(tmp_path), YEARS), full_panel(YEARS))
+
+def test_full_build_drops_years_no_longer_produced(tmp_path):
+    full_build(str(tmp_path), YEARS)
+    kept = [year for year in YEARS if year != 2019]
+    panel = full_build(str(tmp_path), kept)
+    assert 2019 not in incremental.stored_years(str(tmp_path))
+    tm.assert_frame_equal(panel, full_panel(kept))
+
+def test_incremental_update_matches_full_build(tmp_path):
+    store_dir = str(tmp_path)
+    full_build(store_dir, YEARS)
+    changed = year_long(2018, seed=7)
+    incremental.save_year_long(changed, 2018, store_dir)
+    rebuilt = incremental.rebuild_panel_years([2018], store_dir)
+    assert rebuilt == [2018, 2019, 2020, 2021]
+
+    long_df = pd.concat([changed if year == 2018 else year_long(year) for year in YEARS], ignore_index=True)
+    expected = build_panel(long_df, removals()).reset_index(drop=True)
+    tm.assert_frame_equal(incremental.assemble_panel(store_dir), expected)
+
+def test_incremental_removal_rebuilds_following_years(tmp_path):
+    store_dir = str(tmp_path)
+    full_build(store_dir, YEARS)
+    incremental.remove_year(2018, store_dir)
+    rebuilt = incremental.rebuild_panel_years([2018], store_dir)
+    assert rebuilt == [2019, 2020, 2021]
+    kept = [year for year in YEARS if year != 2018]
+    tm.assert_frame_equal(incremental.assemble_panel(store_dir), full_panel(kept))
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+
+from src.cleaning.joins import attach_columns
+
+def merged(base, right, left_on, right_on, columns):
+    """
+    The pd.merge left join attach_columns replaces, without right keys
+    that are named differently from the left ones.
+    """
+    left_on = [left_on] if isinstance(left_on, str) else left_on
+    right_on = [right_on] if isinstance(right_on, str) else right_on
+    keys = list(dict.fromkeys(right_on))
+    result = pd.merge(base, right[keys + [c for c in columns if c not in keys]],
+                      left_on=left_on, right_on=right_on, how='left')
+    return result.drop(columns=[r for l, r in zip(left_on, right_on) if l != r])
+
+def test_attach_columns_matches_merge_on_unique_keys():
+    base = pd.DataFrame({
+        'number': ['3', '1', '', '2', '9', '1'],
+        'name': ['c', 'a', 'e', 'b', 'z', 'a'],
+    })
+    right = pd.DataFrame({
+        'CompanyNumber': ['1', '2', '3', '', '4'],
+        'status': ['active', 'dissolved', None, 'blank', 'active'],
+        'postcode': ['AB1 2CD', 'EF3 4GH', 'IJ5 6KL', '', None],
+    })
+    expected = merged(base, right, 'number', 'CompanyNumber', ['status', 'postcode'])
+    result, match_rate = attach_columns(base.copy(), right, 'number', 'CompanyNumber', ['status', 'postcode'])
+    tm.assert_frame_equal(result, expected)
+    assert match_rate == 5 / 6
+
+def test_attach_columns_matches_merge_with_repeated_and_missing_keys():
+    base = pd.DataFrame({
+        'registered_charity_number': ['1', '2', None, '3', '2'],
+        'charity_name': ['a', 'b', 'n', 'c', 'b'],
+        'income': [1.0, 2.0, 3.0, np.nan, 5.0],
+    })
+    right = pd.DataFrame({
+        'registered_charity_number': ['2', '1', '2', None, '4', '1'],
+        'charity_name': ['b', 'a', 'b', 'n', 'd', 'x'],
+        'income': [20.0, 10.0, 21.0, 30.0, 40.0, 11.0],
+        'postalCode': ['P2', 'P1', 'P2b', 'PN', 'P4', 'PX'],
+    })
+    for keys in ['registered_charity_number', ['registered_charity_number', 'charity_name']]:
+        expected = merged(base, right, keys, keys, ['postalCode', 'income'])
+        result, _ = attach_columns(base.copy(), right, keys, keys, ['postalCode', 'income'])
+        tm.assert_frame_equal(result, expected)
+
+def test_attach_columns_with_no_matches():
+    base = pd.DataFrame({'key': ['a', 'b']})
+    right = pd.DataFrame({'key': ['c'], 'value': [1.0]})
+    result, match_rate = attach_columns(base.copy(), right, 'key', 'key', ['value'])
+    tm.assert_frame_equal(result, merged(base, right, 'key', 'key', ['value']))
+    assert match_rate == 0.0
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+
+from benchmarks.synthetic import synthetic_authorities, write_receipts_workbook
+from src.cleaning import load_raw
+from src.cleaning.load_raw import COMPANY_HOUSE_COLUMNS, load_company_house, load_receipt_sheets
+
+def test_load_company_house_matches_full_read(tmp_path):
+    path = tmp_path / 'company_house.csv'
+    pd.DataFrame({
+        'CompanyName': ['A', 'B', 'C', 'D', 'E'],
+        ' CompanyNumber': ['00000001', ' 00000002', '00000003', '00000004 ', '00000005'],
+        'CompanyStatus': ['Active', 'Dissolved', 'Active', 'Active', None],
+        'RegAddress.PostCode': ['AB1 2CD', 'EF3 4GH', '', 'IJ5 6KL', 'MN7 8OP'],
+        'SICCode.SicText_1': ['x', 'y', 'z', 'w', 'v'],
+    }).to_csv(path, index=False)
+    company_numbers = pd.Series(['00000002', '00000004', '00000005', '99999999'])
+
+    result = load_company_house(path, company_numbers, chunksize=2)
+
+    full = pd.read_csv(path, dtype=str, low_memory=False)
+    full.columns = full.columns.str.strip()
+    expected = full.loc[full['CompanyNumber'].str.strip().isin(company_numbers), COMPANY_HOUSE_COLUMNS]
+    result.columns = result.columns.str.strip()
+    tm.assert_frame_equal(result, expected.reset_index(drop=True))
+
+def test_load_receipt_sheets_in_process_matches_pool(tmp_path, monkeypatch):
+    path = str(tmp_path / 'receipts.xlsx')
+    write_receipts_workbook(path, synthetic_authorities(12), np.random.default_rng(0))
+    years = ['2014', '2017', '2023']
+    pooled = load_receipt_sheets(path, years, max_workers=2, cache_dir=None)
+
+    # Without a pool of its own, as inside a pipeline task
+    def no_pool(*args, **kwargs):
+        raise AssertionError("load_receipt_sheets started a process pool")
+    monkeypatch.setattr(load_raw, 'ProcessPoolExecutor', no_pool)
+    in_process = load_receipt_sheets(path, years, max_workers=1, cache_dir=None)
+
+    assert list(in_process) == years
+    for year in years:
+        tm.assert_frame_equal(in_process[year], pooled[year])
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import synthetic_authorities, write_receipts_workbook
+from src.cleaning.charity_store import load_charity_main
+from src.cleaning.clean_receipt import (
+    flat_lookup,
+    non_england_names,
+    apply_local_authority_cleaning,
+    filter_non_england,
+    melt_sheet,
+    count_removals,
+    build_panel
+)
+from src.cleaning.load_raw import load_receipt_sheets
+from src.cleaning.partitioned import build_partitioned_panel, partition_inputs, write_panel_csv
+
+N_AUTHORITIES = 24
+
+@pytest.fixture(scope='module')
+def inputs(tmp_path_factory):
+    """
+    Cleaned receipts sheets and a cleaned charity csv whose charities sit in
+    the sheets' authorities, in a few Welsh ones and in none.
+    """
+    directory = tmp_path_factory.mktemp('inputs')
+    rng = np.random.default_rng(0)
+    authorities = synthetic_authorities(N_AUTHORITIES)
+    workbook = str(directory / 'receipts.xlsx')
+    write_receipts_workbook(workbook, authorities, rng)
+    sheets = load_receipt_sheets(workbook, max_workers=1, cache_dir=None)
+    cleaned, _ = apply_local_authority_cleaning(list(sheets.values()), pd.DataFrame(), flat_lookup)
+    sheets = dict(zip(sheets, cleaned))
+
+    n = 3000
+    names = np.array(list(authorities['LAD23NM']) + ['Cardiff', 'Newport', None], dtype=object)
+    removal_fy = rng.integers(2012, 2025, n).astype(float)
+    removal_fy[rng.random(n) < 0.4] = np.nan
+    charity = pd.DataFrame({
+        'registered_charity_number': [f'{i:06d}' for i in range(n)],
+        'local_authority': names[rng.integers(0, len(names), n)],
+        'size_category': np.array(['Small', 'Medium', 'Large', None], dtype=object)[rng.integers(0, 4, n)],
+        'date_of_registration': '2000-01-01',
+        'date_of_removal': pd.Series(pd.to_datetime(removal_fy + 1, format='%Y')).dt.strftime('%Y-%m-%d'),
+        'removal_fy': removal_fy,
+        'Religious_Activities': rng.integers(0, 2, n).astype(float),
+        'None': rng.integers(0, 2, n),
+    })
+    charity_path = str(directory / 'charity_main_cleaned.csv')
+    charity.to_csv(charity_path, index=False)
+    return sheets, charity_path
+
+def in_memory_csv(sheets, charity_path, categories):
+    """
+    The panel run_clean_receipt.py builds without --out-of-core.
+    """
+    charity = load_charity_main(charity_path)
+    _, charity = apply_local_authority_cleaning([], charity, flat_lookup)
+    charity = filter_non_england(charity, non_england_names)
+    long_df = pd.concat(
+        [melt_sheet(df.copy(), int(year)) for year, df in sheets.items()
+         if not df.empty and 'local_authority' in df.columns],
+        ignore_index=True
+    )
+    return build_panel(long_df, count_removals(charity), categories=categories).to_csv(index=False)
+
+@pytest.mark.parametrize('categories', [None, 'all', ['parking', 'all services total', 'community safety']])
+@pytest.mark.parametrize('n_partitions, workers, buffer_rows', [(1, 1, 100_000), (5, 2, 7), (16, 1, 500)])
+def test_partitioned_panel_matches_in_memory(inputs, tmp_path, categories, n_partitions, workers, buffer_rows):
+    sheets, charity_path = inputs
+    dataset_dir = str(tmp_path / 'partitioned')
+    sheet_copies = {year: df.copy() for year, df in sheets.items()}
+    partition_inputs(sheet_copies, charity_path, dataset_dir, n_partitions, chunksize=700, categories=categories)
+    rows = build_partitioned_panel(dataset_dir, categories, workers=workers)
+    output = str(tmp_path / 'panel.csv')
+    written = write_panel_csv(output, dataset_dir, categories, buffer_rows=buffer_rows)
+
+    expected = in_memory_csv(sheets, charity_path, categories)
+    with open(output) as f:
+        assert f.read() == expected
+    assert rows == written == expected.count('\n') - 1
@@ -0,0 +1,74 @@
+import pandas as pd
+import pandas.testing as tm
+import pytest
+
+from src.cleaning.pipeline import Pipeline, Task
+
+def read_numbers(filepath):
+    # Only the 'n' column reaches later tasks
+    return pd.read_csv(filepath)[['n']]
+
+def double(numbers):
+    return numbers.assign(n=numbers['n'] * 2), {'rows': len(numbers)}
+
+def total(doubled, other):
+    return pd.DataFrame({'total': [doubled['n'].sum() + other['n'].sum()]})
+
+def toy_pipeline(directory):
+    tasks = [
+        Task('numbers', read_numbers, files={'filepath': str(directory / 'numbers.csv')}),
+        Task('other', read_numbers, files={'filepath': str(directory / 'other.csv')}),
+        Task('doubled', double, inputs=['numbers']),
+        Task('total', total, inputs=['doubled', 'other']),
+    ]
+    return Pipeline(tasks, pipeline_dir=str(directory / 'pipeline'))
+
+def write_inputs(directory):
+    pd.DataFrame({'n': [1, 2, 3], 'note': ['a', 'b', 'c']}).to_csv(directory / 'numbers.csv', index=False)
+    pd.DataFrame({'n': [10]}).to_csv(directory / 'other.csv', index=False)
+    return directory
+
+@pytest.fixture
+def directory(tmp_path):
+    return write_inputs(tmp_path)
+
+def test_rerun_skips_every_task(directory):
+    pipeline = toy_pipeline(directory)
+    assert set(pipeline.run(max_workers=1).values()) == {'ran'}
+    assert set(toy_pipeline(directory).run(max_workers=1).values()) == {'skipped'}
+    assert pipeline.load('total')['total'].tolist() == [22]
+    assert pipeline.reports() == {'doubled': {'rows': 3}}
+
+def test_changed_input_reruns_its_dependants(directory):
+    toy_pipeline(directory).run(max_workers=1)
+    pd.DataFrame({'n': [5]}).to_csv(directory / 'other.csv', index=False)
+    pipeline = toy_pipeline(directory)
+    assert pipeline.run(max_workers=1) == {
+        'numbers': 'skipped', 'other': 'ran', 'doubled': 'skipped', 'total': 'ran'
+    }
+    assert pipeline.load('total')['total'].tolist() == [17]
+
+def test_unchanged_result_stops_the_rerun(directory):
+    toy_pipeline(directory).run(max_workers=1)
+    # A column read_numbers drops: its result, and so everything after it, is unchanged
+    pd.DataFrame({'n': [1, 2, 3], 'note': ['x', 'y', 'z']}).to_csv(directory / 'numbers.csv', index=False)
+    status = toy_pipeline(directory).run(max_workers=1)
+    assert status == {'numbers': 'ran', 'other': 'skipped', 'doubled': 'skipped', 'total': 'skipped'}
+
+def test_targets_and_force(directory):
+    pipeline = toy_pipeline(directory)
+    assert pipeline.run(['doubled'], max_workers=1) == {'numbers': 'ran', 'doubled': 'ran'}
+    assert pipeline.run(['doubled'], max_workers=1, force=True) == {'numbers': 'ran', 'doubled': 'ran'}
+
+def test_pool_matches_one_process(tmp_path):
+    results = {}
+    for workers in [1, 2]:
+        directory = tmp_path / f'workers_{workers}'
+        directory.mkdir()
+        pipeline = toy_pipeline(write_inputs(directory))
+        status = pipeline.run(max_workers=workers)
+        results[workers] = (status, {name: pipeline.load(name) for name in pipeline.order}, pipeline.reports())
+    assert results[1][0] == results[2][0]
+    assert results[1][2] == results[2][2]
+    for name, frame in results[1][1].items():
+        tm.assert_frame_equal(results[2][1][name], frame)
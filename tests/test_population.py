@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+import pytest
+
+from src.analysis.population import population_series
+
+@pytest.fixture(scope='module')
+def dataset():
+    """
+    Charities with missing registration and removal dates, missing sizes,
+    and some removals dated before registration.
+    """
+    rng = np.random.default_rng(0)
+    n = 3000
+    registered = pd.Timestamp('2012-01-01') + pd.to_timedelta(rng.integers(0, 365 * 12, n), unit='D')
+    removed = registered + pd.to_timedelta(rng.integers(-400, 365 * 8, n), unit='D')
+    dataset = pd.DataFrame({
+        'date_of_registration': registered,
+        'date_of_removal': removed.where(rng.random(n) < 0.5),
+        'size_category': rng.choice(np.array(['Small', 'Medium', 'Large', None], dtype=object), n, p=[0.5, 0.3, 0.1, 0.1]),
+        'local_authority': rng.choice(['leeds', 'york', 'hull'], n),
+    })
+    dataset.loc[rng.choice(n, 30, replace=False), 'date_of_registration'] = pd.NaT
+    return dataset
+
+def scan_periods(dataset, periods, freq='M'):
+    """
+    The notebook's per-period scan: filter the whole dataset once per period.
+    """
+    registration = dataset['date_of_registration'].dt.to_period(freq)
+    removal = dataset['date_of_removal'].dt.to_period(freq)
+    rows = []
+    for period in periods:
+        active = (registration <= period) & (removal.isna() | (removal > period))
+        rows.append({
+            'active': active.sum(),
+            'registered': (registration == period).sum(),
+            'removed': (removal == period).sum(),
+        })
+    expected = pd.DataFrame(rows, index=pd.Index(periods, name='period'))
+    expected['prev_active'] = expected['active'].shift(1)
+    expected['registration_rate'] = expected['registered'] / expected['prev_active'] * 100
+    expected['removal_rate'] = expected['removed'] / expected['prev_active'] * 100
+    return expected
+
+@pytest.mark.parametrize('freq, start, end', [('M', '2015-01', '2024-12'), ('Q', '2010Q1', '2030Q4'), ('D', '2019-12-01', '2020-03-31')])
+def test_matches_period_scan(dataset, freq, start, end):
+    result = population_series(dataset, freq=freq, start=start, end=end)
+    expected = scan_periods(dataset, pd.period_range(start, end, freq=freq), freq)
+    tm.assert_frame_equal(result, expected[result.columns], check_dtype=False)
+
+def test_default_range_covers_every_date(dataset):
+    result = population_series(dataset)
+    # Removals dated before registration can precede every registration
+    assert dataset['date_of_removal'].min() < dataset['date_of_registration'].min()
+    assert result.index[0] == dataset['date_of_removal'].min().to_period('M')
+    assert result.index[-1] == dataset['date_of_removal'].max().to_period('M')
+    assert result['registered'].sum() == dataset['date_of_registration'].notna().sum()
+    assert result['removed'].sum() == dataset['date_of_removal'].notna().sum()
+
+@pytest.mark.parametrize('by', ['size_category', ['local_authority', 'size_category']])
+def test_grouped_matches_scan_per_group(dataset, by):
+    result = population_series(dataset, start='2014-12', end='2024-12', by=by)
+    keys = [by] if isinstance(by, str) else by
+    periods = pd.period_range('2014-12', '2024-12', freq='M')
+    groups = dataset.dropna(subset=keys).groupby(keys)
+    assert result.index.droplevel('period').nunique() == groups.ngroups
+    for key, group in groups:
+        key = key if isinstance(key, tuple) else (key,)
+        expected = scan_periods(group, periods)
+        tm.assert_frame_equal(result.loc[key], expected[result.columns], check_dtype=False)
+
+def test_removal_before_registration():
+    dataset = pd.DataFrame({
+        'date_of_registration': pd.to_datetime(['2020-03-10', '2020-03-10', '2020-01-05']),
+        'date_of_removal': pd.to_datetime(['2020-01-20', '2020-03-01', pd.NaT]),
+    })
+    result = population_series(dataset, start='2019-12', end='2020-04')
+    # Removed before (or in the month of) registration: registered and
+    # removed are counted, but the charity is never active
+    assert result['active'].tolist() == [0, 1, 1, 1, 1]
+    assert result['registered'].tolist() == [0, 1, 0, 2, 0]
+    assert result['removed'].tolist() == [0, 1, 0, 1, 0]
+    tm.assert_frame_equal(result, scan_periods(dataset, result.index)[result.columns], check_dtype=False)
@@ -0,0 +1,26 @@
+import pandas as pd
+import pandas.testing as tm
+
+from src.cleaning.postcodes import PostcodeResolver, load_postcode_resolver, postcode_index
+
+ONSPD = pd.DataFrame({
+    'pcds': ['AB1 2CD', 'AB1 2CE', 'AB1 3XY', 'ZZ9 9ZZ'],
+    'oslaua': ['E01', 'E01', 'E02', 'E03'],
+})
+LOCAL_AUTHORITY = pd.DataFrame({'LAD23CD': ['E01', 'E02', 'E03'], 'LAD23NM': ['One', 'Two', 'Three']})
+
+def test_resolver_normalises_and_falls_back():
+    resolver = PostcodeResolver(postcode_index(ONSPD), LOCAL_AUTHORITY)
+    postcodes = pd.Series(['ab12cd', ' AB1  3XY', 'AB1 2ZZ', 'AB1', 'ZZ9 9ZZ', 'QQ1 1QQ', None, ''])
+    names, counts = resolver.resolve(postcodes, report=True)
+    assert names.astype(object).where(names.notna(), None).tolist() == ['One', 'Two', 'One', 'One', 'Three', None, None, None]
+    assert counts.to_dict() == {'postcode': 3, 'sector': 1, 'district': 1, 'missing': 3}
+
+def test_cached_resolver_matches_fresh_build(tmp_path):
+    onspd_path = tmp_path / 'onspd.csv'
+    ONSPD.to_csv(onspd_path, index=False)
+    postcodes = pd.Series(['AB1 2CD', 'AB1 9AA', 'ZZ9'])
+    fresh = PostcodeResolver(postcode_index(ONSPD), LOCAL_AUTHORITY).resolve(postcodes)
+    for _ in range(2):
+        cached = load_postcode_resolver(str(onspd_path), LOCAL_AUTHORITY, str(tmp_path / 'cache'))
+        tm.assert_series_equal(cached.resolve(postcodes), fresh)
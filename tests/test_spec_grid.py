@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from src.analysis.fixed_effects import fit_panel_model
+from src.analysis.spec_grid import add_lags, run_specifications, sample_groups, select_rows, specification_grid
+from tests.panels import synthetic_panel
+
+@pytest.fixture(scope='module')
+def panel():
+    panel = synthetic_panel(n_authorities=40)
+    return panel.drop(columns=['value_lag2', 'value_lag3'])
+
+@pytest.fixture(scope='module')
+def specs():
+    return specification_grid(
+        lag_sets={'contemporaneous': ['value'], 'lag1': ['value_lag1'], 'lags': ['value', 'value_lag1', 'value_lag2', 'value_lag3']},
+        size_subsets=[None, ['Small', 'Medium']],
+        year_windows=[None, (2018, 2023)]
+    )
+
+def test_specs_sharing_a_sample_are_grouped(panel, specs):
+    groups = sample_groups(panel.assign(value_lag2=0.0, value_lag3=0.0), specs)
+    # 'value' and 'value_lag1' fits on FY2018-2023 keep the same rows
+    assert len(groups) < len(specs)
+    assert sum(len(group) for _, group in groups) == len(specs)
+
+@pytest.mark.parametrize('cluster', ['local_authority', None])
+def test_grid_matches_separate_fits(panel, specs, cluster):
+    results = run_specifications(panel, specs, max_workers=2, cluster=cluster)
+    assert list(results) == [spec['name'] for spec in specs]
+
+    lagged = panel.sort_values(['local_authority', 'size_category', 'financial_year'])
+    for lag in [2, 3]:
+        lagged[f'value_lag{lag}'] = lagged.groupby(['local_authority', 'size_category'])['value'].shift(lag)
+    for spec in specs:
+        expected = fit_panel_model(select_rows(lagged, spec), spec['variables'], cluster=cluster)
+        result = results[spec['name']]
+        assert list(result.params.index) == list(expected.params.index)
+        np.testing.assert_allclose(result.params, expected.params, rtol=1e-7, atol=1e-10)
+        np.testing.assert_allclose(result.bse, expected.bse, rtol=1e-7, atol=1e-10)
+        assert result.nobs == expected.nobs and result.df_resid == expected.df_resid
+
+def test_add_lags_matches_years_not_rows():
+    complete = synthetic_panel(n_authorities=5)
+    # Drop a year of one authority, as build_panel drops rows without receipts
+    dropped = (complete['local_authority'] == 'authority 2') & (complete['financial_year'] == 2018)
+    panel = add_lags(complete[~dropped].drop(columns=['value_lag1', 'value_lag2', 'value_lag3']), 3)
+    assert len(panel) == (~dropped).sum()
+    merged = panel.merge(complete, on=['local_authority', 'size_category', 'financial_year'], suffixes=('', '_complete'))
+    for lag in [1, 2, 3]:
+        np.testing.assert_array_equal(merged[f'value_lag{lag}'], merged[f'value_lag{lag}_complete'].where(
+            ~((merged['local_authority'] == 'authority 2') & (merged['financial_year'] == 2018 + lag))
+        ))
+    assert panel.loc[(panel['local_authority'] == 'authority 2') & (panel['financial_year'] == 2019), 'value_lag1'].isna().all()